@@ -0,0 +1,83 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Importing this module puts the frescobaldi_app directory in front of
+sys.path, so the benchmarks can import the ly package and the Frescobaldi
+modules without installing them.
+
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import gc
+import os
+import sys
+import time
+
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       '..', 'frescobaldi_app')
+
+if app_dir not in sys.path:
+    sys.path.insert(0, app_dir)
+
+
+def name(number):
+    """Return a name consisting of letters for the number, usable in LilyPond.
+
+    LilyPond identifiers can't contain digits, so every digit is replaced by
+    the letter at the same place in the alphabet: 0 -> A, 12 -> BC.
+
+    """
+    return ''.join(chr(ord('A') + int(c)) for c in format(number))
+
+
+def synthetic_score(parts, measures, music, length=4,
+                    staff="\\new Staff \\{name}"):
+    """Return the text of a score with the specified number of parts.
+
+    music is the text of length measures, it is repeated in every part to
+    get the requested number of measures. staff is the format of the line
+    that puts a part in the score; {name} is replaced with the name of the
+    part and {number} with its number, starting with 1.
+
+    """
+    text = ['\\version "2.18.0"\n\n\\header {\n  title = "Benchmark"\n}\n\n']
+    for i in range(parts):
+        text.append("part{0} = {{\n  \\time 4/4 \\key c \\major\n".format(name(i)))
+        text.append(music * (measures // length))
+        text.append("}\n\n")
+    text.append("\\score {\n  <<\n")
+    for i in range(parts):
+        text.append("    ")
+        text.append(staff.format(name="part" + name(i), number=i + 1))
+        text.append("\n")
+    text.append("  >>\n  \\layout { }\n}\n")
+    return ''.join(text)
+
+
+def best_time(func, repeat, setup=None):
+    """Call func repeat times and return (best time, result of the last call).
+
+    If setup is given, it is called before every call to func, and func is
+    called with the tuple it returns as arguments. The time setup takes is
+    not measured.
+
+    """
+    best = result = None
+    for i in range(repeat):
+        args = setup() if setup else ()
+        gc.collect()
+        t = time.time()
+        result = func(*args)
+        t = time.time() - t
+        best = t if best is None else min(best, t)
+        del args
+    return best, result
+
+
+def report(title, *rows):
+    """Print the title and the (label, value) rows, with aligned values."""
+    print("{0}:".format(title))
+    for label, value in rows:
+        print("  {0:<14}{1}".format(label + ":", value))
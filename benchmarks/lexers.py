@@ -0,0 +1,346 @@
+#! python
+
+"""
+Measures the speed of the ly.lex lexers.
+
+Run this from the toplevel frescobaldi directory:
+
+python benchmarks/lexers.py [options] [file ...]
+
+Without files, a corpus of synthetic documents is generated: a large
+orchestral score, a lyrics-heavy song, a Scheme-heavy library, and LilyPond
+embedded in LaTeX, HTML and Texinfo documents. The documents are generated
+with a fixed random seed, so every run lexes exactly the same text; use
+--scale to make them larger or smaller. Files given on the command line are
+lexed in the mode guessed from their contents.
+
+Every document is lexed line by line using one State, like the editor and
+ly.document do. The best time of --repeat runs is reported, with the number
+of tokens per second. Then the document is lexed once more, measuring the
+time spent per parser class; this run is slower because of the measuring,
+so only the shares of the total are reported (see --parsers).
+
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import collections
+import io
+import random
+import time
+
+import benchutil
+import ly.lex
+
+
+# building blocks for the synthetic documents
+pitches = "c d e f g a b cis ees fis bes as".split()
+octaves = ["", "'", "''", ","]
+durations = ["4", "8", "16", "2", "4.", "8.", ""]
+articulations = ["", "", "-.", "->", "-^", "--", "\\fermata", "\\trill"]
+dynamics = ["", "", "", "\\p", "\\f", "\\mf", "\\<", "\\>", "\\!"]
+syllables = ("la li lo lu ma me mi mo sun shine rain ing ly ter "
+             "ver y thing some where al ways nev er gold en").split()
+
+
+def note(rnd):
+    """Return a random note with duration, articulation and dynamics."""
+    n = rnd.choice(pitches) + rnd.choice(octaves) + rnd.choice(durations)
+    r = rnd.random()
+    if r < 0.1:
+        n = "<{0} {1} {2}>{3}".format(rnd.choice(pitches), rnd.choice(pitches),
+            rnd.choice(pitches), rnd.choice(durations))
+    elif r < 0.15:
+        n = "r" + rnd.choice(durations)
+    n += rnd.choice(articulations) + rnd.choice(dynamics)
+    if r > 0.9:
+        n += "("
+    elif r > 0.85:
+        n += ")"
+    elif r > 0.8:
+        n += "~"
+    return n
+
+
+def music(rnd, measures, indent="  "):
+    """Return lines of random music, one measure per line."""
+    lines = []
+    for i in range(measures):
+        items = [note(rnd) for j in range(rnd.randint(3, 7))]
+        r = rnd.random()
+        if r < 0.1:
+            items.insert(0, "\\times 2/3 {")
+            items.append("}")
+        elif r < 0.15:
+            items.insert(0, "\\once \\override NoteHead.color = #red")
+        elif r < 0.2:
+            items.append('^\\markup { \\italic "dolce" }')
+        elif r < 0.22:
+            items.append("% a comment about measure {0}".format(i))
+        lines.append(indent + " ".join(items) + " |")
+    return lines
+
+
+def orchestral_score(rnd, scale):
+    """A large score with many parts, overrides, markup and a score block."""
+    names = ["flute", "oboe", "clarinet", "bassoon", "horn", "trumpet",
+             "trombone", "timpani", "violinI", "violinII", "viola", "cello",
+             "bass"]
+    lines = ['\\version "2.18.2"', '',
+             '\\header {', '  title = "Symphony"',
+             '  composer = "Benchmark"', '  tagline = ##f', '}', '',
+             'global = { \\time 4/4 \\key d \\major \\tempo "Allegro" 4 = 132 }',
+             '']
+    for name in names:
+        lines.append("{0} = \\relative c'' {{".format(name))
+        lines.append("  \\global")
+        lines.extend(music(rnd, 60 * scale))
+        lines.append('  \\bar "|."')
+        lines.append("}")
+        lines.append("")
+    lines.append("\\score {")
+    lines.append("  <<")
+    for name in names:
+        lines.append('    \\new Staff \\with {{ instrumentName = "{0}" }} \\{0}'.format(name))
+    lines.append("  >>")
+    lines.append("  \\layout {")
+    lines.append("    \\context { \\Staff \\RemoveEmptyStaves }")
+    lines.append("  }")
+    lines.append("  \\midi { }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def lyrics_song(rnd, scale):
+    """A song with a melody and many verses of lyrics."""
+    lines = ['\\version "2.18.2"', '',
+             "melody = \\relative c' {"]
+    lines.extend(music(rnd, 40 * scale))
+    lines.append("}")
+    lines.append("")
+    for verse in range(8):
+        lines.append("verse{0} = \\lyricmode {{".format("ABCDEFGH"[verse]))
+        lines.append('  \\set stanza = "{0}."'.format(verse + 1))
+        for i in range(25 * scale):
+            words = []
+            for j in range(rnd.randint(4, 9)):
+                w = rnd.choice(syllables)
+                r = rnd.random()
+                if r < 0.3:
+                    w += " --"
+                elif r < 0.4:
+                    w += " __"
+                elif r < 0.45:
+                    w = '"{0},"'.format(w)
+                elif r < 0.5:
+                    w += rnd.choice(durations)
+                words.append(w)
+            lines.append("  " + " ".join(words))
+        lines.append("}")
+        lines.append("")
+    lines.append("\\score {")
+    lines.append("  <<")
+    lines.append('    \\new Voice = "melody" \\melody')
+    for verse in range(8):
+        lines.append('    \\new Lyrics \\lyricsto "melody" \\verse{0}'.format(
+            "ABCDEFGH"[verse]))
+    lines.append("  >>")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def scheme_library(rnd, scale):
+    """A file with many Scheme function and markup command definitions."""
+    lines = ['\\version "2.18.2"', '']
+    for i in range(40 * scale):
+        lines.extend([
+            "#(define (helper-{0} grob)".format(i),
+            "   (let* ((stencil (ly:grob-property grob 'stencil))",
+            "          (extent (ly:stencil-extent stencil X))",
+            "          (width (- (cdr extent) (car extent))))",
+            "     (if (> width {0}.5)".format(rnd.randint(1, 9)),
+            "         (ly:stencil-translate-axis stencil (* -0.5 width) X)",
+            "         (begin",
+            "           (ly:warning \"narrow grob ~a\" grob)",
+            "           stencil))))",
+            "",
+            "#(define-markup-command (box-{0} layout props text) (markup?)".format(i),
+            "   \"Draw a box around @var{text}.\"",
+            "   (let ((th 0.1) (pad {0}))".format(rnd.randint(1, 5)),
+            "     (interpret-markup layout props",
+            "       #{ \\markup \\box \\pad-around #pad #text #})))",
+            "",
+            "tweak{0} = #(define-music-function (parser location m) (ly:music?)".format(i),
+            "   #{ \\once \\override NoteHead.stencil = #helper-" + format(i),
+            "      $m #})",
+            "",
+            ";; test the function",
+            "{ \\tweak" + format(i) + " c'4 d'4-\\markup \\box-" + format(i) + " \"x\" }",
+            "",
+        ])
+    return "\n".join(lines) + "\n"
+
+
+def latex_document(rnd, scale):
+    """A LaTeX document for lilypond-book with embedded music."""
+    lines = ["\\documentclass[a4paper]{article}",
+             "\\usepackage{graphicx}",
+             "\\begin{document}",
+             "\\section{Introduction}"]
+    for i in range(20 * scale):
+        lines.append("This is paragraph {0} with some \\emph{{emphasized}} and "
+                     "$x^2 + y_{{i}}$ math, \\cite{{ref{0}}}.".format(i))
+        lines.append("\\begin{lilypond}[quote,fragment,staffsize=16]")
+        lines.append("\\relative c'' {")
+        lines.extend(music(rnd, 6))
+        lines.append("}")
+        lines.append("\\end{lilypond}")
+        lines.append("Inline: \\lilypond[fragment]{{ c'4 {0} }} % comment".format(
+            note(rnd)))
+        lines.append("")
+    lines.append("\\end{document}")
+    return "\n".join(lines) + "\n"
+
+
+def html_document(rnd, scale):
+    """An HTML document for lilypond-book with embedded music."""
+    lines = ["<!DOCTYPE html>", "<html>", "<head>",
+             '<meta charset="utf-8"><title>Examples</title>', "</head>",
+             "<body>"]
+    for i in range(20 * scale):
+        lines.append('<h2 id="ex{0}">Example {0}</h2>'.format(i))
+        lines.append("<p>Some <b>text</b> &amp; a <a href=\"#ex{0}\">link</a>."
+                     "<!-- comment --></p>".format(i))
+        lines.append('<lilypond fragment staffsize="16">')
+        lines.append("\\relative c'' {")
+        lines.extend(music(rnd, 6))
+        lines.append("}")
+        lines.append("</lilypond>")
+        lines.append("<p>Inline: <lilypond fragment relative=2: c4 {0} /></p>".format(
+            note(rnd)))
+    lines.append("</body>")
+    lines.append("</html>")
+    return "\n".join(lines) + "\n"
+
+
+def texinfo_document(rnd, scale):
+    """A Texinfo document with embedded music."""
+    lines = ["\\input texinfo", "@setfilename examples.info",
+             "@settitle Examples", "@node Top", "@top Examples"]
+    for i in range(20 * scale):
+        lines.append("@section Example {0}".format(i))
+        lines.append("Some @emph{{text}} with @code{{\\\\relative}} and "
+                     "@ref{{Example {0}}}.".format(i))
+        lines.append("@lilypond[quote,verbatim]")
+        lines.append("\\relative c'' {")
+        lines.extend(music(rnd, 6))
+        lines.append("}")
+        lines.append("@end lilypond")
+        lines.append("@c a comment")
+    lines.append("@bye")
+    return "\n".join(lines) + "\n"
+
+
+generators = [
+    ("orchestral score", "lilypond", orchestral_score),
+    ("lyrics", "lilypond", lyrics_song),
+    ("scheme", "lilypond", scheme_library),
+    ("latex", "latex", latex_document),
+    ("html", "html", html_document),
+    ("texinfo", "texinfo", texinfo_document),
+]
+
+
+def corpus(scale):
+    """Return the list of (name, mode, text) tuples of the synthetic corpus."""
+    rnd = random.Random(1)
+    return [(name, mode, func(rnd, scale)) for name, mode, func in generators]
+
+
+def lex(mode, lines):
+    """Lex the lines using one State; return the number of tokens."""
+    state = ly.lex.state(mode)
+    count = 0
+    for line in lines:
+        for t in state.tokens(line):
+            count += 1
+    return count
+
+
+def lex_per_parser(mode, lines):
+    """Lex the lines, return a dict mapping parser class to (time, tokens)."""
+    state = ly.lex.state(mode)
+    clock = time.time
+    times = collections.defaultdict(float)
+    counts = collections.defaultdict(int)
+    for line in lines:
+        tokens = state.tokens(line)
+        while True:
+            cls = state.parser().__class__
+            t = clock()
+            try:
+                next(tokens)
+            except StopIteration:
+                times[cls] += clock() - t
+                break
+            times[cls] += clock() - t
+            counts[cls] += 1
+    return dict((cls, (times[cls], counts[cls])) for cls in times)
+
+
+def measure(name, mode, text, repeat, parsers):
+    """Lex the text and print the results."""
+    lines = text.splitlines()
+    best, count = benchutil.best_time(lambda: lex(mode, lines), repeat)
+    benchutil.report("{0} ({1})".format(name, mode),
+        ("size", "{0} lines, {1} kB".format(len(lines), len(text) // 1024)),
+        ("tokens", count),
+        ("time", "{0:.3f} s".format(best)),
+        ("speed", "{0:.0f} tokens/s, {1:.0f} kB/s".format(
+            count / best if best else 0, len(text) / 1024.0 / best if best else 0)))
+    if parsers:
+        result = lex_per_parser(mode, lines)
+        total = sum(t for t, c in result.values()) or 1
+        print("  per parser:")
+        for cls, (t, c) in sorted(result.items(), key=lambda i: i[1][0],
+                                  reverse=True)[:parsers]:
+            print("    {0:5.1f}%  {1:8d} tokens  {2}.{3}".format(
+                t / total * 100, c, cls.__module__, cls.__name__))
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help="files to lex")
+    parser.add_argument('--scale', type=int, default=4,
+        help="size of the synthetic documents (default: 4)")
+    parser.add_argument('--repeat', type=int, default=3,
+        help="number of times to lex every document (default: 3)")
+    parser.add_argument('--parsers', type=int, default=8, metavar="NUM",
+        help="number of parsers to show the time share of, 0 for none "
+             "(default: 8)")
+    args = parser.parse_args()
+
+    if args.files:
+        documents = []
+        for filename in args.files:
+            with io.open(filename, encoding='utf-8') as f:
+                text = f.read()
+            documents.append((filename, ly.lex.guessMode(text), text))
+    else:
+        documents = corpus(args.scale)
+
+    total_count = 0
+    total_time = 0.0
+    for name, mode, text in documents:
+        count, t = measure(name, mode, text, args.repeat, args.parsers)
+        total_count += count
+        total_time += t
+    print("total:          {0} tokens, {1:.3f} s, {2:.0f} tokens/s".format(
+        total_count, total_time, total_count / total_time if total_time else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#! python
+
+"""
+Measures the build time and memory usage of ly.music trees.
+
+Run this from the toplevel frescobaldi directory:
+
+python benchmarks/musictree.py [options] [file.ly ...]
+
+Without files, a synthetic score is generated (see --staves and --measures).
+For every input the number of nodes, the time to build the tree (best of
+--repeat runs) and the memory held by the tree are printed. The memory is
+measured using tracemalloc, which requires Python 3.4 or newer.
+
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import gc
+
+import benchutil
+import ly.document
+import ly.music
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+music = (
+    "  c'4 d'8( e') f'4-. g'->  |  <c' e' g'>2~ q4 r8 a'16 b'  |\n"
+    "  \\times 2/3 { c''8[ b' a'] } g'2.\\p  |  e'4 \\grace d'8 e'4 f'2  |\n"
+)
+
+
+def count_nodes(node):
+    """Return the number of nodes in the tree."""
+    return 1 + sum(count_nodes(n) for n in node)
+
+
+def measure(name, doc, repeat):
+    """Build the music tree for the ly.document.Document and print results."""
+    best, m = benchutil.best_time(lambda: ly.music.document(doc), repeat)
+    
+    memory = None
+    if tracemalloc:
+        del m
+        gc.collect()
+        tracemalloc.start()
+        m = ly.music.document(doc)
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    
+    nodes = count_nodes(m)
+    rows = [
+        ("lines", len(doc)),
+        ("nodes", nodes),
+        ("build time", "{0:.3f} s".format(best)),
+    ]
+    if memory is not None:
+        rows.append(("tree memory", "{0:.1f} KiB ({1:.0f} bytes per node)".format(
+            memory / 1024.0, memory / float(nodes))))
+    benchutil.report(name, *rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help="LilyPond files to read")
+    parser.add_argument('--staves', type=int, default=20,
+        help="number of staves in the synthetic score (default: 20)")
+    parser.add_argument('--measures', type=int, default=400,
+        help="number of measures per staff in the synthetic score (default: 400)")
+    parser.add_argument('--repeat', type=int, default=3,
+        help="number of times to build every tree (default: 3)")
+    args = parser.parse_args()
+    
+    if args.files:
+        for filename in args.files:
+            measure(filename, ly.document.Document.load(filename), args.repeat)
+    else:
+        text = benchutil.synthetic_score(args.staves, args.measures, music)
+        name = "synthetic score ({0} staves, {1} measures)".format(
+            args.staves, args.measures)
+        measure(name, ly.document.Document(text), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#! python
+
+"""
+Compares the streaming MusicXML writer with writing the complete tree.
+
+Run this from the toplevel frescobaldi directory:
+
+python benchmarks/musicxml.py [options] [file.ly ...]
+
+Without files, a synthetic score is generated (see --parts and --measures).
+Every input is exported in a separate process for each writer, so that the
+peak memory usage (RSS) of the processes can be compared, both in total and
+the growth while exporting (after the LilyPond source has been read). The
+time needed to create and write the XML is measured (best of --repeat runs),
+without the time needed to read the LilyPond source, and it is checked
+whether both writers give the same output.
+
+Note: ly.musicxml currently only runs on Python 2.
+
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import benchutil
+
+
+music = "c'8[ d'] e'4-. \\times 2/3 { f'8( g' a') } b'4~ | b'2 r4 c''4 | "
+staff = '\\new Staff \\with {{ instrumentName = "Part {number}" }} \\{name}'
+
+
+def peak_rss():
+    """Return the peak RSS of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        rss *= 1024     # Linux reports kilobytes, macOS bytes
+    return rss / 1048576.0
+
+
+def export(filename, writer, output, repeat):
+    """Export the LilyPond file to output using the writer.
+
+    Returns the best time and the growth of the peak RSS while exporting.
+    This is run in a child process, see measure().
+
+    """
+    import ly.document
+    import ly.musicxml
+    doc = ly.document.Document.load(filename)
+    growth = []
+    def setup():
+        w = ly.musicxml.writer()
+        w.parse_document(doc)
+        return w,
+    def write(w):
+        rss = peak_rss()
+        if writer == 'stream':
+            w.write_musicxml(output)
+        else:
+            w.musicxml().write(output)
+        growth.append(peak_rss() - rss)
+    best = benchutil.best_time(write, repeat, setup)[0]
+    return best, max(growth)
+
+
+def run(filename, writer, output, repeat):
+    """Run export() in a child process.
+
+    Returns (time, peak RSS, peak RSS growth while exporting), in MB.
+
+    """
+    p = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+        '--child', writer, '--output', output, '--repeat', format(repeat),
+        filename], stdout=subprocess.PIPE)
+    stdout = p.communicate()[0]
+    return tuple(map(float, stdout.split()[-3:]))
+
+
+def measure(name, filename, repeat):
+    """Export the file using both writers and print the results."""
+    fd, out1 = tempfile.mkstemp('.xml')
+    os.close(fd)
+    fd, out2 = tempfile.mkstemp('.xml')
+    os.close(fd)
+    try:
+        t1, rss1, grow1 = run(filename, 'stream', out1, repeat)
+        t2, rss2, grow2 = run(filename, 'tree', out2, repeat)
+        with open(out1, 'rb') as f1, open(out2, 'rb') as f2:
+            same = f1.read() == f2.read()
+        size = os.path.getsize(out1)
+    finally:
+        os.remove(out1)
+        os.remove(out2)
+    benchutil.report(name,
+        ("output size", "{0:.1f} MB".format(size / 1048576.0)),
+        ("streaming", "{0:.3f} s, peak RSS {1:.1f} MB (+{2:.1f} MB)".format(
+            t1, rss1, grow1)),
+        ("tree", "{0:.3f} s, peak RSS {1:.1f} MB (+{2:.1f} MB)".format(
+            t2, rss2, grow2)),
+        ("same result", "yes" if same else "NO"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help="LilyPond files to export")
+    parser.add_argument('--parts', type=int, default=100,
+        help="number of parts in the synthetic score (default: 100)")
+    parser.add_argument('--measures', type=int, default=40,
+        help="number of measures per part in the synthetic score (default: 40)")
+    parser.add_argument('--repeat', type=int, default=3,
+        help="number of times to export every document (default: 3)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        t, growth = export(args.files[0], args.child, args.output, args.repeat)
+        print(t, peak_rss(), growth)
+    elif args.files:
+        for filename in args.files:
+            measure(filename, filename, args.repeat)
+    else:
+        fd, filename = tempfile.mkstemp('.ly')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(benchutil.synthetic_score(args.parts, args.measures, music, 2,
+                staff).encode('utf-8'))
+        try:
+            name = "synthetic score ({0} parts, {1} measures)".format(
+                args.parts, args.measures)
+            measure(name, filename, args.repeat)
+        finally:
+            os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
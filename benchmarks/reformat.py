@@ -0,0 +1,98 @@
+#! python
+
+"""
+Compares the single pass reformat with the step by step reformat pipeline.
+
+Run this from the toplevel frescobaldi directory:
+
+python benchmarks/reformat.py [options] [file.ly ...]
+
+Without files, a badly formatted synthetic score is generated (see --staves
+and --measures). For every input, ly.reformat.reformat() and
+ly.reformat.reformat_in_steps() are run on a fresh document (best of --repeat
+runs), and it is checked whether both give the same result.
+
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+
+import benchutil
+import ly.document
+import ly.indent
+import ly.reformat
+
+
+# badly formatted music
+music = (
+    "c'4 d'8( e') f'4-. g'->  |  <c' e' g'>2~ q4 r8 a'16 b'  |   \n"
+    "      %%% a long comment   \n"
+    "\\times 2/3 { c''8[ b' a'] } g'2.\\p  |  \\grace { d'8 e' } e'4 f'2  |\n"
+    "  \\repeat volta 2 { c'1 \t\n"
+    "        d'1 } \\bar \"|.\"   \n"
+)
+
+
+def tokenize(doc):
+    """Make sure the whole document is tokenized, like in the editor."""
+    for block in doc:
+        doc.tokens(block)
+
+
+def run(func, text, repeat):
+    """Run func on a new document with text, return (best time, result).
+    
+    The document is tokenized before, and the result after func runs, as the
+    editor also has all tokens readily available and updates them.
+    
+    """
+    def setup():
+        doc = ly.document.Document(text)
+        tokenize(doc)
+        return doc,
+    def reformat(doc):
+        func(ly.document.Cursor(doc), ly.indent.Indenter())
+        tokenize(doc)
+        return doc
+    best, doc = benchutil.best_time(reformat, repeat, setup)
+    return best, doc.plaintext()
+
+
+def measure(name, text, repeat):
+    """Reformat the text in both ways and print the results."""
+    t1, result1 = run(ly.reformat.reformat, text, repeat)
+    t2, result2 = run(ly.reformat.reformat_in_steps, text, repeat)
+    benchutil.report(name,
+        ("lines", text.count('\n') + 1),
+        ("single pass", "{0:.3f} s".format(t1)),
+        ("in steps", "{0:.3f} s".format(t2)),
+        ("speedup", "{0:.1f}x".format(t2 / t1 if t1 else 0)),
+        ("same result", "yes" if result1 == result2 else "NO"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help="LilyPond files to reformat")
+    parser.add_argument('--staves', type=int, default=10,
+        help="number of staves in the synthetic score (default: 10)")
+    parser.add_argument('--measures', type=int, default=400,
+        help="number of measures per staff in the synthetic score (default: 400)")
+    parser.add_argument('--repeat', type=int, default=3,
+        help="number of times to reformat every document (default: 3)")
+    args = parser.parse_args()
+
+    if args.files:
+        for filename in args.files:
+            text = ly.document.Document.load(filename).plaintext()
+            measure(filename, text, args.repeat)
+    else:
+        text = benchutil.synthetic_score(args.staves, args.measures, music)
+        name = "synthetic score ({0} staves, {1} measures)".format(
+            args.staves, args.measures)
+        measure(name, text, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#! python
+
+"""
+Measures the time needed to import the modules Frescobaldi loads on startup.
+
+Run this from the toplevel frescobaldi directory:
+
+python benchmarks/startup.py [options] [module ...]
+
+Without modules, the main module and the modules imported by main() and the
+PanelManager are imported. Every run happens in a new process, without
+creating a QApplication, so this also works headless. The import time is
+measured using the startupprofile module (best of --repeat runs); use
+--report to see the startup profile of the fastest run.
+
+With --max-time, the exit status is 1 if the imports take longer, so that
+regressions can be tracked by a test.
+
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import benchutil
+
+
+# the modules main() imports; the Panel modules are read from panelmanager
+main_modules = [
+    'mainwindow',
+    'session',
+    'sessions',
+    'viewhighlighter',
+    'progress',
+    'musicpos',
+    'autocomplete',
+    'wordboundary',
+]
+
+
+def child(modules, output):
+    """Imports the main module and the modules, profiling the imports.
+
+    Prints the total import time and writes the report to output if given.
+    This is run in a child process, see run().
+
+    """
+    import startupprofile
+    startupprofile.install('-')
+    import main
+    if not modules:
+        import panelmanager
+        modules = main_modules + [name.rsplit('.', 1)[0]
+                                  for name in panelmanager.panels]
+    for name in modules:
+        __import__(name)
+    startupprofile.uninstall()
+    print(sum(r.time for r in startupprofile.records('import') if r.depth == 0))
+    if output:
+        with open(output, 'w') as f:
+            f.write(startupprofile.format_report())
+
+
+def run(modules, output=None):
+    """Run child() in a new process, return the total import time."""
+    cmd = [sys.executable, os.path.abspath(__file__), '--child']
+    if output:
+        cmd += ['--output', output]
+    p = subprocess.Popen(cmd + modules, stdout=subprocess.PIPE)
+    stdout = p.communicate()[0]
+    if p.returncode:
+        sys.exit("importing the modules failed")
+    return float(stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', help="modules to import")
+    parser.add_argument('--repeat', type=int, default=5,
+        help="number of times to start a new process (default: 5)")
+    parser.add_argument('--report', action="store_true", default=False,
+        help="print the startup profile of the fastest run")
+    parser.add_argument('--max-time', type=float, metavar="SECONDS",
+        help="exit with status 1 if importing takes longer")
+    parser.add_argument('--child', action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    modules = args.modules
+    if args.child:
+        child(modules, args.output)
+        return
+
+    best = None
+    report = None
+    for i in range(args.repeat):
+        fd, output = tempfile.mkstemp('.txt')
+        os.close(fd)
+        try:
+            t = run(modules, output)
+            if best is None or t < best:
+                best = t
+                with open(output) as f:
+                    report = f.read()
+        finally:
+            os.remove(output)
+    if args.report:
+        print(report)
+    print("imported {0}: {1:.3f} s (best of {2})".format(
+        "{0} modules".format(len(modules)) if modules else "the startup modules",
+        best, args.repeat))
+    if args.max_time is not None and best > args.max_time:
+        print("slower than {0:.3f} s".format(args.max_time))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
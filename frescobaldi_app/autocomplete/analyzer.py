@@ -30,6 +30,8 @@ import ly.lex as lx
 import ly.lex.lilypond as lp
 import ly.lex.scheme as scm
 import ly.words
+import highlighter
+import instrumentation
 import tokeniter
 
 from . import completiondata
@@ -78,6 +80,7 @@ class Analyzer(object):
                     self.model = model
                     return
 
+    @instrumentation.timed("autocomplete.analyzer")
     def completions(self, cursor):
         """Analyzes text at cursor and returns a tuple (position, model).
         
@@ -90,7 +93,14 @@ class Analyzer(object):
         This function does its best to return extremely meaningful completions
         for the context the cursor is in.
         
+        While a large document is being tokenized in the background, there
+        are no completions.
+        
         """
+        self.cursor = cursor
+        if any(highlighter.highlighter(c.document()).isTokenizing()
+               for c in (cursor, self.document_cursor())):
+            return cursor.position() - cursor.block().position(), None
         self.analyze(cursor)
         return self.column, self.model
     
@@ -120,7 +130,7 @@ class Analyzer(object):
     def toplevel(self):
         """LilyPond toplevel document contents."""
         self.backuntil(lx.Space)
-        return completiondata.lilypond_toplevel
+        return completiondata.lilypond_toplevel()
         # maybe: check if behind \version or \language
 
     def book(self):
@@ -151,20 +161,20 @@ class Analyzer(object):
         tokenclasses = self.tokenclasses()[i+1:]
         if tokenclasses == [lx.Space, lp.SchemeStart]:
             self.column -= 1
-            return completiondata.lilypond_all_grob_properties
+            return completiondata.lilypond_all_grob_properties()
         elif tokenclasses == [lx.Space, lp.SchemeStart, scm.Quote]:
             self.column -= 2
-            return completiondata.lilypond_all_grob_properties
+            return completiondata.lilypond_all_grob_properties()
         elif tokenclasses[:-1] == [lx.Space, lp.SchemeStart, scm.Quote]:
             self.column = self.lastpos - 2
-            return completiondata.lilypond_all_grob_properties
+            return completiondata.lilypond_all_grob_properties()
         # 2.18-style [GrobName.]propertyname tweak
         if lp.GrobName in tokenclasses:
             self.backuntil(lx.Space, lp.DotPath)
             return completiondata.lilypond_grob_properties(tokens[1], False)
         if tokens:
             self.backuntil(lx.Space)
-            return completiondata.lilypond_all_grob_properties_and_grob_names
+            return completiondata.lilypond_all_grob_properties_and_grob_names()
 
     def key(self):
         """complete mode argument of '\\key'"""
@@ -172,33 +182,34 @@ class Analyzer(object):
         if '\\key' in self.tokens[-5:-2] and lp.Note in tokenclasses[-3:]:
             if self.last.startswith('\\'):
                 self.column = self.lastpos
-            return completiondata.lilypond_modes
+            return completiondata.lilypond_modes()
 
     def clef(self):
         """complete \\clef names"""
         if '\\clef' in self.tokens[-4:-1]:
             self.backuntil(lx.Space, lp.StringQuotedStart)
-            return completiondata.lilypond_clefs
+            return completiondata.lilypond_clefs()
             
     def repeat(self):
         """complete \\repeat types"""
         if '\\repeat' in self.tokens[-4:-1]:
             self.backuntil(lx.Space, lp.StringQuotedStart)
-            return completiondata.lilypond_repeat_types
+            return completiondata.lilypond_repeat_types()
 
     def language(self):
         """complete \\language "name" """
         if '\\language' in self.tokens[-4:-1]:
             self.backuntil(lp.StringQuotedStart)
-            return completiondata.language_names
+            return completiondata.language_names()
 
     def include(self):
         """complete \\include """
         if '\\include' in self.tokens[-4:-2]:
             self.backuntil(lp.StringQuotedStart)
             dir = self.last[:self.last.rfind(os.sep)] if os.sep in self.last else None
+            name = self.last[self.last.rfind(os.sep)+1:]
             cursor = self.document_cursor()
-            return documentdata.doc(cursor.document()).includenames(cursor, dir)
+            return documentdata.doc(cursor.document()).includenames(cursor, dir, name)
 
     def general_music(self):
         """fall back: generic music commands and user-defined commands."""
@@ -226,7 +237,7 @@ class Analyzer(object):
                 return
         if i + 4 < len(self.tokens):
             self.column = self.tokens[i + 4].pos
-        return completiondata.music_glyphs
+        return completiondata.music_glyphs()
 
     def midi_instrument(self):
         """Complete midiInstrument = #"... """
@@ -236,7 +247,7 @@ class Analyzer(object):
             return
         if self.last != '"':
             self.column = self.lastpos
-        return completiondata.midi_instruments
+        return completiondata.midi_instruments()
         
     def font_name(self):
         """Complete #'font-name = #"..."""
@@ -262,7 +273,7 @@ class Analyzer(object):
                 and self.last != '\\markup'):
                 self.column = self.lastpos
             else:
-                return completiondata.lilypond_markup_commands
+                return completiondata.lilypond_markup_commands()
         else:
             m = re.search(r'\w+$', self.last)
             if m:
@@ -275,30 +286,30 @@ class Analyzer(object):
         if '=' in self.tokens[-3:] or self.last.startswith('\\'):
             if self.last.startswith('\\'):
                 self.column = self.lastpos
-            return completiondata.lilypond_markup
+            return completiondata.lilypond_markup()
         if self.last[:1].isalpha():
             self.column = self.lastpos
-        return completiondata.lilypond_header_variables
+        return completiondata.lilypond_header_variables()
 
     def paper(self):
         """\\paper {"""
         if '=' in self.tokens[-3:] or self.last.startswith('\\'):
             if self.last.startswith('\\'):
                 self.column = self.lastpos
-            return completiondata.lilypond_markup
+            return completiondata.lilypond_markup()
         if self.last[:1].isalpha():
             self.column = self.lastpos
-        return completiondata.lilypond_paper_variables
+        return completiondata.lilypond_paper_variables()
         
     def layout(self):
         """\\layout {"""
         self.backuntil(lx.Space)
-        return completiondata.lilypond_layout_variables
+        return completiondata.lilypond_layout_variables()
 
     def midi(self):
         """\\midi {"""
         self.backuntil(lx.Space)
-        return completiondata.lilypond_midi_variables
+        return completiondata.lilypond_midi_variables()
 
     def engraver(self):
         """Complete engraver names."""
@@ -310,10 +321,10 @@ class Analyzer(object):
                 if '"' not in self.tokens[-2:-1]:
                     return
                 self.column = self.lastpos
-            return completiondata.lilypond_engravers
+            return completiondata.lilypond_engravers()
         if cmd_in(self.tokens[-3:-1]):
             self.backuntil(lx.Space)
-            return completiondata.lilypond_engravers
+            return completiondata.lilypond_engravers()
         
     def context_variable_set(self):
         if '=' in self.tokens[-4:]:
@@ -323,15 +334,15 @@ class Analyzer(object):
                 return documentdata.doc(cursor.document()).schemewords()
             if self.last.startswith('\\'):
                 self.column = self.lastpos
-            return completiondata.lilypond_markup
+            return completiondata.lilypond_markup()
 
     def context(self):
         self.backuntil(lx.Space)
-        return completiondata.lilypond_context_contents
+        return completiondata.lilypond_context_contents()
 
     def with_(self):
         self.backuntil(lx.Space)
-        return completiondata.lilypond_with_contents
+        return completiondata.lilypond_with_contents()
 
     def translator(self):
         """complete context name after \\new, \\change or \\context in music"""
@@ -341,7 +352,7 @@ class Analyzer(object):
             elif isinstance(t, lp.Translator):
                 break
         self.backuntil(lx.Space)
-        return completiondata.lilypond_contexts
+        return completiondata.lilypond_contexts()
 
     def override(self):
         """\\override and \\revert"""
@@ -360,13 +371,13 @@ class Analyzer(object):
                     lp.ParseContext,
                     ))
                 or lp.DotPath in tokenclasses):
-                return completiondata.lilypond_grobs
-            return completiondata.lilypond_contexts_and_grobs
+                return completiondata.lilypond_grobs()
+            return completiondata.lilypond_contexts_and_grobs()
         # yes, there is a GrobName at i
         count = len(self.tokens) - i - 1 # tokens after grobname
         if count == 0:
             self.column = self.lastpos
-            return completiondata.lilypond_grobs
+            return completiondata.lilypond_grobs()
         elif count >= 2:
             # set the place of the scheme-start "#" as the column
             self.column = self.tokens[i+2].pos
@@ -393,8 +404,8 @@ class Analyzer(object):
         if lp.ContextProperty in tokenclasses and isinstance(self.last, lx.Space):
             return # fall back to music?
         elif lp.DotPath in tokenclasses:
-            return completiondata.lilypond_context_properties
-        return completiondata.lilypond_contexts_and_properties
+            return completiondata.lilypond_context_properties()
+        return completiondata.lilypond_contexts_and_properties()
 
     def markup_override(self):
         """test for \\markup \\override inside scheme"""
@@ -408,7 +419,7 @@ class Analyzer(object):
                 return
         if len(self.tokens) > i + 5:
             self.column = self.lastpos
-        return completiondata.lilypond_markup_properties
+        return completiondata.lilypond_markup_properties()
 
     def scheme_other(self):
         """test for other scheme words"""
@@ -439,8 +450,8 @@ class Analyzer(object):
             if lx.Space in tokenclasses[i+1:]:
                 return
         if lp.ContextName in tokenclasses:
-            return completiondata.lilypond_accidental_styles
-        return completiondata.lilypond_accidental_styles_contexts
+            return completiondata.lilypond_accidental_styles()
+        return completiondata.lilypond_accidental_styles_contexts()
 
     def hide_omit(self):
         """test for \omit and \hide"""
@@ -458,8 +469,8 @@ class Analyzer(object):
         tokenclasses = self.tokenclasses()[i+1:]
         if lp.GrobName not in tokenclasses[:-1]:
             if lp.ContextName in tokenclasses:
-                return completiondata.lilypond_grobs
-            return completiondata.lilypond_contexts_and_grobs
+                return completiondata.lilypond_grobs()
+            return completiondata.lilypond_contexts_and_grobs()
 
 
     # Mapping from Parsers to the lists of functions to run.
@@ -25,7 +25,7 @@ from __future__ import unicode_literals
 
 import re
 
-from PyQt4.QtGui import QTextCursor
+from PyQt4.QtGui import QCompleter, QTextCursor
 
 import app
 import textformats
@@ -55,6 +55,11 @@ class Completer(widgets.completer.Completer):
             self._pos = cursor.block().position() + pos
             if self.model() != model:
                 self.setModel(model)
+                # sorted models can be searched for a prefix much faster
+                self.setModelSorting(
+                    QCompleter.CaseSensitivelySortedModel
+                    if getattr(model, 'sorted', False)
+                    else QCompleter.UnsortedModel)
         cursor.setPosition(self._pos, QTextCursor.KeepAnchor)
         return cursor
 
@@ -19,16 +19,20 @@
 
 """
 All completions data.
+
+The models are created on first use, call the functions to get them.
 """
 
 from __future__ import unicode_literals
 
 import itertools
+import os
 
-from PyQt4.QtCore import Qt
+from PyQt4.QtCore import Qt, QTimer
 from PyQt4.QtGui import QFont, QFontDatabase
 
 import listmodel
+import qutil
 import ly.words
 import ly.data
 import ly.pitch
@@ -159,108 +163,216 @@ book = sorted(
 ))
 
 
-lilypond_markup = listmodel.ListModel(['\\markup'])
-
-lilypond_markup_commands = listmodel.ListModel(
-    sorted(ly.words.markupcommands),
-    display = util.command)
-
-lilypond_header_variables = listmodel.ListModel(
-    sorted(ly.words.headervariables, key=lambda i: i[:3]), edit = util.variable)
-
-lilypond_paper_variables = listmodel.ListModel(
-    sorted(ly.words.papervariables), edit = util.variable)
-
-lilypond_layout_variables = listmodel.ListModel([
-        '\\context {',
-        '\\override',
-        '\\set',
-        '\\hide',
-        '\\omit',
-        '\\accidentalStyle',
-        ] + sorted(ly.words.layoutvariables),
-    edit = util.cmd_or_var)
-
-lilypond_midi_variables = listmodel.ListModel(
-    ['\\context {', '\\override', '\\set', '\\tempo',] +
-    sorted(ly.words.midivariables),
-    edit = util.cmd_or_var)
-
-lilypond_contexts = listmodel.ListModel(sorted(ly.words.contexts))
-
-lilypond_grobs = listmodel.ListModel(ly.data.grobs())
-
-lilypond_contexts_and_grobs = listmodel.ListModel(
-    sorted(ly.words.contexts) + ly.data.grobs())
-
-lilypond_context_properties = listmodel.ListModel(
-    ly.data.context_properties())
-
-lilypond_contexts_and_properties = listmodel.ListModel(
-    sorted(ly.words.contexts) + ly.data.context_properties())
-
-lilypond_context_contents = listmodel.ListModel(sorted(itertools.chain(
-    util.make_cmds(ly.words.contexts),
-    ly.data.context_properties(),
-    util.make_cmds(cmds_context),
-    )), edit = util.cmd_or_var)
-
-lilypond_with_contents = listmodel.ListModel(sorted(itertools.chain(
-    ly.data.context_properties(),
-    util.make_cmds(cmds_with),
-    )), edit = util.cmd_or_var)
-
-lilypond_toplevel = listmodel.ListModel(sorted(itertools.chain(util.make_cmds(
-    toplevel + everywhere + inputmodes + markup + start_music + tweaks
-    + modes + blocks
-    ), toplevel_variables)), edit = util.cmd_or_var)
-
-lilypond_book = listmodel.ListModel(book, display = util.command)
-
-lilypond_bookpart = listmodel.ListModel(bookpart, display = util.command)
-    
-lilypond_score = listmodel.ListModel(score, display = util.command)
-
-lilypond_engravers = listmodel.ListModel(ly.data.engravers())
-    
+@util.cached
+def lilypond_markup():
+    return listmodel.ListModel(['\\markup'])
+
+@util.cached
+def lilypond_markup_commands():
+    return listmodel.ListModel(
+        sorted(ly.words.markupcommands),
+        display = util.command)
+
+@util.cached
+def lilypond_header_variables():
+    return listmodel.ListModel(
+        sorted(ly.words.headervariables, key=lambda i: i[:3]), edit = util.variable)
+
+@util.cached
+def lilypond_paper_variables():
+    return listmodel.ListModel(
+        sorted(ly.words.papervariables), edit = util.variable)
+
+@util.cached
+def lilypond_layout_variables():
+    return listmodel.ListModel([
+            '\\context {',
+            '\\override',
+            '\\set',
+            '\\hide',
+            '\\omit',
+            '\\accidentalStyle',
+            ] + sorted(ly.words.layoutvariables),
+        edit = util.cmd_or_var)
+
+@util.cached
+def lilypond_midi_variables():
+    return listmodel.ListModel(
+        ['\\context {', '\\override', '\\set', '\\tempo',] +
+        sorted(ly.words.midivariables),
+        edit = util.cmd_or_var)
+
+@util.cached
+def lilypond_contexts():
+    return listmodel.ListModel(sorted(ly.words.contexts))
+
+@util.cached
+def lilypond_grobs():
+    return listmodel.ListModel(ly.data.grobs())
+
+@util.cached
+def lilypond_contexts_and_grobs():
+    return listmodel.ListModel(
+        sorted(ly.words.contexts) + ly.data.grobs())
+
+@util.cached
+def lilypond_context_properties():
+    return listmodel.ListModel(
+        ly.data.context_properties())
+
+@util.cached
+def lilypond_contexts_and_properties():
+    return listmodel.ListModel(
+        sorted(ly.words.contexts) + ly.data.context_properties())
+
+@util.cached
+def lilypond_context_contents():
+    return listmodel.ListModel(sorted(itertools.chain(
+        util.make_cmds(ly.words.contexts),
+        ly.data.context_properties(),
+        util.make_cmds(cmds_context),
+        )), edit = util.cmd_or_var)
+
+@util.cached
+def lilypond_with_contents():
+    return listmodel.ListModel(sorted(itertools.chain(
+        ly.data.context_properties(),
+        util.make_cmds(cmds_with),
+        )), edit = util.cmd_or_var)
+
+@util.cached
+def lilypond_toplevel():
+    return listmodel.ListModel(sorted(itertools.chain(util.make_cmds(
+        toplevel + everywhere + inputmodes + markup + start_music + tweaks
+        + modes + blocks
+        ), toplevel_variables)), edit = util.cmd_or_var)
+
+@util.cached
+def lilypond_book():
+    return listmodel.ListModel(book, display = util.command)
+
+@util.cached
+def lilypond_bookpart():
+    return listmodel.ListModel(bookpart, display = util.command)
+
+@util.cached
+def lilypond_score():
+    return listmodel.ListModel(score, display = util.command)
+
+@util.cached
+def lilypond_engravers():
+    return listmodel.ListModel(ly.data.engravers())
+
+@util.cached
 def lilypond_grob_properties(grob, hash_quote=True):
     display = (lambda item: "#'" + item) if hash_quote else (lambda item: item)
     return listmodel.ListModel(ly.data.grob_properties(grob),
         display = display)
 
-lilypond_all_grob_properties = listmodel.ListModel(ly.data.all_grob_properties(),
-    display = lambda item: "#'" + item)
-
-lilypond_all_grob_properties_and_grob_names = listmodel.ListModel(
-    ly.data.all_grob_properties() + ly.data.grobs())
-
-lilypond_markup_properties = listmodel.ListModel(
-    sorted(set(sum(map(ly.data.grob_interface_properties, (
-        # see lilypond docs about \markup \override
-        'font-interface',
-        'text-interface',
-        'instrument-specific-markup-interface',
-    )), []))))
-
-lilypond_modes = listmodel.ListModel(ly.words.modes, display = util.command)
-
-lilypond_clefs = listmodel.ListModel(ly.words.clefs_plain)
-
-lilypond_accidental_styles = listmodel.ListModel(ly.words.accidentalstyles)
-
-lilypond_accidental_styles_contexts = listmodel.ListModel(
-    ly.words.contexts + ly.words.accidentalstyles)
-
-lilypond_repeat_types = listmodel.ListModel(ly.words.repeat_types)
-
-music_glyphs = listmodel.ListModel(ly.data.music_glyphs())
-
-midi_instruments = listmodel.ListModel(ly.words.midi_instruments)
-
-language_names = listmodel.ListModel(sorted(ly.pitch.pitchInfo))
-
+@util.cached
+def lilypond_all_grob_properties():
+    return listmodel.ListModel(ly.data.all_grob_properties(),
+        display = lambda item: "#'" + item)
+
+@util.cached
+def lilypond_all_grob_properties_and_grob_names():
+    return listmodel.ListModel(
+        ly.data.all_grob_properties() + ly.data.grobs())
+
+@util.cached
+def lilypond_markup_properties():
+    return listmodel.ListModel(
+        sorted(set(sum(map(ly.data.grob_interface_properties, (
+            # see lilypond docs about \markup \override
+            'font-interface',
+            'text-interface',
+            'instrument-specific-markup-interface',
+        )), []))))
+
+@util.cached
+def lilypond_modes():
+    return listmodel.ListModel(ly.words.modes, display = util.command)
+
+@util.cached
+def lilypond_clefs():
+    return listmodel.ListModel(ly.words.clefs_plain)
+
+@util.cached
+def lilypond_accidental_styles():
+    return listmodel.ListModel(ly.words.accidentalstyles)
+
+@util.cached
+def lilypond_accidental_styles_contexts():
+    return listmodel.ListModel(
+        ly.words.contexts + ly.words.accidentalstyles)
+
+@util.cached
+def lilypond_repeat_types():
+    return listmodel.ListModel(ly.words.repeat_types)
+
+@util.cached
+def music_glyphs():
+    return listmodel.ListModel(ly.data.music_glyphs())
+
+@util.cached
+def midi_instruments():
+    return listmodel.ListModel(ly.words.midi_instruments)
+
+@util.cached
+def language_names():
+    return listmodel.ListModel(sorted(ly.pitch.pitchInfo))
+
+@util.cached
 def font_names():
-    model = listmodel.ListModel(sorted(QFontDatabase().families()))
+    """Returns the model with the names of the installed font families.
+    
+    The names are remembered in a file in the cache directory, so they are
+    not requested from the font database on the first completion in every
+    session. Instead, the model is updated from the font database when the
+    application is idle.
+    
+    """
+    names = _cached_font_names()
+    if names is None:
+        names = _font_names()
+        _save_font_names(names)
+    else:
+        QTimer.singleShot(0, _update_font_names)
+    model = listmodel.ListModel(names)
     model.setRoleFunction(Qt.FontRole, QFont)
     return model
 
+def _font_names():
+    """Returns the sorted list of font families from the font database."""
+    return sorted(QFontDatabase().families())
+
+def _font_names_file():
+    """Returns the filename where the font names are remembered."""
+    return os.path.join(qutil.cachedir("autocomplete"), "fontnames.txt")
+
+def _cached_font_names():
+    """Returns the remembered list of font names, or None."""
+    try:
+        with open(_font_names_file(), 'rb') as f:
+            return f.read().decode('utf-8').splitlines()
+    except (IOError, OSError, UnicodeError):
+        return None
+
+def _save_font_names(names):
+    """Remembers the list of font names, ignoring errors."""
+    try:
+        with open(_font_names_file(), 'wb') as f:
+            f.write('\n'.join(names).encode('utf-8'))
+    except (IOError, OSError):
+        pass
+
+def _update_font_names():
+    """Updates the font names model from the font database if needed."""
+    names = _font_names()
+    model = font_names()
+    if names != model._data:
+        model.beginResetModel()
+        model._data = names
+        model.endResetModel()
+        _save_font_names(names)
+
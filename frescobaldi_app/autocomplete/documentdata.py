@@ -19,6 +19,10 @@
 
 """
 Completions data harvested from a Document.
+
+The models returned by DocumentDataSource contain sorted lists, and have
+their 'sorted' attribute set to True, so the completer can find the
+completions for a prefix using a binary search.
 """
 
 from __future__ import unicode_literals
@@ -32,8 +36,28 @@ import ly.words
 import ly.data
 
 from . import completiondata
+from . import fileindex
 from . import harvest
 from . import util
+from . import wordindex
+
+
+# sorted static vocabularies, merged with the harvested names
+_score = wordindex.vocabulary(completiondata.score)
+_bookpart = wordindex.vocabulary(completiondata.bookpart)
+_book = wordindex.vocabulary(completiondata.book)
+_markup = wordindex.vocabulary(util.make_cmds(ly.words.markupcommands))
+_music = wordindex.vocabulary(
+    ly.words.lilypond_keywords,
+    ly.words.lilypond_music_commands,
+    ly.words.articulations,
+    ly.words.ornaments,
+    ly.words.fermatas,
+    ly.words.instrument_scripts,
+    ly.words.repeat_scripts)
+_lyric = wordindex.vocabulary(
+    ('set stanza = ', 'set', 'override', 'markup', 'notemode', 'repeat'))
+_scheme = None  # built on first use
 
 
 def doc(document):
@@ -41,80 +65,96 @@ def doc(document):
     return DocumentDataSource.instance(document)
 
 
+def sorted_model(words, display=listmodel.display):
+    """Returns a ListModel for the sorted list of words.
+    
+    The model's sorted attribute is set to True.
+    
+    """
+    model = listmodel.ListModel(words, display=display)
+    model.sorted = True
+    return model
+
+
 class DocumentDataSource(plugin.DocumentPlugin):
-    @util.keep
+    def __init__(self, document):
+        self._words = None
+        self._schemewords = None
+    
+    def _cached(self, vocabulary, cache, build):
+        """Returns the cached model if vocabulary did not change, else None.
+        
+        cache is None or a (vocabulary, revision, model) tuple. build is called
+        to create a new model if needed. Returns the cache tuple.
+        
+        """
+        if cache and cache[0] is vocabulary and cache[1] == vocabulary.revision:
+            return cache
+        return vocabulary, vocabulary.revision, build()
+    
     def words(self):
         """Returns the list of words in comments, markup etc."""
-        return listmodel.ListModel(
-            sorted(set(harvest.words(self.document()))))
+        v = wordindex.index(self.document()).words()
+        self._words = self._cached(v, self._words,
+            lambda: sorted_model(list(v.words())))
+        return self._words[2]
 
-    @util.keep
     def schemewords(self):
         """Scheme names, including those harvested from document."""
-        schemewords = set(itertools.chain(
-            ly.data.all_scheme_words(),
-            (unicode(t)
-                for t in harvest.schemewords(self.document())
-                if len(t) > 2),
-            ))
-        return listmodel.ListModel(sorted(schemewords))
+        global _scheme
+        if _scheme is None:
+            _scheme = wordindex.vocabulary(ly.data.all_scheme_words())
+        v = wordindex.index(self.document()).schemewords()
+        self._schemewords = self._cached(v, self._schemewords,
+            lambda: sorted_model(wordindex.merge(_scheme, v.words())))
+        return self._schemewords[2]
 
     @util.keep
     def markup(self, cursor):
         """Completes markup commands and normal text from the document."""
-        return listmodel.ListModel(
-            ['\\' + w for w in sorted(ly.words.markupcommands)]
-            + [ '\\' + w for w in sorted(set(itertools.chain(
+        return sorted_model(wordindex.merge(
+            _markup,
+            sorted(set(util.make_cmds(itertools.chain(
                 harvest.markup_commands(cursor),
-                harvest.include_markup_commands(cursor))))]
-            + sorted(set(harvest.words(self.document()))))
+                harvest.include_markup_commands(cursor))))),
+            wordindex.index(self.document()).words().words()))
+
+    def commands(self, vocabulary, cursor):
+        """Returns a model with the vocabulary and the names up to the cursor.
+        
+        The names are harvested from the document and its included files.
+        
+        """
+        return sorted_model(wordindex.merge(vocabulary,
+            sorted(set(itertools.chain(
+                harvest.include_identifiers(cursor),
+                harvest.names(cursor))))), display = util.command)
 
     @util.keep
     def scorecommands(self, cursor):
         """Stuff inside \\score { }. """
-        return listmodel.ListModel(sorted(set(itertools.chain(
-            completiondata.score,
-            harvest.include_identifiers(cursor),
-            harvest.names(cursor)))), display = util.command)
+        return self.commands(_score, cursor)
     
     @util.keep
     def bookpartcommands(self, cursor):
         """Stuff inside \\bookpart { }. """
-        return listmodel.ListModel(sorted(set(itertools.chain(
-            completiondata.bookpart,
-            harvest.include_identifiers(cursor),
-            harvest.names(cursor)))), display = util.command)
+        return self.commands(_bookpart, cursor)
     
     @util.keep
     def bookcommands(self, cursor):
         """Stuff inside \\book { }. """
-        return listmodel.ListModel(sorted(set(itertools.chain(
-            completiondata.book,
-            harvest.include_identifiers(cursor),
-            harvest.names(cursor)))), display = util.command)
+        return self.commands(_book, cursor)
     
     
     @util.keep
     def musiccommands(self, cursor):
-        return listmodel.ListModel(sorted(set(itertools.chain(
-            ly.words.lilypond_keywords,
-            ly.words.lilypond_music_commands,
-            ly.words.articulations,
-            ly.words.ornaments,
-            ly.words.fermatas,
-            ly.words.instrument_scripts,
-            ly.words.repeat_scripts,
-            harvest.include_identifiers(cursor),
-            harvest.names(cursor)))), display = util.command)
+        return self.commands(_music, cursor)
 
     @util.keep
     def lyriccommands(self, cursor):
-        return listmodel.ListModel(sorted(set(itertools.chain(
-            ('set stanza = ', 'set', 'override', 'markup', 'notemode', 'repeat'),
-            harvest.include_identifiers(cursor),
-            harvest.names(cursor)))), display = util.command)
+        return self.commands(_lyric, cursor)
 
-    def includenames(self, cursor, directory=None):
+    def includenames(self, cursor, directory=None, name=None):
         """Finds files relative to the directory of the cursor's document.
         
         If the document has a local filename, looks in that directory,
@@ -123,28 +163,35 @@ class DocumentDataSource(plugin.DocumentPlugin):
         Then looks recursively in the user-set include paths, 
         and finally in LilyPond's own ly/ folder.
         
+        The directories are listed using the fileindex, which caches the
+        names. If name (the start of the name that is being typed) is given,
+        the subdirectories starting with it are indexed in the background,
+        in case the user goes on to complete a name in one of them.
+        
         """
-        names = []
+        lists = []
+        subdirs = []
+        def names(basedir, reldir):
+            """Lists the names in basedir, prepending reldir if not empty."""
+            filenames = get_filenames(basedir, True)
+            result = [os.path.join(reldir, f) if reldir else f
+                      for f in filenames]
+            if name:
+                subdirs.extend(os.path.join(basedir, f) for f in filenames
+                               if f.endswith(os.sep) and f.startswith(name))
+            lists.append(result)
+        
+        reldir = directory if directory else ""
+        
         # names in current dir
         path = self.document().url().toLocalFile()
         if path:
-            basedir = os.path.dirname(path)
-            if directory:
-                basedir = os.path.join(basedir, directory)
-                names.extend(sorted(os.path.join(directory, f)
-                    for f in get_filenames(basedir, True)))
-            else:
-                names.extend(sorted(get_filenames(basedir, True)))
+            names(os.path.join(os.path.dirname(path), reldir), reldir)
         
-        # names in specified include paths
+        # names in specified include paths, relative to the include path root
         import documentinfo
         for basedir in documentinfo.info(self.document()).includepath():
-            
-            # store dir relative to specified include path root
-            reldir = directory if directory else ""
-            # look for files in the current relative directory
-            for f in sorted(get_filenames(os.path.join(basedir, reldir), True)):
-                names.append(os.path.join(reldir, f))
+            names(os.path.join(basedir, reldir), reldir)
         
         # names from LilyPond itself
         import engrave.command
@@ -152,29 +199,21 @@ class DocumentDataSource(plugin.DocumentPlugin):
         if datadir:
             basedir = os.path.join(datadir, 'ly')
             # get the filenames but avoid the -init files here
-            names.extend(sorted(f for f in get_filenames(basedir)
+            lists.append([f for f in get_filenames(basedir)
                 if not f.endswith('init.ly')
-                and f.islower()))
+                and f.islower()])
         
-        return listmodel.ListModel(names)
+        fileindex.prefetch(subdirs)
+        return sorted_model(wordindex.merge(*lists))
 
 
 def get_filenames(path, directories = False):
-    try:
-        for root, dirs, files in os.walk(path):
-            for f in files:
-                if f and f[0] not in '.~':
-                    name, ext = os.path.splitext(f)
-                    if ext.lower() in ('.ly', '.lyi', '.ily'):
-                        yield f
-            if directories:
-                for f in dirs:
-                    if f and not f.startswith('.'):
-                        yield f + os.sep
-            return
-    except UnicodeDecodeError:
-        # this only happens when there are filenames in the wrong encoding,
-        # but never ever bug the user about this while typing :)
-        pass
+    """Returns a sorted list of the LilyPond files in the directory path.
+    
+    If directories is True, the subdirectories are also returned, with
+    os.sep appended. The names are cached in the fileindex.
+    
+    """
+    return fileindex.filenames(path, directories)
 
 
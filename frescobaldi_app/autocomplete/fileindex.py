@@ -0,0 +1,184 @@
+# This file is part of the Frescobaldi project, http://www.frescobaldi.org/
+#
+# Copyright (c) 2011 - 2014 by Wilbert Berendsen
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# See http://www.gnu.org/licenses/ for more information.
+
+"""
+A cached index of the LilyPond files in directories, for include completion.
+
+For every directory that is asked for, the sorted lists of LilyPond files and
+subdirectories are kept. The directory is watched using a QFileSystemWatcher,
+and when it changes, it is scanned again in the background.
+
+Use prefetch() to scan directories in the background before they are needed,
+e.g. a subdirectory the user is about to complete a name in.
+
+The directories are scanned one at a time, by a Scanner thread, the other
+directories wait in a queue.
+
+"""
+
+from __future__ import unicode_literals
+
+import os
+
+from PyQt4.QtCore import QFileSystemWatcher, QThread
+
+
+# the file extensions to list
+extensions = ('.ly', '.lyi', '.ily')
+
+# path: (files, directories) tuples of sorted names
+_cache = {}
+
+# paths waiting to be scanned in the background
+_queue = []
+
+# the running Scanner, if any
+_scanner = None
+
+# the QFileSystemWatcher, created on first use
+_watcher = None
+
+
+def filenames(path, directories=False):
+    """Returns a sorted list of the LilyPond files in the directory path.
+    
+    If directories is True, the names of subdirectories (with os.sep
+    appended) are also in the list.
+    
+    If the directory was not yet indexed, it is scanned immediately.
+    
+    """
+    path = os.path.normpath(path)
+    try:
+        files, dirs = _cache[path]
+    except KeyError:
+        files, dirs = scan(path)
+        _store(path, files, dirs)
+    return sorted(files + dirs) if directories else list(files)
+
+
+def prefetch(paths):
+    """Scans the directories that are not yet indexed in the background."""
+    for path in map(os.path.normpath, paths):
+        if path not in _cache:
+            _schedule(path)
+
+
+def scan(path):
+    """Returns a (files, directories) tuple of sorted names in the directory.
+    
+    Hidden names and backup files are skipped. Returns empty tuples if the
+    directory can't be read. This function can be called from a background
+    thread.
+    
+    """
+    files = []
+    dirs = []
+    try:
+        for f in os.listdir(path):
+            if f and f[0] not in '.~':
+                if os.path.isdir(os.path.join(path, f)):
+                    dirs.append(f + os.sep)
+                elif os.path.splitext(f)[1].lower() in extensions:
+                    files.append(f)
+    except (OSError, UnicodeDecodeError):
+        # an unreadable directory or filenames in the wrong encoding,
+        # but never ever bug the user about this while typing :)
+        pass
+    return tuple(sorted(files)), tuple(sorted(dirs))
+
+
+def _store(path, files, dirs):
+    """Stores the scanned names and watches the directory for changes.
+    
+    Directories that could not be watched (e.g. because they do not exist)
+    are not cached, so they are scanned again on the next request.
+    
+    """
+    global _watcher
+    if _watcher is None:
+        _watcher = QFileSystemWatcher()
+        _watcher.directoryChanged.connect(_directoryChanged)
+    if path not in _watcher.directories():
+        if not os.path.isdir(path):
+            return
+        _watcher.addPath(path)
+        if path not in _watcher.directories():
+            return
+    _cache[path] = (files, dirs)
+
+
+def _directoryChanged(path):
+    """Called when a watched directory changes, scans it again."""
+    _cache.pop(path, None)
+    if _scanner and _scanner.path == path:
+        _scanner.changed = True
+    else:
+        _schedule(path)
+
+
+def _schedule(path):
+    """Puts the directory in the queue to be scanned in the background."""
+    if path not in _queue and not (_scanner and _scanner.path == path):
+        _queue.append(path)
+    _checkStart()
+
+
+def _checkStart():
+    """Starts scanning the next directory if no Scanner is running.
+    
+    Directories that have been indexed in the meantime (by filenames()) are
+    skipped.
+    
+    """
+    global _scanner
+    while _queue and not _scanner:
+        path = _queue.pop(0)
+        if path not in _cache:
+            _scanner = Scanner(path)
+
+
+class Scanner(QThread):
+    """Scans a directory in a background thread and stores the result.
+    
+    If the directory changes while scanning, the changed attribute is set to
+    True and the directory is scanned again.
+    
+    """
+    def __init__(self, path):
+        super(Scanner, self).__init__()
+        self.path = path
+        self.result = (), ()
+        self.changed = False
+        self.finished.connect(self.slotFinished)
+        self.start()
+    
+    def run(self):
+        """Main method of this thread, called by Qt on start()."""
+        self.result = scan(self.path)
+    
+    def slotFinished(self):
+        """Called when the thread has completed."""
+        global _scanner
+        _scanner = None
+        if self.changed:
+            _queue.insert(0, self.path)
+        else:
+            _store(self.path, *self.result)
+        _checkStart()
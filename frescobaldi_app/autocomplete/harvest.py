@@ -51,7 +51,12 @@ def markup_commands(cursor):
     
 def schemewords(document):
     """Harvests all schemewords from the document."""
-    for t in tokeniter.all_tokens(document):
+    return token_schemewords(tokeniter.all_tokens(document))
+
+
+def token_schemewords(tokens):
+    """Harvests all schemewords from the tokens."""
+    for t in tokens:
         if type(t) is ly.lex.scheme.Word:
             yield t
 
@@ -79,7 +84,12 @@ _word_types = (
 
 def words(document):
     """Harvests words from strings, lyrics, markup and comments."""
-    for t in tokeniter.all_tokens(document):
+    return token_words(tokeniter.all_tokens(document))
+
+
+def token_words(tokens):
+    """Harvests words from the strings, lyrics, markup and comments tokens."""
+    for t in tokens:
         if isinstance(t, _word_types):
             for m in _words(t):
                 yield m.group()
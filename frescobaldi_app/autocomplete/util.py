@@ -48,6 +48,23 @@ def keep(f):
     return decorator
 
 
+def cached(f):
+    """Decorator that remembers the return value for every set of arguments.
+    
+    Use this for functions that build a model on first use.
+    
+    """
+    _cache = {}
+    @functools.wraps(f)
+    def decorator(*args):
+        try:
+            return _cache[args]
+        except KeyError:
+            ret = _cache[args] = f(*args)
+            return ret
+    return decorator
+
+
 # helper functions for displaying data from models
 def command(item):
     """Prepends '\\' to item."""
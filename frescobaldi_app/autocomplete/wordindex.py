@@ -0,0 +1,195 @@
+# This file is part of the Frescobaldi project, http://www.frescobaldi.org/
+#
+# Copyright (c) 2011 - 2014 by Wilbert Berendsen
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# See http://www.gnu.org/licenses/ for more information.
+
+"""
+An incrementally maintained index of the words in a Document.
+
+The WordIndex keeps the words and scheme words harvested from every block,
+together with the tokens they were harvested from. When the document changes,
+only the changed blocks (and the blocks after them whose tokens changed
+because the lexer state changed) are harvested again.
+
+Also some helper functions are here to build and merge sorted word lists.
+
+"""
+
+from __future__ import unicode_literals
+
+import bisect
+import collections
+import heapq
+
+import plugin
+import tokeniter
+import variables
+
+from . import harvest
+
+
+def index(document):
+    """Returns the WordIndex for the specified Document."""
+    return WordIndex.instance(document)
+
+
+class Vocabulary(object):
+    """A sorted list of unique words with the number of times each occurs.
+    
+    The words() method returns the sorted list; it must not be altered.
+    The revision attribute is increased every time a word is added to or
+    removed from the list.
+    
+    """
+    def __init__(self):
+        self._count = collections.Counter()
+        self._words = []
+        self.revision = 0
+    
+    def words(self):
+        """Returns the sorted list of words."""
+        return self._words
+    
+    def count(self, word):
+        """Returns how many times the word occurs."""
+        return self._count[word]
+    
+    def add(self, words):
+        """Adds the words."""
+        count = self._count
+        for w in words:
+            if not count[w]:
+                bisect.insort(self._words, w)
+                self.revision += 1
+            count[w] += 1
+    
+    def remove(self, words):
+        """Removes the words (that must have been added before)."""
+        count = self._count
+        for w in words:
+            count[w] -= 1
+            if not count[w]:
+                del count[w]
+                del self._words[bisect.bisect_left(self._words, w)]
+                self.revision += 1
+
+
+class WordIndex(plugin.DocumentPlugin):
+    """Maintains the words and scheme words in a Document.
+    
+    For every block a (tokens, words, schemewords) tuple is stored, or None if
+    the block needs to be harvested again. The update() method harvests those
+    blocks, and is called by words() and schemewords().
+    
+    """
+    def __init__(self, document):
+        self._blocks = None
+        self._changed = False
+        self._words = Vocabulary()
+        self._schemewords = Vocabulary()
+        document.contentsChange.connect(self.slotContentsChange)
+        document.loaded.connect(self.reset)
+        document.closed.connect(self.reset)
+        # a mode change can alter the tokens of all blocks
+        variables.manager(document).changed.connect(self.reset)
+    
+    def reset(self):
+        """Forgets everything, the whole document will be harvested again."""
+        self._blocks = None
+        self._words = Vocabulary()
+        self._schemewords = Vocabulary()
+    
+    def slotContentsChange(self, position, removed, added):
+        """Called when the document changes, marks the changed blocks."""
+        if self._blocks is None:
+            return
+        doc = self.document()
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(position + added).blockNumber()
+        if last == -1:
+            last = doc.blockCount() - 1
+        old_last = last + len(self._blocks) - doc.blockCount()
+        if first == -1 or old_last < first - 1 or old_last >= len(self._blocks):
+            self.reset()
+            return
+        for entry in self._blocks[first:old_last+1]:
+            if entry:
+                self._words.remove(entry[1])
+                self._schemewords.remove(entry[2])
+        self._blocks[first:old_last+1] = [None] * (last - first + 1)
+        self._changed = True
+    
+    def update(self):
+        """Harvests the blocks that are new or changed."""
+        doc = self.document()
+        if self._blocks is None:
+            self._blocks = [None] * doc.blockCount()
+            self._changed = True
+        if not self._changed:
+            return
+        blocks = self._blocks
+        i = 0
+        try:
+            while True:
+                i = blocks.index(None, i)
+                block = doc.findBlockByNumber(i)
+                while block.isValid():
+                    tokens = tokeniter.tokens(block)
+                    entry = blocks[i]
+                    if entry is not None:
+                        # the empty tuple is a singleton, so an empty block
+                        # could have been retokenized without us knowing
+                        if tokens and entry[0] is tokens:
+                            break
+                        self._words.remove(entry[1])
+                        self._schemewords.remove(entry[2])
+                    words = tuple(harvest.token_words(tokens))
+                    schemewords = tuple(unicode(t)
+                        for t in harvest.token_schemewords(tokens)
+                        if len(t) > 2)
+                    blocks[i] = (tokens, words, schemewords)
+                    self._words.add(words)
+                    self._schemewords.add(schemewords)
+                    block = block.next()
+                    i += 1
+        except ValueError:
+            pass
+        self._changed = False
+    
+    def words(self):
+        """Returns the Vocabulary of words in comments, markup, lyrics etc."""
+        self.update()
+        return self._words
+    
+    def schemewords(self):
+        """Returns the Vocabulary of scheme words in the document."""
+        self.update()
+        return self._schemewords
+
+
+def vocabulary(*iterables):
+    """Returns a sorted tuple of the unique words from all iterables."""
+    return tuple(sorted(set(w for i in iterables for w in i)))
+
+
+def merge(*lists):
+    """Returns a sorted list of the unique words from sorted lists."""
+    result = []
+    for w in heapq.merge(*lists):
+        if not result or w != result[-1]:
+            result.append(w)
+    return result
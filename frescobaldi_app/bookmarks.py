@@ -30,7 +30,6 @@ and 'error' (marking a line containing an error).
 
 from __future__ import unicode_literals
 
-import bisect
 import json
 
 from PyQt4.QtGui import QTextCursor
@@ -58,6 +57,10 @@ class Bookmarks(plugin.DocumentPlugin):
     
     The marks are stored in the metainfo for the Document.
     
+    The marks of every type are kept in a list sorted by position. As edits
+    in the document never change the order of the QTextCursors, the lists
+    stay sorted, and marks can be found using a binary search.
+    
     """
     marksChanged = signals.Signal()
     
@@ -80,62 +83,69 @@ class Bookmarks(plugin.DocumentPlugin):
         
         return self._marks[type] if type else self._marks
     
-    def setMark(self, linenum, type):
-        """Marks the given line number with a mark of the given type."""
-        nums = [mark.blockNumber() for mark in self._marks[type]]
-        if linenum in nums:
-            return
-        index = bisect.bisect_left(nums, linenum)
+    def marksInRange(self, first, last, type=None):
+        """Returns the marks on the lines first to last (inclusive), sorted.
+        
+        If type is None, the marks of all types are returned.
+        
+        """
+        names = types if type is None else (type,)
+        marks = []
+        for name in names:
+            m = self._marks[name]
+            marks += m[_bisect_left(m, first):_bisect_right(m, last)]
+        if len(names) > 1:
+            marks.sort(key=lambda mark: mark.position())
+        return marks
+    
+    def _newMark(self, linenum):
+        """Returns a new mark (QTextCursor) at the start of the given line."""
         mark = QTextCursor(self.document().findBlockByNumber(linenum))
         try:
             # only available in very recent PyQt4 versions
             mark.setKeepPositionOnInsert(True)
         except AttributeError:
             pass
-        self._marks[type].insert(index, mark)
+        return mark
+    
+    def setMark(self, linenum, type):
+        """Marks the given line number with a mark of the given type."""
+        marks = self._marks[type]
+        index = _bisect_left(marks, linenum)
+        if index < len(marks) and marks[index].blockNumber() == linenum:
+            return
+        marks.insert(index, self._newMark(linenum))
         self.marksChanged()
         
     def unsetMark(self, linenum, type):
         """Removes a mark of the given type on the given line."""
-        nums = [mark.blockNumber() for mark in self._marks[type]]
-        if linenum in nums:
-            # remove double occurrences
-            while True:
-                index = bisect.bisect_left(nums, linenum)
-                del self._marks[type][index]
-                del nums[index]
-                if linenum not in nums:
-                    break
+        marks = self._marks[type]
+        # remove double occurrences
+        index = _bisect_left(marks, linenum)
+        end = _bisect_right(marks, linenum)
+        if index < end:
+            del marks[index:end]
             self.marksChanged()
         
     def toggleMark(self, linenum, type):
         """Toggles the mark of the given type on the given line."""
-        nums = [mark.blockNumber() for mark in self._marks[type]]
-        index = bisect.bisect_left(nums, linenum)
-        if linenum in nums:
+        marks = self._marks[type]
+        index = _bisect_left(marks, linenum)
+        end = _bisect_right(marks, linenum)
+        if index < end:
             # remove double occurrences
-            while True:
-                del self._marks[type][index]
-                del nums[index]
-                if linenum not in nums:
-                    break
-                index = bisect.bisect_left(nums, linenum)
+            del marks[index:end]
         else:
-            mark = QTextCursor(self.document().findBlockByNumber(linenum))
-            try:
-                # only available in very recent PyQt4 versions
-                mark.setKeepPositionOnInsert(True)
-            except AttributeError:
-                pass
-            self._marks[type].insert(index, mark)
+            marks.insert(index, self._newMark(linenum))
         self.marksChanged()
 
     def hasMark(self, linenum, type=None):
         """Returns True if the line has a mark (of the given type if specified) else False."""
         for type in types if type is None else (type,):
-            for mark in self._marks[type]:
-                if mark.blockNumber() == linenum:
-                    return True
+            marks = self._marks[type]
+            index = _bisect_left(marks, linenum)
+            if index < len(marks) and marks[index].blockNumber() == linenum:
+                return True
         return False
         
     def clear(self, type=None):
@@ -149,33 +159,27 @@ class Bookmarks(plugin.DocumentPlugin):
 
     def nextMark(self, cursor, type=None):
         """Finds the first mark after the cursor (of the type if specified)."""
-        if type is None:
-            marks = []
-            for type in types:
-                marks += self._marks[type]
-            # sort the marks on line number
-            marks.sort(key=lambda mark: mark.blockNumber())
-        else:
+        linenum = cursor.blockNumber()
+        found = []
+        for type in types if type is None else (type,):
             marks = self._marks[type]
-        nums = [mark.blockNumber() for mark in marks]
-        index = bisect.bisect_right(nums, cursor.blockNumber())
-        if index < len(nums):
-            return QTextCursor(marks[index].block())
+            index = _bisect_right(marks, linenum)
+            if index < len(marks):
+                found.append(marks[index].block())
+        if found:
+            return QTextCursor(min(found, key=lambda block: block.blockNumber()))
         
     def previousMark(self, cursor, type=None):
         """Finds the first mark before the cursor (of the type if specified)."""
-        if type is None:
-            marks = []
-            for type in types:
-                marks += self._marks[type]
-            # sort the marks on line number
-            marks.sort(key=lambda mark: mark.blockNumber())
-        else:
+        linenum = cursor.blockNumber()
+        found = []
+        for type in types if type is None else (type,):
             marks = self._marks[type]
-        nums = [mark.blockNumber() for mark in marks]
-        index = bisect.bisect_left(nums, cursor.blockNumber())
-        if index > 0:
-            return QTextCursor(marks[index-1].block())
+            index = _bisect_left(marks, linenum)
+            if index > 0:
+                found.append(marks[index-1].block())
+        if found:
+            return QTextCursor(max(found, key=lambda block: block.blockNumber()))
 
     def load(self):
         """Loads the marks from the metainfo."""
@@ -186,7 +190,8 @@ class Bookmarks(plugin.DocumentPlugin):
         except ValueError:
             return # No JSON object could be decoded
         for type in types:
-            self._marks[type] = [QTextCursor(self.document().findBlockByNumber(num)) for num in d.get(type, [])]
+            self._marks[type] = [self._newMark(num)
+                                 for num in sorted(set(d.get(type, [])))]
         self.marksChanged()
         
     def save(self):
@@ -196,8 +201,32 @@ class Bookmarks(plugin.DocumentPlugin):
             d[type] = lines = []
             for mark in self._marks[type]:
                 linenum = mark.blockNumber()
-                if linenum not in lines:
+                if not lines or linenum != lines[-1]:
                     lines.append(linenum)
         metainfo.info(self.document()).bookmarks = json.dumps(d)
 
 
+def _bisect_left(marks, linenum):
+    """Returns the index of the first mark in the sorted list on or after linenum."""
+    lo, hi = 0, len(marks)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if marks[mid].blockNumber() < linenum:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _bisect_right(marks, linenum):
+    """Returns the index of the first mark in the sorted list after linenum."""
+    lo, hi = 0, len(marks)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if linenum < marks[mid].blockNumber():
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
@@ -28,17 +28,21 @@ text, and applying that diff.
 from __future__ import unicode_literals
 
 import difflib
+import time
 
 import cursortools
 
 
-def insert_text(cursor, text):
+def insert_text(cursor, text, timeout=2.0):
     """Replaces selected text of a QTextCursor.
     
     This is done without erasing all the other QTextCursor instances that could
     exist in the selected range. It works by making a diff between the
     existing selection and the replacement text, and applying that diff.
     
+    The timeout (in seconds) limits the time spent on the character-level 
+    diff of changed lines, see diff().
+    
     """
     if not cursor.hasSelection() or text == "":
         cursor.insertText(text)
@@ -48,13 +52,11 @@ def insert_text(cursor, text):
     new_pos = start + len(text)
     
     old = cursor.selection().toPlainText()
-    diff = difflib.SequenceMatcher(None, old, text).get_opcodes()
     
     # make a list of edits
     edits = sorted(
         ((start + i1, start + i2, text[j1:j2])
-         for tag, i1, i2, j1, j2 in diff
-         if tag != 'equal'),
+         for i1, i2, j1, j2 in diff(old, text, timeout)),
         reverse = True)
     
     # perform the edits
@@ -66,3 +68,161 @@ def insert_text(cursor, text):
     cursor.setPosition(new_pos)
 
 
+def diff(old, new, timeout=None, maxsize=10000):
+    """Yield (i1, i2, j1, j2) tuples describing how to change old into new.
+    
+    For every tuple, old[i1:i2] should be replaced with new[j1:j2]. The
+    tuples are yielded in ascending order and do not overlap.
+    
+    First the lines are compared, then the characters of the changed lines.
+    A group of changed lines is compared line by line if the number of lines
+    did not change, or else as a whole. Lines or groups longer than maxsize
+    characters are replaced as a whole.
+    
+    If timeout is given (in seconds) and the diff takes longer, the remaining
+    changed lines are replaced as a whole, without comparing the characters.
+    
+    """
+    now = time.time()
+    deadline = line_deadline = None
+    if timeout is not None:
+        deadline = now + timeout
+        line_deadline = now + timeout / 2.0
+    
+    old_lines = old.splitlines(True)
+    new_lines = new.splitlines(True)
+    old_pos = _offsets(old_lines)
+    new_pos = _offsets(new_lines)
+    
+    # compare the lines using numbers; the same text gets the same number
+    numbers = {}
+    a = [numbers.setdefault(line, len(numbers)) for line in old_lines]
+    b = [numbers.setdefault(line, len(numbers)) for line in new_lines]
+    
+    for i1, i2, j1, j2 in line_diff(a, b, line_deadline):
+        o1, o2, n1, n2 = old_pos[i1], old_pos[i2], new_pos[j1], new_pos[j2]
+        if ((deadline is not None and time.time() > deadline)
+            or i1 == i2 or j1 == j2):
+            yield o1, o2, n1, n2
+        elif i2 - i1 == j2 - j1:
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                p1, p2 = old_pos[i], old_pos[i+1]
+                q1, q2 = new_pos[j], new_pos[j+1]
+                if deadline is not None and time.time() > deadline:
+                    yield p1, o2, q1, n2
+                    break
+                elif p2 - p1 <= maxsize and q2 - q1 <= maxsize:
+                    for change in _char_diff(old, new, p1, p2, q1, q2):
+                        yield change
+                else:
+                    yield p1, p2, q1, q2
+        elif o2 - o1 <= maxsize and n2 - n1 <= maxsize:
+            for change in _char_diff(old, new, o1, o2, n1, n2):
+                yield change
+        else:
+            yield o1, o2, n1, n2
+
+
+def line_diff(a, b, deadline=None, max_d=1000):
+    """Yield (i1, i2, j1, j2) tuples describing how to change list a into b.
+    
+    For every tuple, a[i1:i2] should be replaced with b[j1:j2].
+    
+    The common items at the start and the end are skipped, and the rest is
+    compared using the Myers algorithm, which is fast when there are not 
+    many differences, also if the lists contain many equal items (like a 
+    document with many equal lines). If there are more than max_d 
+    differences, or the deadline (a time.time() value) is passed, the rest 
+    is replaced as a whole.
+    
+    """
+    start, end_a, end_b = 0, len(a), len(b)
+    while start < end_a and start < end_b and a[start] == b[start]:
+        start += 1
+    while end_a > start and end_b > start and a[end_a-1] == b[end_b-1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    
+    blocks = _myers_matching_blocks(a, b, max_d, deadline) or []
+    
+    i = j = 0
+    for i1, j1, size in blocks + [(len(a), len(b), 0)]:
+        if i < i1 or j < j1:
+            yield start + i, start + i1, start + j, start + j1
+        i, j = i1 + size, j1 + size
+
+
+def _myers_matching_blocks(a, b, max_d, deadline):
+    """Return a list of (i, j, size) tuples with the matching items of a and b.
+    
+    Returns None if there are more than max_d differences or if the deadline
+    has passed.
+    
+    """
+    n, m = len(a), len(b)
+    offset = max_d + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(max_d + 1):
+        if deadline is not None and time.time() > deadline:
+            return None
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset+k-1] < v[offset+k+1]):
+                x = v[offset+k+1]
+            else:
+                x = v[offset+k-1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset+k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m)
+        trace.append(v[offset-d:offset+d+1])
+
+
+def _myers_backtrack(trace, x, y):
+    """Return the matching blocks from the trace of _myers_matching_blocks()."""
+    blocks = []
+    for d in range(len(trace), 0, -1):
+        prev = trace[d-1]   # contains k = -(d-1) .. d-1
+        k = x - y
+        if k == -d or (k != d and prev[k-1+d-1] < prev[k+1+d-1]):
+            prev_k = k + 1
+            prev_x = prev[prev_k+d-1]
+            start_x = prev_x
+        else:
+            prev_k = k - 1
+            prev_x = prev[prev_k+d-1]
+            start_x = prev_x + 1
+        if x > start_x:
+            blocks.append((start_x, start_x - k, x - start_x))
+        x, y = prev_x, prev_x - prev_k
+    if x > 0:
+        blocks.append((0, 0, x))
+    blocks.reverse()
+    return blocks
+
+
+def _offsets(lines):
+    """Return the list of the start positions of lines, plus the end."""
+    pos = [0]
+    for line in lines:
+        pos.append(pos[-1] + len(line))
+    return pos
+
+
+def _char_diff(old, new, o1, o2, n1, n2, junksize=1000):
+    """Yield the changes between old[o1:o2] and new[n1:n2] per character.
+    
+    The SequenceMatcher's autojunk heuristic is only used if one of the texts
+    is longer than junksize, it would ignore all common characters in short
+    texts, but without it long texts take too much time.
+    
+    """
+    autojunk = o2 - o1 > junksize or n2 - n1 > junksize
+    matcher = difflib.SequenceMatcher(None, old[o1:o2], new[n1:n2], autojunk)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            yield o1 + i1, o1 + i2, n1 + j1, n1 + j2
@@ -23,12 +23,14 @@ A Frescobaldi (LilyPond) document.
 
 from __future__ import unicode_literals
 
+import hashlib
 import os
 
 from PyQt4.QtCore import QUrl
 from PyQt4.QtGui import QPlainTextDocumentLayout, QTextCursor, QTextDocument
 
 import app
+import cursordiff
 import util
 import variables
 import signals
@@ -39,6 +41,7 @@ class Document(QTextDocument):
     urlChanged = signals.Signal() # new url, old url
     closed = signals.Signal()
     loaded = signals.Signal()
+    reloaded = signals.Signal()
     saved = signals.Signal()
     
     @classmethod
@@ -52,14 +55,18 @@ class Document(QTextDocument):
         thus a unicode string.
         
         """
+        return util.decode(cls._read(url), encoding)
+    
+    @staticmethod
+    def _read(url):
+        """(Internal) Return the contents of the url as a bytes string."""
         filename = url.toLocalFile()
         
         # currently, we do not support non-local files
         if not filename:
             raise IOError("not a local file")
         with open(filename) as f:
-            data = f.read()
-        return util.decode(data, encoding)
+            return f.read()
     
     @classmethod
     def new_from_url(cls, url, encoding=None):
@@ -70,9 +77,11 @@ class Document(QTextDocument):
         
         """
         if not url.isEmpty():
-            text = cls.load_data(url, encoding)
+            data = cls._read(url)
+            text = util.decode(data, encoding)
         d = cls(url, encoding)
         if not url.isEmpty():
+            d._digest = hashlib.md5(data).hexdigest()
             d.setPlainText(text)
             d.setModified(False)
             d.loaded()
@@ -92,6 +101,7 @@ class Document(QTextDocument):
         super(Document, self).__init__()
         self.setDocumentLayout(QPlainTextDocumentLayout(self))
         self._encoding = encoding
+        self._digest = None
         self._url = url # avoid urlChanged on init
         self.setUrl(url)
         self.modificationChanged.connect(self.slotModificationChanged)
@@ -115,23 +125,33 @@ class Document(QTextDocument):
         If loading succeeds and an url was specified, the url is make the
         current url (by calling setUrl() internally).
         
-        If keepUndo is True, the loading can be undone (with Ctrl-Z).
+        If keepUndo is True, the loading can be undone (with Ctrl-Z). In that 
+        case, only the parts of the text that differ are replaced, so cursors, 
+        bookmarks, highlighting etc. are kept in the unchanged parts. If the
+        current url is reloaded this way, the reloaded() signal is emitted 
+        instead of loaded(), which would e.g. restore the saved cursor position
+        and bookmarks.
         
         """
         if url is None:
             url = QUrl()
         u = url if not url.isEmpty() else self.url()
-        text = self.load_data(u, encoding or self._encoding)
+        data = self._read(u)
+        text = util.decode(data, encoding or self._encoding)
+        self._digest = hashlib.md5(data).hexdigest()
         if keepUndo:
             c = QTextCursor(self)
             c.select(QTextCursor.Document)
-            c.insertText(text)
+            cursordiff.insert_text(c, text)
         else:
             self.setPlainText(text)
         self.setModified(False)
         if not url.isEmpty():
             self.setUrl(url)
-        self.loaded()
+        if keepUndo and url.isEmpty():
+            self.reloaded()
+        else:
+            self.loaded()
         app.documentLoaded(self)
             
     def save(self, url=None, encoding=None):
@@ -156,10 +176,12 @@ class Document(QTextDocument):
         if self.url().isEmpty() and not url.isEmpty():
             self.setUrl(url)
         with app.documentSaving(self):
+            data = self.encodedText()
             with open(filename, "w") as f:
-                f.write(self.encodedText())
+                f.write(data)
                 f.flush()
                 os.fsync(f.fileno())
+            self._digest = hashlib.md5(data).hexdigest()
             self.setModified(False)
             if not url.isEmpty():
                 self.setUrl(url)
@@ -188,6 +210,14 @@ class Document(QTextDocument):
     
     def encoding(self):
         return variables.get(self, "coding") or self._encoding
+    
+    def digest(self):
+        """Return the MD5 hex digest of the file contents as last loaded or saved.
+        
+        Returns None if the document was not loaded or saved yet.
+        
+        """
+        return self._digest
         
     def setEncoding(self, encoding):
         self._encoding = encoding
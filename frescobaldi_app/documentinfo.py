@@ -37,6 +37,7 @@ import lydocument
 import app
 import fileinfo
 import cursortools
+import instrumentation
 import tokeniter
 import plugin
 import variables
@@ -60,6 +61,16 @@ def music(document):
     return info(document).music()
 
 
+def dependents(filename):
+    """Returns the open documents that include the file, directly or indirectly.
+    
+    The filename should be a real path, as returned by includefiles().
+    
+    """
+    return [doc for doc in app.documents
+            if filename in info(doc).includefiles()]
+
+
 def mode(document, guess=True):
     """Returns the type of the given document. See DocumentInfo.mode()."""
     return info(document).mode(guess)
@@ -102,29 +113,65 @@ def defaultfilename(document):
 class DocumentInfo(plugin.DocumentPlugin):
     """Computes and caches various information about a Document."""
     def __init__(self, document):
+        self._music = None
+        self._music_change = None
+        document.contentsChange.connect(self._changed)
         document.contentsChanged.connect(self._reset)
-        document.closed.connect(self._reset)
+        document.closed.connect(self._closed)
         self._reset()
         
     def _reset(self):
         """Called when the document is changed."""
+        instrumentation.count("documentinfo.reset")
         self._lydocinfo = None
+    
+    def _closed(self):
+        """Called when the document is closed."""
+        self._reset()
         self._music = None
+        self._music_change = None
+    
+    def _changed(self, position, removed, added):
+        """Called on every change, records the changed range for music().
+        
+        Multiple changes are combined into one (start, old_end, new_end) 
+        tuple, so that the music tree can be updated at once when it is 
+        needed again.
+        
+        """
+        if self._music is None:
+            return
+        if self._music_change is None:
+            self._music_change = (position, position + removed, position + added)
+        else:
+            start, old_end, new_end = self._music_change
+            delta = new_end - old_end
+            end = max(new_end, position + removed)
+            self._music_change = (min(start, position), end - delta,
+                                  end + added - removed)
     
     def lydocinfo(self):
         """Return the lydocinfo instance for our document."""
         if self._lydocinfo is None:
-            doc = lydocument.Document(self.document())
-            v = variables.manager(self.document()).variables()
-            self._lydocinfo = lydocinfo.DocInfo(doc, v)
+            with instrumentation.timer("documentinfo.lydocinfo"):
+                doc = lydocument.Document(self.document())
+                v = variables.manager(self.document()).variables()
+                self._lydocinfo = lydocinfo.DocInfo(doc, v)
         return self._lydocinfo
     
     def music(self):
         """Return the music.Document instance for our document."""
         if self._music is None:
             import music
-            doc = lydocument.Document(self.document())
-            self._music = music.Document(doc)
+            with instrumentation.timer("documentinfo.music"):
+                doc = lydocument.Document(self.document())
+                self._music = music.Document(doc)
+        elif self._music_change:
+            # only read the changed part again
+            start, old_end, new_end = self._music_change
+            with instrumentation.timer("documentinfo.music.update"):
+                self._music.update(start, old_end - start, new_end - start)
+        self._music_change = None
         self._music.include_path = self.includepath()
         return self._music
     
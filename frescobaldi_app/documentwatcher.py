@@ -25,6 +25,9 @@ changed on the disk.  The 'changed' attribute of the Document's DocumentWatcher
 instance is set to True.  Saving or reloading a Document sets the 'changed'
 flag back to False.
 
+On loading and saving, the size, modification time and a digest of the file
+are remembered, so it can be checked cheaply whether the file really changed.
+
 Use start() to start the document watcher, and stop() to stop it if desired.
 
 """
@@ -32,6 +35,7 @@ Use start() to start the document watcher, and stop() to stop it if desired.
 from __future__ import unicode_literals
 
 import contextlib
+import hashlib
 import os
 
 from PyQt4.QtCore import QFileSystemWatcher, QUrl
@@ -55,6 +59,58 @@ class DocumentWatcher(plugin.DocumentPlugin):
     """Maintains if a change was detected for a document."""
     def __init__(self, d):
         self.changed = False
+        self.signature = None
+    
+    def remember(self):
+        """Store the signature of the file on disk (see signature()).
+        
+        The digest is the one of the contents the document just loaded or
+        saved, so the file is not read again.
+        
+        """
+        document = self.document()
+        filename = document.url().toLocalFile()
+        self.signature = signature(filename, document.digest()) if filename else None
+    
+    def compare(self, digest=True):
+        """Compare the file on disk with the signature stored on load or save.
+        
+        Returns True if the file is the same, False if it is not the same. If
+        the size is equal but the modification time differs, the digest of 
+        the file is compared, but if digest is False, None is returned in 
+        that case, so the caller can compute the digest later (e.g. in a 
+        background thread) and use compare_digest().
+        
+        If no signature was stored, the file is compared with the document's
+        encoded text.
+        
+        """
+        filename = self.document().url().toLocalFile()
+        try:
+            stat = os.stat(filename)
+        except (OSError, IOError):
+            return False
+        if self.signature is None:
+            try:
+                with open(filename, 'rb') as f:
+                    return f.read() == self.document().encodedText()
+            except (OSError, IOError):
+                return False
+        size, mtime, md5 = self.signature
+        if stat.st_size != size:
+            return False
+        elif stat.st_mtime == mtime:
+            return True
+        elif digest:
+            return self.compare_digest(file_digest(filename))
+    
+    def compare_digest(self, md5):
+        """Return True if md5 is the digest stored on load or save.
+        
+        If md5 is None (the file could not be read), False is returned.
+        
+        """
+        return md5 is not None and self.signature is not None and md5 == self.signature[2]
     
     def isdeleted(self):
         """Return True if some change has occured, the document has a local
@@ -68,6 +124,40 @@ class DocumentWatcher(plugin.DocumentPlugin):
         return False
 
 
+def signature(filename, md5=None):
+    """Return a (size, mtime, digest) tuple for the file, or None.
+    
+    If md5 is given, it is used as the digest of the file, else the file is
+    read to compute it. None is returned if the file can't be read.
+    
+    """
+    try:
+        stat = os.stat(filename)
+    except (OSError, IOError):
+        return None
+    if md5 is None:
+        md5 = file_digest(filename)
+    if md5 is not None:
+        return stat.st_size, stat.st_mtime, md5
+
+
+def file_digest(filename):
+    """Return the MD5 hex digest of the file's contents, or None.
+    
+    None is returned if the file can't be read. The file is read in chunks. 
+    This function can be called from a background thread.
+    
+    """
+    md5 = hashlib.md5()
+    try:
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                md5.update(chunk)
+    except (OSError, IOError):
+        return None
+    return md5.hexdigest()
+
+
 def addUrl(url):
     """Add a url (QUrl) to the filesystem watcher."""
     filename = url.toLocalFile()
@@ -87,6 +177,11 @@ def unchange(document):
     DocumentWatcher.instance(document).changed = False
 
 
+def remember(document):
+    """Store the signature of the document's file, after loading or saving."""
+    DocumentWatcher.instance(document).remember()
+
+
 def documentUrlChanged(document, url, old):
     """Called whenever the URL of an existing Document changes."""
     for d in app.documents:
@@ -163,3 +258,5 @@ def stop():
 app.documentLoaded.connect(unchange)
 app.documentSaved.connect(unchange)
 app.documentUrlChanged.connect(unchange)
+app.documentLoaded.connect(remember)
+app.documentSaved.connect(remember)
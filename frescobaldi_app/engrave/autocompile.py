@@ -77,9 +77,11 @@ class AutoCompiler(plugin.MainWindowPlugin):
         if old:
             old.contentsChanged.disconnect(self.startTimer)
             old.loaded.disconnect(self.startTimer)
+            old.reloaded.disconnect(self.startTimer)
         if new:
             new.contentsChanged.connect(self.startTimer)
             new.loaded.connect(self.startTimer)
+            new.reloaded.connect(self.startTimer)
             if self._enabled:
                 self.startTimer()
     
@@ -117,6 +119,7 @@ class AutoCompileManager(plugin.DocumentPlugin):
         document.contentsChanged.connect(self.slotDocumentContentsChanged)
         document.saved.connect(self.slotDocumentSaved)
         document.loaded.connect(self.initialize)
+        document.reloaded.connect(self.initialize)
         jobmanager.manager(document).started.connect(self.slotJobStarted)
         self.initialize()
     
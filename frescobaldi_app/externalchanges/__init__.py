@@ -25,12 +25,27 @@ The documentwatcher module is used to do the actual monitoring work,
 this module checks if a touched file really changed and pops up the window
 if needed.
 
+To check whether a file really changed, its size and modification time are
+compared with the values stored when the document was loaded or saved. Only
+if the size is the same but the modification time differs, a digest of the
+file is computed and compared. For large files this is done in a background
+thread.
+
 """
 
 from __future__ import unicode_literals
 
 
-from PyQt4.QtCore import QSettings, QTimer
+import os
+
+from PyQt4.QtCore import QSettings, QThread, QTimer
+
+
+# files larger than this are digested in a background thread
+_threshold = 1048576
+
+# the running Digester, if any
+_digester = None
 
 
 def enabled():
@@ -62,18 +77,29 @@ def changedDocuments():
     When a document is not modified and the file on disk is exactly the same,
     the document is not considered having been changed on disk.
     
+    """
+    for w in watchersToCompare():
+        if w.compare():
+            w.changed = False
+    return _changed()
+
+
+def watchersToCompare():
+    """Yield the DocumentWatchers for changed but unmodified documents.
+    
+    Only documents that have a local file name are yielded.
+    
     """
     import documentwatcher
     for w in documentwatcher.DocumentWatcher.instances():
         d = w.document()
-        if w.changed and not d.isModified():
-            filename = d.url().toLocalFile()
-            if filename:
-                try:
-                    if open(filename).read() == d.encodedText():
-                        w.changed = False
-                except (OSError, IOError):
-                    pass
+        if w.changed and not d.isModified() and d.url().toLocalFile():
+            yield w
+
+
+def _changed():
+    """Return the list of Documents that are marked changed."""
+    import documentwatcher
     return [w.document() for w in documentwatcher.DocumentWatcher.instances()
               if w.changed]
 
@@ -92,12 +118,72 @@ def displayChangedDocuments():
 
 
 def checkChangedDocuments():
-    """Display the window if there are changed files."""
-    docs = changedDocuments()
+    """Display the window if there are changed files.
+    
+    Large files that need to be digested are handled in a background thread,
+    in that case the window is displayed when the thread has finished.
+    
+    """
+    global _digester
+    if _digester:
+        # still busy, look again later
+        _timer.start(500)
+        return
+    pending = []
+    for w in watchersToCompare():
+        result = w.compare(False)
+        if result is None:
+            filename = w.document().url().toLocalFile()
+            try:
+                large = os.path.getsize(filename) > _threshold
+            except (OSError, IOError):
+                large = False
+            if large:
+                pending.append((w, filename))
+                continue
+            result = w.compare()
+        if result:
+            w.changed = False
+    if pending:
+        _digester = Digester(pending)
+        _digester.finished.connect(_digesterFinished)
+        _digester.start()
+    else:
+        docs = _changed()
+        if docs:
+            display(docs)
+
+
+def _digesterFinished():
+    """Called when the Digester has finished, displays the window if needed."""
+    global _digester
+    digester, _digester = _digester, None
+    for w, md5 in digester.results:
+        if w.compare_digest(md5):
+            w.changed = False
+    docs = _changed()
     if docs:
         display(docs)
 
 
+class Digester(QThread):
+    """Computes the digest of some files in a background thread.
+    
+    Instantiate with a list of (watcher, filename) tuples. When finished,
+    the results attribute contains a list of (watcher, digest) tuples.
+    
+    """
+    def __init__(self, files):
+        super(Digester, self).__init__()
+        self.files = files
+        self.results = []
+    
+    def run(self):
+        import documentwatcher
+        self.results = [(w, documentwatcher.file_digest(filename))
+                        for w, filename in self.files]
+
+
 # timer to wait before really looking at the changed files, a file could
 # probably still be changing.
 _timer = QTimer(singleShot=True, timeout=checkChangedDocuments)
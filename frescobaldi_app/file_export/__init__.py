@@ -57,12 +57,11 @@ class FileExport(plugin.MainWindowPlugin):
         writer = ly.musicxml.writer()
         #writer.parse_tokens(tokeniter.all_tokens(doc))
         writer.parse_tree(doc)
-        xml = writer.musicxml()
         # put the Frescobaldi version in the xml file
-        software = xml.root.find('.//encoding/software')
+        software = writer.musxml.root.find('.//encoding/software')
         software.text = "{0} {1}".format(info.appname, info.version)
         try:
-            xml.write(filename)
+            writer.write_musicxml(filename)
         except (IOError, OSError) as err:
             QMessageBox.warning(self.mainwindow(), app.caption(_("Error")),
                 _("Can't write to destination:\n\n{url}\n\n{error}").format(
@@ -19,6 +19,12 @@
 
 """
 Computes and caches various information about files.
+
+The include files of documents are found using an include graph that is kept
+app-wide: which paths are existing files, which files each file includes,
+and the set of files that a document includes, directly or indirectly. A
+QFileSystemWatcher keeps the graph current, so looking up the include files
+again does not access the filesystem.
 """
 
 from __future__ import unicode_literals
@@ -28,6 +34,8 @@ import re
 import os
 import atexit
 
+from PyQt4.QtCore import QFileSystemWatcher
+
 import ly.document
 import lydocinfo
 import ly.lex
@@ -105,6 +113,75 @@ def textmode(text, guess=True):
         return ly.lex.guessMode(text)
 
 
+# the include graph, see _watch()
+_watcher = None
+_watched = set()
+_unwatched = 0  # the number of times a path could not be watched
+_paths = {}     # directory: {(directory, arg): real path if existing file, else None}
+_args = {}      # filename: tuple of the include args of the file
+_includes = {}  # filename: list of (args, include_path, frozenset of the included files)
+_includes_per_file = 4  # the maximum length of those lists
+
+
+def _watch(path):
+    """Watches the file or directory, returns True if it is watched.
+    
+    The include graph only caches information about paths that are watched.
+    
+    """
+    global _watcher, _unwatched
+    if path in _watched:
+        return True
+    if _watcher is None:
+        _watcher = QFileSystemWatcher()
+        _watcher.fileChanged.connect(_pathChanged)
+        _watcher.directoryChanged.connect(_pathChanged)
+    if os.path.exists(path):
+        _watcher.addPath(path)
+        if path in _watcher.files() or path in _watcher.directories():
+            _watched.add(path)
+            return True
+    _unwatched += 1
+    return False
+
+
+def _pathChanged(path):
+    """Called when a watched file or directory changes."""
+    # a deleted or replaced path is not watched anymore
+    _watcher.removePath(path)
+    _watched.discard(path)
+    _paths.pop(path, None)
+    _args.pop(path, None)
+    _includes.clear()
+
+
+def _path(directory, arg):
+    """Returns the real path of the arg in the directory if it is a file, else None."""
+    path = os.path.join(directory, arg)
+    parent = os.path.normpath(os.path.dirname(path))
+    try:
+        return _paths[parent][(directory, arg)]
+    except KeyError:
+        pass
+    path = os.path.realpath(path)
+    result = path if os.path.isfile(path) else None
+    if _watch(parent):
+        _paths.setdefault(parent, {})[(directory, arg)] = result
+    return result
+
+
+def _include_args(filename):
+    """Returns a tuple with the include args of the file."""
+    try:
+        return _args[filename]
+    except KeyError:
+        pass
+    args = tuple(docinfo(filename).include_args())
+    if _watch(filename):
+        _args[filename] = args
+    return args
+
+
 def includefiles(dinfo, include_path=()):
     """Returns a set of filenames that are included by the DocInfo's document.
         
@@ -116,16 +193,28 @@ def includefiles(dinfo, include_path=()):
     If the document has no local filename, only the include_path is 
     searched for files.
     
+    The result is cached in the include graph, a few results per filename,
+    the most recently used first. So a query for only a part of the document
+    (e.g. up to the cursor) does not replace the result for the whole
+    document, and editing the include commands replaces the oldest entry.
+    
     """
     filename = dinfo.document.filename
     basedir = os.path.dirname(filename) if filename else None
+    args, include_path = tuple(dinfo.include_args()), tuple(include_path)
+    entries = _includes.get(filename, [])
+    for i, entry in enumerate(entries):
+        if entry[0] == args and entry[1] == include_path:
+            entries.insert(0, entries.pop(i))
+            return set(entry[2])
+    unwatched = _unwatched
     files = set()
     
     def tryarg(directory, arg):
-        path = os.path.realpath(os.path.join(directory, arg))
-        if path not in files and os.path.isfile(path):
+        path = _path(directory, arg)
+        if path and path not in files:
             files.add(path)
-            args = docinfo(path).include_args()
+            args = _include_args(path)
             find(args, os.path.dirname(path))
             return True
             
@@ -140,7 +229,12 @@ def includefiles(dinfo, include_path=()):
                         if tryarg(p, arg):
                             break
     
-    find(dinfo.include_args(), basedir)
+    find(args, basedir)
+    if unwatched == _unwatched:
+        # all the information came from watched paths
+        entries = _includes.setdefault(filename, [])
+        entries.insert(0, (args, include_path, frozenset(files)))
+        del entries[_includes_per_file:]
     return files
 
 
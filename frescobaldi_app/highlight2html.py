@@ -44,6 +44,16 @@ def html_document(document, scheme='editor', inline=False, number_lines=False, f
     c = lydocument.Cursor(lydocument.Document(document))
     return html(c, scheme, inline, number_lines, full_html)
 
+def write_document(document, f, scheme='editor', inline=False, number_lines=False, full_html=True):
+    """Write a (by default) css-styled HTML document for the full document to f.
+    
+    The HTML is written in chunks to the file object f, which must accept 
+    unicode strings.
+    
+    """
+    c = lydocument.Cursor(lydocument.Document(document))
+    writer(scheme, inline, number_lines, full_html).write(c, f)
+
 def html(cursor, scheme='editor', inline=False, number_lines=False, full_html=True):
     """Return a HTML document with the syntax-highlighted region.
     
@@ -55,6 +65,14 @@ def html(cursor, scheme='editor', inline=False, number_lines=False, full_html=Tr
     
     Set number_lines to True to add line numbers.
     
+    """
+    return writer(scheme, inline, number_lines, full_html).html(cursor)
+
+def writer(scheme='editor', inline=False, number_lines=False, full_html=True):
+    """Return a ly.colorize.HtmlWriter set up with the specified text formats scheme.
+    
+    See html() for the meaning of the arguments.
+    
     """
     data = textformats.formatData(scheme)       # the current highlighting scheme
     w = ly.colorize.HtmlWriter()
@@ -64,6 +82,6 @@ def html(cursor, scheme='editor', inline=False, number_lines=False, full_html=Tr
     w.fgcolor = data.baseColors['text'].name()
     w.bgcolor = data.baseColors['background'].name()
     w.css_scheme = data.css_scheme()
-    return w.html(cursor)
+    return w
 
 
@@ -24,7 +24,11 @@ about a document's contents.
 
 from __future__ import unicode_literals
 
+import itertools
+import time
+import weakref
 
+from PyQt4.QtCore import QThread, QTimer
 from PyQt4.QtGui import (
     QColor, QSyntaxHighlighter, QTextBlockUserData, QTextCharFormat,
     QTextCursor, QTextDocument)
@@ -35,15 +39,23 @@ import ly.colorize
 
 import app
 import cursortools
+import instrumentation
 import textformats
 import metainfo
 import plugin
+import signals
 import variables
 import documentinfo
 
 
 metainfo.define('highlighting', True)
 
+# documents with more characters are tokenized in a background thread
+large_document_size = 1000000
+
+# keep references to the running Lexers
+_lexers = set()
+
 
 def mapping(data):
     """Return a dictionary mapping token classes from ly.lex to QTextCharFormats.
@@ -95,7 +107,13 @@ class Highlighter(QSyntaxHighlighter, plugin.Plugin):
     The Highlighter automatically re-reads the highlighting settings if they
     are changed.
     
+    The tokensChanged signal is emitted with a QTextBlock when the tokens of
+    that block have been updated, or with None when the tokens of all blocks
+    were replaced at once.
+    
     """
+    tokensChanged = signals.Signal()
+    
     def __init__(self, document):
         QSyntaxHighlighter.__init__(self, document)
         self._fridge = ly.lex.Fridge()
@@ -103,6 +121,12 @@ class Highlighter(QSyntaxHighlighter, plugin.Plugin):
         self._initialState = None
         self._highlighting = True
         self._mode = None
+        self._lexer = None          # tokenizes a large document in the background
+        self._formatting = False    # True while applying already tokenized blocks
+        self._formatIndex = None    # the next block to apply the formats to
+        self._formatTimer = QTimer(singleShot=True, timeout=self._formatBlocks)
+        self._blockCount = 0
+        self._visible = []
         self.initializeDocument()
     
     def initializeDocument(self):
@@ -114,6 +138,8 @@ class Highlighter(QSyntaxHighlighter, plugin.Plugin):
         needed) and initializes whether to enable visual highlighting from the
         document's metainfo.
         
+        Large documents are tokenized in a background thread, see Lexer.
+        
         """
         document = self.document()
         if hasattr(document, 'url'):
@@ -121,34 +147,50 @@ class Highlighter(QSyntaxHighlighter, plugin.Plugin):
             document.loaded.connect(self._resetHighlighting)
             self._mode = documentinfo.mode(document, False)
             variables.manager(document).changed.connect(self._variablesChange)
+            if document.characterCount() > large_document_size:
+                document.contentsChange.connect(self._contentsChange)
+                self._startLexing()
         
     def _variablesChange(self):
         """Called whenever the variables have changed. Checks the mode."""
         mode = documentinfo.mode(self.document(), False)
         if mode != self._mode:
             self._mode = mode
-            self.rehighlight()
+            if self._lexer:
+                self._lexer.change(0)
+            else:
+                self.rehighlight()
             
     def _resetHighlighting(self):
         """Switch highlighting on or off depending on saved metainfo."""
         self.setHighlighting(metainfo.info(self.document()).highlighting)
         
+    @instrumentation.timed("highlighter.highlightBlock")
     def highlightBlock(self, text):
         """Called by Qt when the highlighting of the current line needs updating."""
-        # find the state of the previous line
-        prev = self.previousBlockState()
-        state = self._fridge.thaw(prev)
-        blank = not state and (not text or text.isspace())
-        if not state:
-            state = self.initialState()
-
-        # collect and save the tokens
-        tokens = tuple(state.tokens(text))
-        cursortools.data(self.currentBlock()).tokens = tokens
-        
-        # if blank thus far, keep the highlighter coming back
-        # because the parsing state is not yet known; else save the state
-        self.setCurrentBlockState(prev - 1 if blank else self._fridge.freeze(state))
+        if self._lexer:
+            # the Lexer is still tokenizing the document
+            return
+        tokens = None
+        if self._formatting:
+            # the tokens and state were already set by the Lexer
+            tokens = getattr(self.currentBlock().userData(), 'tokens', None)
+        if tokens is None:
+            # find the state of the previous line
+            prev = self.previousBlockState()
+            state = self._fridge.thaw(prev)
+            blank = not state and (not text or text.isspace())
+            if not state:
+                state = self.initialState()
+
+            # collect and save the tokens
+            tokens = tuple(state.tokens(text))
+            cursortools.data(self.currentBlock()).tokens = tokens
+            self.tokensChanged(self.currentBlock())
+            
+            # if blank thus far, keep the highlighter coming back
+            # because the parsing state is not yet known; else save the state
+            self.setCurrentBlockState(prev - 1 if blank else self._fridge.freeze(state))
         
         # apply highlighting if desired
         if self._highlighting:
@@ -170,6 +212,137 @@ class Highlighter(QSyntaxHighlighter, plugin.Plugin):
         """Return whether highlighting is active."""
         return self._highlighting
         
+    def isTokenizing(self):
+        """Return True while the document is being tokenized in the background.
+        
+        Things that only need tokens to show information to the user, like
+        matching brackets or completions, should check this and do nothing
+        instead of calling tokenize(), which would wait for the Lexer.
+        
+        """
+        return self._lexer is not None
+    
+    def tokenize(self):
+        """Makes sure all blocks have their tokens and state.
+        
+        Normally this runs rehighlight(), but if the document is being
+        tokenized in the background, this waits for the Lexer to finish.
+        If the document changed meanwhile, the tokenizing is continued from
+        the first changed block.
+        
+        """
+        if not self._lexer:
+            self.rehighlight()
+            return
+        while self._lexer:
+            lexer = self._lexer
+            lexer.wait()
+            self._lexingFinished(lexer)
+    
+    def _startLexing(self, first=0):
+        """Starts tokenizing the document in a background thread.
+        
+        If first is given, the blocks before the block with that number must
+        already have their tokens and state.
+        
+        """
+        block = self.document().findBlockByNumber(first)
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        lines = cursor.selectedText().split('\u2029')
+        prev = block.previous().userState() if first else -1
+        self._lexer = Lexer(self, lines, self.initialState(), first, prev)
+    
+    def _lexingFinished(self, lexer):
+        """Called when the Lexer has tokenized the document.
+        
+        The tokens and states are stored in the blocks, and the formats are
+        applied in the background, starting with the visible blocks.
+        
+        If the document changed while tokenizing, only the results for the
+        blocks before the first changed block are stored, and a new Lexer is
+        started from there.
+        
+        """
+        if lexer is not self._lexer:
+            return
+        self._lexer = None
+        results = lexer.results
+        if lexer.changed is not None:
+            results = results[:max(0, lexer.changed - lexer.first)]
+        block = self.document().findBlockByNumber(lexer.first)
+        for tokens, state in results:
+            cursortools.data(block).tokens = tokens
+            block.setUserState(state)
+            block = block.next()
+        if lexer.changed is not None:
+            self._startLexing(min(lexer.changed, lexer.first + len(results)))
+            return
+        self.tokensChanged(None)
+        if self._highlighting:
+            self._formatIndex = 0
+            self._blockCount = self.document().blockCount()
+            self._visible = []
+            self._formatBlocks()
+    
+    def _formatBlocks(self):
+        """Applies the formats to the tokenized blocks, a part at a time.
+        
+        The blocks that are visible in the current views are done first.
+        
+        """
+        if self._formatIndex is None or not self._highlighting:
+            self._formatIndex = None
+            return
+        views = [w.currentView() for w in app.windows]
+        views = [v for v in views if v and v.document() is self.document()]
+        visible = [v.firstVisibleBlock().blockNumber() for v in views]
+        if visible != self._visible:
+            self._visible = visible
+            for view in views:
+                count = view.viewport().height() // view.fontMetrics().lineSpacing() + 1
+                blocks = cursortools.forwards(view.firstVisibleBlock())
+                for block in itertools.islice(blocks, count):
+                    if block.blockNumber() >= self._formatIndex:
+                        self._formatBlock(block)
+        block = self.document().findBlockByNumber(self._formatIndex)
+        end = time.time() + 0.02
+        while block.isValid() and time.time() < end:
+            self._formatBlock(block)
+            block = block.next()
+        if block.isValid():
+            self._formatIndex = block.blockNumber()
+            self._formatTimer.start(0)
+        else:
+            self._formatIndex = None
+    
+    def _formatBlock(self, block):
+        """Applies the formats to a block that already has its tokens."""
+        self._formatting = True
+        try:
+            self.rehighlightBlock(block)
+        finally:
+            self._formatting = False
+    
+    def _contentsChange(self, position, removed, added):
+        """Called when a large document changes.
+        
+        If it is being tokenized, that is continued from the changed block
+        after the Lexer finishes.
+        If the formats are being applied, the index of the next block is
+        adjusted when lines are inserted or removed before it.
+        
+        """
+        num = self.document().findBlock(position).blockNumber()
+        if self._lexer:
+            self._lexer.change(num)
+        elif self._formatIndex is not None:
+            count = self.document().blockCount()
+            if self._formatIndex > num:
+                self._formatIndex = max(num + 1,
+                    self._formatIndex + count - self._blockCount)
+            self._blockCount = count
+        
     def state(self, block):
         """Return a thawn ly.lex.State() object at the *end* of the QTextBlock.
         
@@ -192,6 +365,64 @@ class Highlighter(QSyntaxHighlighter, plugin.Plugin):
         return self._fridge.thaw(self._initialState)
 
 
+class Lexer(QThread):
+    """Tokenizes the lines of a large document in a background thread.
+    
+    The lines are the text of the blocks from the block numbered first to the
+    end of the document, prev is the block state of the block before them.
+    When finished, the results attribute contains a (tokens, state) tuple for
+    every line, the state being the number in the highlighter's Fridge that
+    Highlighter.highlightBlock() would set as block state.
+    
+    If the document changes while tokenizing, the changed attribute is set to
+    the number of the first changed block, and the highlighter starts a new
+    Lexer from there.
+    
+    """
+    def __init__(self, highlighter, lines, state, first=0, prev=-1):
+        super(Lexer, self).__init__()
+        self.highlighter = weakref.ref(highlighter)
+        self.fridge = highlighter._fridge
+        self.lines = lines
+        self.initialState = self.fridge.freeze(state)
+        self.first = first
+        self.prev = prev
+        self.results = []
+        self.changed = None
+        _lexers.add(self)
+        self.finished.connect(self.slotFinished)
+        self.start()
+    
+    def run(self):
+        """Main method of this thread, called by Qt on start()."""
+        fridge = self.fridge
+        results = []
+        prev = self.prev
+        with instrumentation.timer("highlighter.lexer"):
+            for text in self.lines:
+                # this does the same as Highlighter.highlightBlock()
+                state = fridge.thaw(prev)
+                blank = not state and (not text or text.isspace())
+                if not state:
+                    state = fridge.thaw(self.initialState)
+                tokens = tuple(state.tokens(text))
+                prev = prev - 1 if blank else fridge.freeze(state)
+                results.append((tokens, prev))
+        self.results = results
+    
+    def change(self, blockNumber):
+        """Called when the block with the number changed while tokenizing."""
+        if self.changed is None or blockNumber < self.changed:
+            self.changed = blockNumber
+    
+    def slotFinished(self):
+        """Called when the thread has completed."""
+        _lexers.discard(self)
+        highlighter = self.highlighter()
+        if highlighter:
+            highlighter._lexingFinished(self)
+
+
 def html_copy(cursor, scheme='editor', number_lines=False):
     """Return a new QTextDocument with highlighting set as HTML textcharformats.
     
@@ -200,42 +431,45 @@ def html_copy(cursor, scheme='editor', number_lines=False):
     
     If number_lines is True, line numbers are added.
     
+    The text is appended to the new document in runs of tokens with the same
+    format, instead of copying the whole text and then setting the format of
+    every single token.
+    
     """
+    import lydocument
     data = textformats.formatData(scheme)
     doc = QTextDocument()
     doc.setDefaultFont(data.font)
-    doc.setPlainText(cursor.document().toPlainText())
+    c = lydocument.cursor(cursor, select_all=True)
+    if c.end is None:
+        c.end = c.document.size()
     if metainfo.info(cursor.document()).highlighting:
-        highlight(doc, mapping(data), ly.lex.state(documentinfo.mode(cursor.document())))
-    if cursor.hasSelection():
-        # cut out not selected text
-        start, end = cursor.selectionStart(), cursor.selectionEnd()
-        cur1 = QTextCursor(doc)
-        cur1.setPosition(start, QTextCursor.KeepAnchor)
-        cur2 = QTextCursor(doc)
-        cur2.setPosition(end)
-        cur2.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
-        cur2.removeSelectedText()
-        cur1.removeSelectedText()
-    if number_lines:
-        c = QTextCursor(doc)
-        f = QTextCharFormat()
-        f.setBackground(QColor('#eeeeee'))
-        if cursor.hasSelection():
-            num = cursor.document().findBlock(cursor.selectionStart()).blockNumber() + 1
-            last = cursor.document().findBlock(cursor.selectionEnd())
-        else:
-            num = 1
-            last = cursor.document().lastBlock()
-        lastnum = last.blockNumber() + 1
-        padding = len(format(lastnum))
-        block = doc.firstBlock()
-        while block.isValid():
-            c.setPosition(block.position())
-            c.setCharFormat(f)
-            c.insertText('{0:>{1}d} '.format(num, padding))
-            block = block.next()
+        mapper = mapping(data)
+    else:
+        mapper = ly.colorize.Mapper()
+    runs = ly.colorize.melt_mapped_tokens(ly.colorize.map_tokens(c, mapper))
+    
+    cur = QTextCursor(doc)
+    plain = QTextCharFormat()
+    if not number_lines:
+        for text, f in runs:
+            cur.insertText(text, f or plain)
+        return doc
+    
+    numformat = QTextCharFormat()
+    numformat.setBackground(QColor('#eeeeee'))
+    num = c.document.index(c.start_block()) + 1
+    lastnum = c.document.index(c.end_block()) + 1
+    padding = len(format(lastnum))
+    cur.insertText('{0:>{1}d} '.format(num, padding), numformat)
+    for text, f in runs:
+        lines = text.split('\n')
+        cur.insertText(lines[0], f or plain)
+        for line in lines[1:]:
             num += 1
+            cur.insertText('\n', f or plain)
+            cur.insertText('{0:>{1}d} '.format(num, padding), numformat)
+            cur.insertText(line, f or plain)
     return doc
 
 
@@ -17,7 +17,11 @@ License: LGPL. More info: http://python-hyphenator.googlecode.com/
 from __future__ import unicode_literals
 
 import codecs
+import hashlib
+import marshal
+import os
 import re
+import sys
 
 
 __all__ = ["Hyphenator"]
@@ -25,6 +29,12 @@ __all__ = ["Hyphenator"]
 # cache of per-file HyphenationDictionary objects
 _hdcache = {}
 
+# directory to store compiled pattern tries in, None disables the disk cache
+cachedir = None
+
+# bump this when the layout of the compiled trie changes
+CACHE_FORMAT = 1
+
 # precompile some regular expressions
 parse = re.compile(r'(\d?)(\D?)').findall
 
@@ -87,52 +97,147 @@ class DataInt(int):
         return obj
 
 
+def read_patterns(filename):
+    """Reads a hyph_*.dic file and returns the hyphenation patterns.
+    
+    Returns a dictionary mapping the pattern letters to a tuple
+    (start, values), where start is the offset of the first nonzero value.
+    
+    """
+    patterns = {}
+    with open(filename, 'rb') as f:
+        # use correct encoding, specified in first line
+        for encoding in f.readline().decode('latin1').split():
+            if encoding != "charset":
+                try:
+                    decoder = codecs.getreader(encoding)
+                    break
+                except LookupError:
+                    pass
+        else:
+            decoder = codecs.getreader('latin1')
+        
+        for pat in decoder(f):
+            pat = pat.strip()
+            if not pat or pat[0] == '%':
+                continue
+            # replace ^^hh with the real character
+            pat = replace_hex(pat)
+            # read nonstandard hyphen alternatives
+            if '/' in pat:
+                pat, alt = pat.split('/', 1)
+                factory = ParsedAlternative(pat, alt)
+            else:
+                factory = int
+            tag, values = zip(*[(s, factory(i or "0"))
+                                                for i, s in parse(pat)])
+            # if only zeros, skip this pattern
+            if any(values):
+                # strip zeros and store start offset.
+                start, end = 0, len(values)
+                while not values[start]:
+                    start += 1
+                while not values[end-1]:
+                    end -= 1
+                patterns[''.join(tag)] = start, values[start:end]
+    return patterns
+
+
+def compile_patterns(patterns):
+    """Compiles the patterns returned by read_patterns() into a trie.
+    
+    The trie is a flat dictionary, mapping every prefix of every pattern to
+    None, or, if the prefix is a pattern itself, to a tuple (start, values,
+    data), where data is None or a tuple with the nonstandard hyphenation
+    data (or None) for every value. So matching a word from a position can
+    stop as soon as the text is not in the trie.
+    
+    The trie only contains builtin types, so it can be stored with marshal.
+    
+    """
+    trie = {}
+    for tag, (start, values) in patterns.items():
+        for i in range(1, len(tag)):
+            trie.setdefault(tag[:i], None)
+        data = tuple(getattr(v, 'data', None) for v in values)
+        trie[tag] = (start, tuple(map(int, values)), data if any(data) else None)
+    return trie
+
+
+def cache_filename(filename):
+    """Returns the filename in cachedir for the compiled dictionary filename."""
+    key = os.path.abspath(filename).encode('utf-8')
+    return os.path.join(cachedir, hashlib.md5(key).hexdigest() + '.hyph')
+
+
+def cache_key(filename):
+    """Returns a key for the dictionary file's identity, size and mtime."""
+    st = os.stat(filename)
+    return (CACHE_FORMAT, sys.version_info[:2], os.path.abspath(filename),
+            st.st_size, int(st.st_mtime))
+
+
+def load_trie(filename):
+    """Returns the compiled trie for the dictionary filename from the cache.
+    
+    Returns None if cachedir is not set, or if there is no up-to-date
+    cached trie.
+    
+    """
+    if not cachedir:
+        return
+    try:
+        with open(cache_filename(filename), 'rb') as f:
+            key, trie = marshal.loads(f.read())
+        if key == cache_key(filename):
+            return trie
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        pass
+
+
+def save_trie(filename, trie):
+    """Stores the compiled trie for the dictionary filename in the cache.
+    
+    Does nothing if cachedir is not set. Errors are silently ignored, as the
+    cache is not essential.
+    
+    """
+    if not cachedir:
+        return
+    cachefile = cache_filename(filename)
+    temp = cachefile + '.{0}.tmp'.format(os.getpid())
+    try:
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+        with open(temp, 'wb') as f:
+            marshal.dump((cache_key(filename), trie), f)
+        if os.name == 'nt' and os.path.exists(cachefile):
+            os.remove(cachefile)
+        os.rename(temp, cachefile)
+    except (IOError, OSError, ValueError):
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+
 class HyphenationDictionary(object):
     """Reads a hyph_*.dic file and stores the hyphenation patterns.
     
+    The patterns are compiled into a trie, that is stored in (and read from)
+    the cachedir, if set.
+    
     Parameters:
     filename : filename of hyph_*.dic pattern file to read
     
     """
     def __init__(self, filename):
-        self.patterns = {}
-        with open(filename) as f:
-            # use correct encoding, specified in first line
-            for encoding in f.readline().split():
-                if encoding != "charset":
-                    try:
-                        decoder = codecs.getreader(encoding)
-                        break
-                    except LookupError:
-                        pass
-            else:
-                decoder = codecs.getreader('latin1')
-            
-            for pat in decoder(f):
-                pat = pat.strip()
-                if not pat or pat[0] == '%':
-                    continue
-                # replace ^^hh with the real character
-                pat = replace_hex(pat)
-                # read nonstandard hyphen alternatives
-                if '/' in pat:
-                    pat, alt = pat.split('/', 1)
-                    factory = ParsedAlternative(pat, alt)
-                else:
-                    factory = int
-                tag, values = zip(*[(s, factory(i or "0"))
-                                                    for i, s in parse(pat)])
-                # if only zeros, skip this pattern
-                if any(values):
-                    # strip zeros and store start offset.
-                    start, end = 0, len(values)
-                    while not values[start]:
-                        start += 1
-                    while not values[end-1]:
-                        end -= 1
-                    self.patterns[''.join(tag)] = start, values[start:end]
+        trie = load_trie(filename)
+        if trie is None:
+            trie = compile_patterns(read_patterns(filename))
+            save_trie(filename, trie)
+        self.trie = trie
         self.cache = {}
-        self.maxlen = max(map(len, self.patterns))
 
     def positions(self, word):
         """Returns a list of positions where the word can be hyphenated.
@@ -159,16 +264,29 @@ class HyphenationDictionary(object):
         except KeyError:
             pass
         prepWord = '.' + word + '.'
-        res = [0] * (len(prepWord) + 1)
-        for i in range(len(prepWord) - 1):
-            for j in range(i + 1, min(i + self.maxlen, len(prepWord)) + 1):
-                p = self.patterns.get(prepWord[i:j])
-                if p:
-                    offset, values = p
-                    s = slice(i + offset, i + offset + len(values))
-                    res[s] = map(max, values, res[s])
-
-        positions = [DataInt(i - 1, ref=r) for i, r in enumerate(res) if r % 2]
+        length = len(prepWord)
+        res = [0] * (length + 1)
+        resdata = {}
+        trie = self.trie
+        for i in range(length - 1):
+            for j in range(i + 1, length + 1):
+                p = trie.get(prepWord[i:j], False)
+                if p is False:
+                    break
+                elif p:
+                    offset, values, data = p
+                    k = i + offset
+                    for n, v in enumerate(values):
+                        # the new value wins if it is not lower, like max()
+                        if v >= res[k + n]:
+                            res[k + n] = v
+                            if data and data[n]:
+                                resdata[k + n] = data[n]
+                            else:
+                                resdata.pop(k + n, None)
+        
+        positions = [DataInt(i - 1, resdata.get(i))
+                     for i, r in enumerate(res) if r % 2]
         self.cache[word] = positions
         return positions
 
@@ -182,6 +300,7 @@ class Hyphenator(object):
     -left: make the first syllabe not shorter than this
     -right: make the last syllabe not shorter than this
     -cache: if true (default), use a cached copy of the dic file, if possible
+        (in memory, or, if the module's cachedir is set, compiled on disk)
 
     left and right may also later be changed:
       h = Hyphenator(file)
@@ -252,6 +371,15 @@ class Hyphenator(object):
                 l.insert(p, hyphen)
         return ''.join(l)
 
+    def inserted_words(self, words, hyphen='-'):
+        """Returns a dictionary mapping the words to their hyphenated form.
+        
+        Every distinct word is hyphenated only once, so this is the fastest
+        way to hyphenate a large text, e.g. all the lyrics of a score.
+        
+        """
+        return dict((word, self.inserted(word, hyphen)) for word in set(words))
+
     __call__ = iterate
 
 
@@ -29,7 +29,8 @@ import locale
 import os
 
 from PyQt4.QtCore import QSettings, Qt
-from PyQt4.QtGui import QDialog, QDialogButtonBox, QLabel, QListWidget, QVBoxLayout
+from PyQt4.QtGui import (
+    QDialog, QDialogButtonBox, QLabel, QListWidget, QVBoxLayout)
 
 import app
 import qutil
@@ -142,6 +143,7 @@ class HyphenDialog(QDialog):
     def hyphenator(self):
         if self.exec_() and self._langs:
             lang, dic = self._langs[self.listWidget.currentRow()][1:]
+            hyphenator.cachedir = qutil.cachedir("hyphenation")
             result = hyphenator.Hyphenator(dic)
             settings().setValue("lastused", lang)
         else:
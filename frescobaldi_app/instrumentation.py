@@ -0,0 +1,260 @@
+# This file is part of the Frescobaldi project, http://www.frescobaldi.org/
+#
+# Copyright (c) 2008 - 2014 by Wilbert Berendsen
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# See http://www.gnu.org/licenses/ for more information.
+
+"""
+Collects timings and counters of often used code paths.
+
+Code reports into a named statistic:
+
+    with instrumentation.timer("documentinfo.music"):
+        ...
+    
+    @instrumentation.timed("highlighter.highlightBlock")
+    def highlightBlock(self, text):
+        ...
+    
+    instrumentation.count("documentinfo.reset")
+
+Nothing is collected unless enable() is called, and then timer(), timed()
+and count() only check a global flag, so they can be used in hot paths.
+
+The statistics are collected from the Help menu or when the
+FRESCOBALDI_INSTRUMENTATION environment variable is set on startup. In the
+latter case, the report is written on exit to the file named in the variable
+(as JSON if the name ends with ".json"), or to standard error if it is "-".
+install() also starts the startupprofile module if FRESCOBALDI_PROFILE_STARTUP
+is set.
+
+This module does not import Qt and can be used from any thread.
+
+"""
+
+from __future__ import unicode_literals
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import timeit
+
+
+_clock = timeit.default_timer
+_enabled = False
+_stats = {}
+_lock = threading.Lock()
+
+
+class Statistic(object):
+    """The number of times an event occurred and the time it took."""
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.minimum = None
+        self.maximum = None
+    
+    def add(self, seconds=None):
+        """Adds an occurrence, with the time it took if timed."""
+        self.count += 1
+        if seconds is not None:
+            self.time += seconds
+            if self.minimum is None or seconds < self.minimum:
+                self.minimum = seconds
+            if self.maximum is None or seconds > self.maximum:
+                self.maximum = seconds
+    
+    def timed(self):
+        """Returns True if the occurrences were timed."""
+        return self.minimum is not None
+    
+    def mean(self):
+        """Returns the average time of an occurrence."""
+        return self.time / self.count if self.count else 0.0
+
+
+def enable():
+    """Starts collecting statistics."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Stops collecting statistics; the collected statistics are kept."""
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    """Returns True if statistics are being collected."""
+    return _enabled
+
+
+def clear():
+    """Forgets all collected statistics."""
+    with _lock:
+        _stats.clear()
+
+
+def record(name, seconds=None):
+    """Adds an occurrence of the named event, with the time it took if given."""
+    if _enabled:
+        with _lock:
+            try:
+                stat = _stats[name]
+            except KeyError:
+                stat = _stats[name] = Statistic()
+            stat.add(seconds)
+
+
+def count(name):
+    """Counts an occurrence of the named event."""
+    if _enabled:
+        record(name)
+
+
+def timer(name):
+    """Returns a context manager that records the time its body takes."""
+    return _Timer(name) if _enabled else null
+
+
+def timed(name):
+    """Returns a decorator recording the time every call to the function takes."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            t = _clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, _clock() - t)
+        return wrapper
+    return decorator
+
+
+class Timer(object):
+    """Measures the time a with-block takes and calls done() with it.
+    
+    This records nothing itself; subclasses implement done().
+    
+    """
+    def __enter__(self):
+        self.time = _clock()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.done(_clock() - self.time)
+    
+    def done(self, seconds):
+        """Called with the number of seconds the with-block took."""
+        pass
+
+
+class _Timer(Timer):
+    """Records the time a with-block takes in the named statistic."""
+    def __init__(self, name):
+        self.name = name
+    
+    def done(self, seconds):
+        record(self.name, seconds)
+
+
+class _NullTimer(object):
+    """A context manager that does nothing."""
+    def __enter__(self):
+        pass
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+# returned by timer() when not enabled, other modules may use it likewise
+null = _NullTimer()
+
+
+def statistics():
+    """Returns a sorted list of (name, Statistic) tuples."""
+    with _lock:
+        return sorted(_stats.items())
+
+
+def report():
+    """Returns the collected statistics as a text table (times in ms)."""
+    lines = ["{0:<40} {1:>9} {2:>11} {3:>9} {4:>9} {5:>9}".format(
+        "name", "count", "total", "mean", "min", "max")]
+    for name, stat in statistics():
+        if stat.timed():
+            lines.append("{0:<40} {1:9d} {2:11.1f} {3:9.3f} {4:9.3f} {5:9.3f}".format(
+                name, stat.count, stat.time * 1000, stat.mean() * 1000,
+                stat.minimum * 1000, stat.maximum * 1000))
+        else:
+            lines.append("{0:<40} {1:9d}".format(name, stat.count))
+    return "\n".join(lines) + "\n"
+
+
+def report_json():
+    """Returns the collected statistics as JSON (times in seconds)."""
+    result = {}
+    for name, stat in statistics():
+        d = result[name] = {'count': stat.count}
+        if stat.timed():
+            d.update(time=stat.time, mean=stat.mean(),
+                     min=stat.minimum, max=stat.maximum)
+    return json.dumps(result, indent=2, sort_keys=True)
+
+
+def output(filename, text):
+    """Writes the text to the file, or to standard error if filename is "-"."""
+    if filename == "-":
+        sys.stderr.write(text)
+    else:
+        with open(filename, 'wb') as f:
+            f.write(text.encode('utf-8'))
+
+
+def write(filename):
+    """Writes the report to the file, as JSON if the name ends with '.json'.
+    
+    If the filename is "-", the text report is written to standard error.
+    
+    """
+    if filename != "-" and filename.lower().endswith('.json'):
+        output(filename, report_json())
+    else:
+        output(filename, report())
+
+
+def install():
+    """Starts collecting or profiling as requested in the environment.
+    
+    If the FRESCOBALDI_INSTRUMENTATION variable is set, collecting is 
+    enabled and the report is written when the application exits. If the 
+    FRESCOBALDI_PROFILE_STARTUP variable is set, the startup is profiled 
+    using the startupprofile module.
+    
+    """
+    filename = os.environ.get("FRESCOBALDI_INSTRUMENTATION")
+    if filename:
+        enable()
+        atexit.register(write, filename)
+    filename = os.environ.get("FRESCOBALDI_PROFILE_STARTUP")
+    if filename:
+        import startupprofile
+        startupprofile.install(filename)
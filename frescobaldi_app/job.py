@@ -35,6 +35,7 @@ try:
 except ImportError:
     QProcessEnvironment = None
 
+import instrumentation
 import signals
 
 
@@ -180,6 +181,7 @@ class Job(object):
         self._process = process
         if process.parent() is None:
             process.setParent(QCoreApplication.instance())
+        process.started.connect(self._started)
         process.finished.connect(self._finished)
         process.error.connect(self._error)
         process.readyReadStandardError.connect(self._readstderr)
@@ -231,6 +233,10 @@ class Job(object):
         """Return the standard error of the process as unicode text."""
         return "".join(self.history(STDERR))
     
+    def _started(self):
+        """(internal) Called when the process has started."""
+        instrumentation.record("job.start", time.time() - self._starttime)
+    
     def _finished(self, exitCode, exitStatus):
         """Called when the process has finished."""
         self.finishMessage(exitCode, exitStatus)
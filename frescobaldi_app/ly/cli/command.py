@@ -188,15 +188,14 @@ class musicxml(_export_command):
     def run(self, opts, cursor, output):
         import ly.musicxml
         writer = ly.musicxml.writer()
-        writer.parse_tokens(ly.docinfo.DocInfo(cursor.document).tokens)
-        xml = writer.musicxml()
+        writer.parse_document(cursor.document)
         if self.output:
             filename = self.output
         else:
             filename = output.get_filename(opts, cursor.document.filename)
         encoding = opts.output_encoding or "utf-8"
         with output.file(opts, filename, "binary") as f:
-            xml.write(f, encoding)
+            writer.write_musicxml(f, encoding)
 
 
 class write(_command):
@@ -231,13 +230,12 @@ class highlight(_export_command):
         w.title = cursor.document.filename
         w.encoding = opts.output_encoding or "utf-8"
         
-        doc = w.html(cursor)
         if self.output:
             filename = self.output
         else:
             filename = output.get_filename(opts, cursor.document.filename)
         with output.file(opts, filename, w.encoding) as f:
-            f.write(doc)
+            w.write(cursor, f)
 
 
 hl = highlight
@@ -0,0 +1,136 @@
+# This file is part of the Frescobaldi project, http://www.frescobaldi.org/
+#
+# Copyright (c) 2014 - 2014 by Wilbert Berendsen
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# See http://www.gnu.org/licenses/ for more information.
+
+
+"""
+Processing many files in parallel, for the -j option of the 'ly' command.
+
+Every file is processed in a worker process, recording all its output in
+memory. The main process replays the output of the files in the order of
+the input files, so the result is the same as when processing the files one
+by one, including appending to output files that were already written to
+and making backup copies.
+"""
+
+from __future__ import unicode_literals
+
+import contextlib
+import copy
+import io
+import multiprocessing
+import sys
+
+from .main import Options, Output, process
+
+
+class BufferedOutput(Output):
+    """Output that records all output of a file operation in memory.
+    
+    Every event is a tuple. Writes to standard output or error are recorded
+    as ('stdout', text) or ('stderr', text), output files as ('file',
+    filename, encoding, backup_suffix, data).
+    
+    """
+    def __init__(self):
+        super(BufferedOutput, self).__init__()
+        self.events = []
+    
+    @contextlib.contextmanager
+    def file(self, opts, filename, encoding):
+        """Return a context manager for writing to, recording the data."""
+        if encoding in (False, "binary"):
+            f = io.BytesIO()
+        else:
+            f = io.StringIO()
+        yield f
+        self.events.append(
+            ('file', filename, encoding, opts.backup_suffix, f.getvalue()))
+    
+    def stream(self, name):
+        """Return a file-like object recording writes to stdout or stderr."""
+        return _Stream(self.events, name)
+
+
+class _Stream(object):
+    """A file-like object appending all writes to a list of events."""
+    def __init__(self, events, name):
+        self.events = events
+        self.name = name
+    
+    def write(self, text):
+        self.events.append((self.name, text))
+    
+    def flush(self):
+        pass
+
+
+def process_job(job):
+    """Process one file in a worker process.
+    
+    job is a three-tuple (variables, commands, filename), where variables is
+    the __dict__ of the Options. Returns a two-tuple (exit_code, events),
+    where events is the list of output events to be replayed.
+    
+    """
+    variables, commands, filename = job
+    opts = Options()
+    opts.__dict__.update(variables)
+    output = BufferedOutput()
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = output.stream('stdout'), output.stream('stderr')
+    try:
+        exit_code = process(opts, commands, filename, output)
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+    return exit_code, output.events
+
+
+def replay(opts, events, output):
+    """Replay the events recorded by a BufferedOutput, using output."""
+    for event in events:
+        if event[0] == 'file':
+            filename, encoding, backup_suffix, data = event[1:]
+            file_opts = copy.copy(opts)
+            file_opts.backup_suffix = backup_suffix
+            with output.file(file_opts, filename, encoding) as f:
+                f.write(data)
+        else:
+            getattr(sys, event[0]).write(event[1])
+
+
+def run(opts, commands, files, output):
+    """Run the commands on the files using opts.jobs worker processes.
+    
+    The output is written using the Output object, in the order of the files.
+    Returns the exit code.
+    
+    """
+    exit_code = 0
+    pool = multiprocessing.Pool(min(opts.jobs, len(files)))
+    try:
+        jobs = ((vars(opts), commands, filename) for filename in files)
+        # imap yields the results in the order of the files
+        for code, events in pool.imap(process_job, jobs):
+            replay(opts, events, output)
+            exit_code |= code
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return exit_code
@@ -19,6 +19,8 @@
 
 """
 The entry point for the 'ly' command.
+
+Call main() to run the command; importing this module does not run it.
 """
 
 from __future__ import unicode_literals
@@ -29,6 +31,7 @@ import io
 import os
 import shutil
 import sys
+import time
 
 import ly.pkginfo
 
@@ -49,6 +52,7 @@ OPTIONS
   -e, --encoding ENC    (input) encoding (default UTF-8)
   --output-encoding ENC output encoding (default to input encoding)
   -d variable=value     set a variable
+  -j, --jobs N          process N files at the same time, using N processes
   --                    consider the remaining arguments to be file names
 
 ARGUMENTS
@@ -130,6 +134,11 @@ If there is a default value, it is written between brackets:
                         ded.
   number-lines [false]  whether to add line numbers when creating syntax-
                         highlighted HTML.
+  jobs [1]              the number of files to process in parallel (also set by
+                        -j argument). The output is written in the order of the
+                        input files, as if they were processed one by one.
+  timing [false]        whether to print the time spent on every file to
+                        standard error.
 
 These variables influence the output of information commands:
 
@@ -146,6 +155,10 @@ Example using the '*' in the output file name:
   ly "transpose c d" *.ly -o '*-transposed.ly'
   ly highlight *.ly -o 'html/?.html'
 
+Example processing many files using four processes:
+
+  ly -j 4 "reformat; transpose c d" -i *.ly
+
 
 """)
 
@@ -181,6 +194,8 @@ class Options(object):
         self.replace_pattern = True
         self.backup_suffix = '~'
         self.with_filename = None
+        self.jobs = 1
+        self.timing = False
         
         self.indent_width = 2
         self.indent_tabs = False
@@ -238,8 +253,11 @@ class Output(object):
         mode and you should encode the data you write yourself.
         
         """
+        closefd = True
         if not filename or filename == '-':
-            filename, mode = sys.stdout.fileno(), 'w'
+            # keep stdout open for the next file and in order with print output
+            sys.stdout.flush()
+            filename, mode, closefd = sys.stdout.fileno(), 'w', False
         else:
             if filename not in self._seen_filenames:
                 self._seen_filenames.add(filename)
@@ -249,9 +267,9 @@ class Output(object):
             else:
                 mode = 'a'
         if encoding in (False, "binary"):
-            f = io.open(filename, mode + 'b')
+            f = io.open(filename, mode + 'b', closefd=closefd)
         else:
-            f = io.open(filename, mode, encoding=encoding)
+            f = io.open(filename, mode, encoding=encoding, closefd=closefd)
         try:
             yield f
         finally:
@@ -308,6 +326,11 @@ def parse_command_line():
             opts.set_variable(name, value)
         elif arg in ('-e', '--encoding'):
             opts.encoding = next_arg("missing encoding name")
+        elif arg in ('-j', '--jobs'):
+            jobs = next_arg("missing number of jobs")
+            if not jobs.isdigit() or not int(jobs):
+                die("invalid number of jobs: " + jobs)
+            opts.jobs = int(jobs)
         elif arg == '--output-encoding':
             opts.output_encoding = next_arg("missing output encoding name")
         elif arg == '--':
@@ -351,32 +374,60 @@ def parse_command(arg):
                 die("invalid arguments: " + c)
     return result
 
-def load(filename, encoding, mode):
-    """Load a file, returning a ly.document.Document"""
+def load(filename, encoding, mode, lazy=False):
+    """Load a file, returning a ly.document.Document
+    
+    If lazy is True, the lines are read from the file only when needed.
+    
+    """
     import ly.document
     if filename == '-':
-        doc = ly.document.Document.load(sys.stdin.fileno(), encoding, mode)
+        doc = ly.document.Document.load(sys.stdin.fileno(), encoding, mode, lazy)
         doc.filename = '-'
     else:
-        doc = ly.document.Document.load(filename, encoding, mode)
+        doc = ly.document.Document.load(filename, encoding, mode, lazy)
     return doc
 
+def informative(commands):
+    """Return True if the commands only print information about a document.
+    
+    In that case, the document does not need to be read completely.
+    
+    """
+    from . import command
+    return all(isinstance(c, (command._info_command, command.set_variable))
+               for c in commands)
+
+def process(opts, commands, filename, output):
+    """Run the commands on the file, returning the exit code (0 or 1)."""
+    import ly.document
+    start = time.time()
+    try:
+        doc = load(filename, opts.encoding, opts.mode, informative(commands))
+    except IOError as err:
+        sys.stderr.write('warning: skipping file "{0}":\n  {1}\n'.format(filename, err))
+        return 1
+    try:
+        cursor = ly.document.Cursor(doc)
+        for c in commands:
+            c.run(opts, cursor, output)
+    finally:
+        doc.close()
+    if opts.timing:
+        sys.stderr.write('{0}: {1:.3f} sec\n'.format(filename, time.time() - start))
+    return 0
+
 def main():
     opts, commands, files = parse_command_line()
-    import ly.document
     output = Output()
     exit_code = 0
+    if opts.jobs > 1 and len(files) > 1 and '-' not in files:
+        from . import jobs
+        return jobs.run(opts, commands, files, output)
     for filename in files:
         options = copy.deepcopy(opts)
-        try:
-            doc = load(filename, options.encoding, options.mode)
-        except IOError as err:
-            sys.stderr.write('warning: skipping file "{0}":\n  {1}\n'.format(filename, err))
-            exit_code = 1
-            continue
-        cursor = ly.document.Cursor(doc)
-        for c in commands:
-            c.run(options, cursor, output)
+        exit_code |= process(options, commands, filename, output)
     return exit_code
 
-sys.exit(main())
+if __name__ == '__main__':
+    sys.exit(main())
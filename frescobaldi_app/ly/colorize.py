@@ -251,15 +251,38 @@ def get_tokens(cursor):
     This can be used to convert a highlighted part of a document to e.g. HTML.
     
     """
-    tokens = list(ly.document.Source(cursor, None, ly.document.PARTIAL, True))
-    if tokens:
-        if cursor.end is not None and tokens[-1].end > cursor.end:
-            t = tokens[-1]
-            tokens[-1] = type(t)(t[:cursor.end - t.end], t.pos)
-        if cursor.start > tokens[0].pos:
-            t = tokens[0]
-            tokens[0] = type(t)(t[cursor.start - t.pos:], cursor.start)
-    return tokens
+    return list(iter_tokens(cursor))
+
+
+def iter_tokens(cursor):
+    """Yield the tokens for the cursor, like get_tokens() returns them."""
+    tokens = ly.document.Source(cursor, None, ly.document.PARTIAL, True)
+    for t in tokens:
+        if cursor.start > t.pos:
+            t = type(t)(t[cursor.start - t.pos:], cursor.start)
+        if cursor.end is not None and t.end > cursor.end:
+            t = type(t)(t[:cursor.end - t.end], t.pos)
+        yield t
+
+
+def text_range(document, start, end):
+    """Return the text of the document from start to end.
+    
+    In contrast to slicing document.plaintext(), only the blocks in the range
+    are read.
+    
+    """
+    block = document.block(start)
+    pos = document.position(block)
+    result = []
+    while True:
+        text = document.text(block)
+        if end <= pos + len(text):
+            result.append(text[max(start - pos, 0):end - pos])
+            return '\n'.join(result)
+        result.append(text[max(start - pos, 0):])
+        block = document.next_block(block)
+        pos = document.position(block)
 
 
 def map_tokens(cursor, mapper):
@@ -268,18 +291,20 @@ def map_tokens(cursor, mapper):
     The style is what mapper[token] returns.
     Style may be None, which also happens with unparsed (not-tokenized) text.
     
+    The text between the tokens is read from the blocks it is in, so the
+    document's text is never joined as a whole.
+    
     """
-    text = cursor.document.plaintext()
+    d = cursor.document
     start = cursor.start
-    tokens = get_tokens(cursor)
     t = None
-    for t in tokens:
+    for t in iter_tokens(cursor):
         if t.pos > start:
-            yield text[start:t.pos], None
+            yield text_range(d, start, t.pos), None
         yield t, mapper[t]
         start = t.end
     if t and cursor.end is not None and cursor.end > t.end:
-        yield text[t.end:cursor.end]
+        yield text_range(d, t.end, cursor.end), None
 
 
 def melt_mapped_tokens(mapped_tokens):
@@ -419,16 +444,17 @@ def html(cursor, mapper, span=format_css_span_class):
     You'll want to wrap the HTML inside <pre> tokens and add a CSS stylesheet.
     
     """
-    result = []
+    return ''.join(iter_html(cursor, mapper, span))
+
+
+def iter_html(cursor, mapper, span=format_css_span_class):
+    """Yield the HTML html() returns in small pieces."""
     for t, style in melt_mapped_tokens(map_tokens(cursor, mapper)):
         arg = span(style) if style else None
         if arg:
-            result.append('<span {0}>'.format(arg))
-            result.append(html_escape(t))
-            result.append('</span>')
+            yield '<span {0}>{1}</span>'.format(arg, html_escape(t))
         else:
-            result.append(html_escape(t))
-    return ''.join(result)
+            yield html_escape(t)
 
 
 def add_line_numbers(cursor, html, linenum_attrs=None, document_attrs=None):
@@ -441,6 +467,16 @@ def add_line_numbers(cursor, html, linenum_attrs=None, document_attrs=None):
     By default, the id for the linenumbers <td> is set to "linenumbers", 
     and the id for the document <td> is set to "document".
     
+    """
+    return ''.join(iter_add_line_numbers(cursor, [html], linenum_attrs, document_attrs))
+
+
+def iter_add_line_numbers(cursor, html, linenum_attrs=None, document_attrs=None):
+    """Yield the result of add_line_numbers() in pieces.
+    
+    In contrast to add_line_numbers(), html is an iterable of HTML pieces, 
+    e.g. as yielded by iter_html().
+    
     """
     linenum_attrs = dict(linenum_attrs) if linenum_attrs else {"style": "background: #eeeeee;"}
     document_attrs = dict(document_attrs) if document_attrs else {}
@@ -454,19 +490,23 @@ def add_line_numbers(cursor, html, linenum_attrs=None, document_attrs=None):
     
     start_num = cursor.document.index(cursor.start_block()) + 1
     end_num = cursor.document.index(cursor.end_block()) + 1
-    linenumbers = '<pre>{0}</pre>'.format('\n'.join(map(format, range(start_num, end_num))))
-    body = '<pre>{0}</pre>'.format(html)
-    return (
+    yield (
         '<table border="0" cellpadding="4" cellspacing="0">'
         '<tbody><tr>'
         '<td{0}>'
-        '\n{1}\n'
+        '\n<pre>').format(html_format_attrs(linenum_attrs))
+    for num in range(start_num, end_num):
+        yield format(num) if num == start_num else '\n' + format(num)
+    yield (
+        '</pre>\n'
         '</td>'
-        '<td{2}>'
-        '\n{3}\n'
-        '</td></tr></tbody></table>\n').format(
-            html_format_attrs(linenum_attrs), linenumbers,
-            html_format_attrs(document_attrs), body)
+        '<td{0}>'
+        '\n<pre>').format(html_format_attrs(document_attrs))
+    for piece in html:
+        yield piece
+    yield (
+        '</pre>\n'
+        '</td></tr></tbody></table>\n')
 
 
 def format_html_document(body, title="", stylesheet=None, stylesheet_ref=None, encoding='UTF-8'):
@@ -480,32 +520,64 @@ def format_html_document(body, title="", stylesheet=None, stylesheet_ref=None, e
     should encode it yourself in the same encoding (by default utf-8) when 
     writing it to a file.
     
+    """
+    return ''.join(iter_html_document([body], title, stylesheet, stylesheet_ref, encoding))
+
+
+def iter_html_document(body, title="", stylesheet=None, stylesheet_ref=None, encoding='UTF-8'):
+    """Yield the result of format_html_document() in pieces.
+    
+    In contrast to format_html_document(), body is an iterable of HTML pieces.
+    
     """
     css = ""
     if stylesheet_ref:
         css += '<link rel="stylesheet" type="text/css" href="{0}"/>\n'.format(html_escape_attr(stylesheet_ref))
     if stylesheet:
         css += '<style type="text/css">\n{0}\n</style>\n'.format(stylesheet)
-    return (
+    yield (
         '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01//EN" "http://www.w3.org/TR/html4/strict.dtd">\n'
         '<html><head>\n'
         '<title>{title}</title>\n'
         '<meta http-equiv="Content-Type" content="text/html; charset={encoding}" />\n'
         '{css}'
         '</head>\n'
-        '<body>\n{body}</body>\n</html>\n').format(
+        '<body>\n').format(
             title = html_escape(title),
             encoding = encoding,
-            body = body,
             css = css,
         )
+    for piece in body:
+        yield piece
+    yield '</body>\n</html>\n'
+
+
+def chunked(pieces, size=65536):
+    """Join the pieces of text and yield them in chunks of at least size.
+    
+    The last chunk may be smaller. This is used to write the pieces 
+    yielded by e.g. iter_html() efficiently to a file.
+    
+    """
+    chunk = []
+    length = 0
+    for piece in pieces:
+        chunk.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield ''.join(chunk)
 
 
 class HtmlWriter(object):
     """A do-it-all object to create syntax highlighted HTML.
     
     You can set the instance attributes to configure the behaviour in all
-    details. Then call the html(cursor) method to get the HTML.
+    details. Then call the html(cursor) method to get the HTML, or the
+    write(cursor, f) method to write it to a file object in chunks.
     
     """
     
@@ -531,6 +603,20 @@ class HtmlWriter(object):
     
     def html(self, cursor):
         """Return the output HTML."""
+        return ''.join(self.iter_html(cursor))
+    
+    def write(self, cursor, f, chunksize=65536):
+        """Write the output HTML to the file object f.
+        
+        The HTML is written in chunks of about chunksize characters, it is 
+        never built as a whole in memory.
+        
+        """
+        for chunk in chunked(self.iter_html(cursor), chunksize):
+            f.write(chunk)
+    
+    def iter_html(self, cursor):
+        """Yield the output HTML in pieces."""
         doc_style = {}
         if self.fgcolor:
             doc_style['color'] = self.fgcolor
@@ -558,12 +644,12 @@ class HtmlWriter(object):
                 css.append(css_group('#' + self.linenumbers_id, num_style))
             css.append(format_stylesheet(self.css_scheme))
         
-        body = html(cursor, self.css_mapper or css_mapper(), formatter)
+        body = iter_html(cursor, self.css_mapper or css_mapper(), formatter)
         
         if self.number_lines:
-            body = add_line_numbers(cursor, body, num_attrs, doc_attrs)
+            body = iter_add_line_numbers(cursor, body, num_attrs, doc_attrs)
         else:
-            body = '<pre{0}>{1}</pre>'.format(html_format_attrs(doc_attrs), body)
+            body = self._iter_pre(body, doc_attrs)
         
         if not self.full_html:
             return body
@@ -572,6 +658,11 @@ class HtmlWriter(object):
             css = None
         else:
             css = '\n'.join(css)
-        return format_html_document(body, self.title, css, self.stylesheet_ref, self.encoding)
-
-
+        return iter_html_document(body, self.title, css, self.stylesheet_ref, self.encoding)
+    
+    def _iter_pre(self, body, attrs):
+        """Yield the body pieces wrapped in a <pre> element."""
+        yield '<pre{0}>'.format(html_format_attrs(attrs))
+        for piece in body:
+            yield piece
+        yield '</pre>'
@@ -63,18 +63,78 @@ class DocInfo(object):
     DocInfo does not update when the document changes, you should just 
     instantiate a new one.
     
+    The tokens are read from the document when first needed. Some methods, 
+    like version_string(), only read the tokens up to what they look for, 
+    which is fast for a document that tokenizes (or even loads) lazily.
+    
     """
     def __init__(self, doc):
         """Initialize with ly.document.DocumentBase instance."""
         self._d = doc
+        self._token_list = []
+        self._token_source = self._read_tokens()
+    
+    def _read_tokens(self):
+        """(Private) Yield all tokens, with Newline tokens between the lines."""
+        doc = self._d
         blocks = iter(doc)
         for b in blocks:
-            tokens = doc.tokens_with_position(b)
-            self.tokens = sum(map(
-                lambda b: ((ly.lex.Newline('\n', doc.position(b) - 1),) +
-                           doc.tokens_with_position(b)),
-                blocks), tokens)
-        self.classes = tuple(map(type, self.tokens))
+            for t in doc.tokens_with_position(b):
+                yield t
+            for b in blocks:
+                yield ly.lex.Newline('\n', doc.position(b) - 1)
+                for t in doc.tokens_with_position(b):
+                    yield t
+    
+    def _read_until(self, index):
+        """(Private) Read tokens until index is available or all are read.
+        
+        Returns the list of tokens read so far.
+        
+        """
+        tokens = self._token_list
+        if self._token_source and index >= len(tokens):
+            tokens.extend(itertools.islice(self._token_source,
+                                           index + 1 - len(tokens)))
+            if index >= len(tokens):
+                self._token_source = None
+        return tokens
+    
+    def _find_all_lazy(self, token, cls):
+        """(Private) Yield the indices of the token of class cls.
+        
+        Tokens are only read from the document as far as needed.
+        
+        """
+        i = 0
+        while True:
+            tokens = self._read_until(i)
+            if i >= len(tokens):
+                return
+            if tokens[i] == token and type(tokens[i]) is cls:
+                yield i
+            i += 1
+    
+    @property
+    def tokens(self):
+        """All tokens of the document, as a tuple."""
+        try:
+            return self._tokens
+        except AttributeError:
+            if self._token_source:
+                self._token_list.extend(self._token_source)
+                self._token_source = None
+            self._tokens = tuple(self._token_list)
+            return self._tokens
+    
+    @property
+    def classes(self):
+        """The classes of all tokens of the document, as a tuple."""
+        try:
+            return self._classes
+        except AttributeError:
+            self._classes = tuple(map(type, self.tokens))
+            return self._classes
     
     @property
     def document(self):
@@ -113,8 +173,10 @@ class DocInfo(object):
         s = slice(start, end)
         n = type(self).__new__(type(self))
         n._d = self._d
-        n.tokens = self.tokens[s]
-        n.classes = self.classes[s]
+        n._tokens = self.tokens[s]
+        n._classes = self.classes[s]
+        n._token_list = list(n._tokens)
+        n._token_source = None
         return n
     
     @_cache
@@ -175,9 +237,8 @@ class DocInfo(object):
         without quotes. Returns None if there was no \\version command found.
         
         """
-        i = self.find("\\version", ly.lex.lilypond.Keyword)
-        if i != -1:
-            tokens = iter(self.tokens[i+1:i+10])
+        for i in self._find_all_lazy("\\version", ly.lex.lilypond.Keyword):
+            tokens = iter(self._read_until(i+9)[i+1:i+10])
             for t in tokens:
                 if not isinstance(t, (ly.lex.Space, ly.lex.Comment)):
                     if t == '"':
@@ -185,6 +246,7 @@ class DocInfo(object):
                     else:
                         pred = lambda t: not isinstance(t, (ly.lex.Space, ly.lex.Comment))
                     return ''.join(itertools.takewhile(pred, tokens))
+            break
 
     @_cache
     def version(self):
@@ -286,8 +348,8 @@ class DocInfo(object):
     def language(self):
         """The pitch language, None if not set in the document."""
         languages = ly.pitch.pitchInfo.keys()
-        for i in self.find_all("\\language", ly.lex.lilypond.Keyword):
-            for t in self.tokens[i+1:i+10]:
+        for i in self._find_all_lazy("\\language", ly.lex.lilypond.Keyword):
+            for t in self._read_until(i+9)[i+1:i+10]:
                 if isinstance(t, ly.lex.Space):
                     continue
                 elif t == '"':
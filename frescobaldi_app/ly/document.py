@@ -34,8 +34,12 @@ with d:
     d[5:5] = 'different '
 d.plaintext()  --> 'some different string'
 
-Changes are applied when the context is exited, also the modified part of the
-document is re-tokenized. Changes may not overlap.
+Changes are applied when the context is exited. Changes may not overlap.
+
+The Document implementation tokenizes its text on demand: the tokens of a block
+(and all blocks before it) are only computed when they are requested, and a
+document loaded with Document.load(lazy=True) even reads its lines from the file
+only as far as they are needed.
 
 The tokens(block) method returns a tuple of tokens for the specified block. 
 Depending on the implementation, a block describes a line in the LilyPond 
@@ -334,6 +338,11 @@ class Document(DocumentBase):
     The modified attribute is set to True as soon as the document is changed,
     but the setplaintext() method sets it to False.
     
+    The tokens are computed on demand. The first _valid blocks have up-to-date
+    tokens and states. A block after those with its tokens not set to None
+    was tokenized starting with the current end state of its previous block,
+    so it need not be tokenized again.
+    
     """
     modified = False
     
@@ -342,24 +351,90 @@ class Document(DocumentBase):
         self._fridge = ly.lex.Fridge()
         self._mode = mode
         self._guessed_mode = None
+        self._lines = None
         self.setplaintext(text)
     
     @classmethod
-    def load(cls, filename, encoding='utf-8', mode=None):
-        """Load the document from a file, using the specified encoding and mode."""
-        with io.open(filename, encoding=encoding) as f:
-            doc = cls(f.read(), mode)
+    def load(cls, filename, encoding='utf-8', mode=None, lazy=False):
+        """Load the document from a file, using the specified encoding and mode.
+        
+        If lazy is True, the file is kept open and its lines are only read
+        when they are needed. This is useful to quickly get information from
+        the start of a document. The file is closed when all lines are read,
+        or when close() is called.
+        
+        """
+        f = io.open(filename, encoding=encoding)
+        if lazy:
+            doc = cls(mode=mode)
+            doc._setlines(f)
+        else:
+            with f:
+                doc = cls(f.read(), mode)
         doc.filename = filename
         return doc
     
+    def _setlines(self, f):
+        """(Private) Set the contents to the lines to be read from file f."""
+        self._blocks = []
+        self._lines = f
+        self._pending = True    # there is one more (maybe empty) line
+        if not self._mode:
+            self._guessed_mode = None
+        self._valid = 0
+        self.modified = False
+    
+    def _read(self, index=None):
+        """(Private) Read lines until the block at index exists (None: all)."""
+        lines, blocks = self._lines, self._blocks
+        while lines and (index is None or index >= len(blocks)):
+            line = lines.readline()
+            if line.endswith('\n'):
+                text, self._pending = line[:-1], True
+            elif line or self._pending:
+                text, self._pending = line, False
+            else:
+                text = None
+            if not self._pending:
+                lines.close()
+                lines = self._lines = None
+            if text is not None:
+                b = _Block(text.replace('\r', ''), len(blocks))
+                if blocks:
+                    b.position = blocks[-1].position + len(blocks[-1].text) + 1
+                else:
+                    b.position = 0
+                blocks.append(b)
+    
+    def close(self):
+        """Close the file of a lazily loaded document that is not read completely.
+        
+        The lines that are not read yet are not read anymore; the document
+        only contains the lines read so far. Does nothing if the file was
+        already closed.
+        
+        """
+        if self._lines:
+            self._lines.close()
+            self._lines = None
+    
     def __len__(self):
         """Return the number of blocks"""
+        self._read()
         return len(self._blocks)
     
     def __getitem__(self, index):
         """Return the block at the specified index."""
+        self._read(index if index >= 0 else None)
         return self._blocks[index]
     
+    def next_block(self, block):
+        """Return the next block, which may be invalid."""
+        index = block.index + 1
+        self._read(index)
+        if index < len(self._blocks):
+            return self._blocks[index]
+    
     def setmode(self, mode):
         """Sets the mode to one of the ly.lex modes.
         
@@ -386,6 +461,9 @@ class Document(DocumentBase):
     
     def setplaintext(self, text):
         """Set the text of the document, sets modified to False."""
+        if self._lines:
+            self._lines.close()
+            self._lines = None
         text = text.replace('\r', '')
         lines = text.split('\n')
         self._blocks = [_Block(t, n) for n, t in enumerate(lines)]
@@ -399,21 +477,52 @@ class Document(DocumentBase):
         self.modified = False
     
     def _update_all_tokens(self):
-        state = self.initial_state()
-        for b in self._blocks:
-            b.tokens = tuple(state.tokens(b.text))
-            b.state = self._fridge.freeze(state)
+        """(Private) Invalidate all tokens, e.g. when the mode changed."""
+        self._valid = 0
+        if self._blocks:
+            self._blocks[0].tokens = None
+    
+    def _tokenize(self, index):
+        """(Private) Make sure the blocks up to index have valid tokens."""
+        blocks = self._blocks
+        i = self._valid
+        if i > index:
+            return
+        freeze, thaw = self._fridge.freeze, self._fridge.thaw
+        state = None
+        while i <= index:
+            b = blocks[i]
+            if b.tokens is None:
+                if state is None:
+                    state = thaw(blocks[i-1].state) if i else self.initial_state()
+                b.tokens = tuple(state.tokens(b.text))
+                frozen = freeze(state)
+                if frozen != b.state and i + 1 < len(blocks):
+                    # the next block must be tokenized again
+                    blocks[i+1].tokens = None
+                b.state = frozen
+            else:
+                state = None
+            i += 1
+        self._valid = i
     
     def initial_state(self):
         """Return the state at the beginning of the document."""
+        if not self._mode and not self._guessed_mode:
+            self._guessed_mode = ly.lex.guessModeFromLines(
+                self.text(b) for b in self)
         return ly.lex.state(self._mode or self._guessed_mode)
         
     def state_end(self, block):
         """Return the state at the end of the specified block."""
+        self._tokenize(block.index)
         return self._fridge.thaw(block.state)
     
     def block(self, position):
         """Return the text block at the specified character position."""
+        while self._lines and (not self._blocks or position >
+                self._blocks[-1].position + len(self._blocks[-1].text)):
+            self._read(len(self._blocks))
         if 0 <= position <= self._blocks[-1].position + len(self._blocks[-1].text):
             lo = 0
             hi = len(self._blocks)
@@ -443,33 +552,67 @@ class Document(DocumentBase):
     
     def tokens(self, block):
         """Return the tuple of tokens of the specified block."""
+        self._tokenize(block.index)
         return block.tokens
     
     def apply_changes(self):
-        for start, end, text in self._changes_list:
-            s = self.block(start)
-            # first remove the old contents
-            if end is None:
-                # all text to the end should be removed
-                s.text = s.text[:start - s.position]
-                del self._blocks[s.index+1:]
+        """Apply all changes in one pass, building a new list of blocks.
+        
+        The changes are handled from the start of the document to the end. 
+        Untouched blocks are kept with their tokens, the changed lines get new 
+        blocks which are tokenized again on demand.
+        
+        """
+        self._read()
+        blocks = self._blocks
+        new = []        # the new list of blocks
+        text = None     # the text of the line being built, if any
+        index = 0       # the index of the old block pos is in
+        pos = 0         # the old position up to where the text is handled
+        first = None    # the index of the first changed block
+        size = self.size()
+        
+        def find(position, i):
+            """Return the index of the old block at position, searching from i."""
+            while i + 1 < len(blocks) and blocks[i+1].position <= position:
+                i += 1
+            return i
+        
+        for start, end, insert in reversed(self._changes_list):
+            start = max(start, pos)     # ignore overlapping edits
+            b = blocks[find(start, index)]
+            # copy the unchanged text before the change
+            if text is not None and b.index > index:
+                # finish the line being built with the rest of its old block
+                new.append(self._finish_block(text, blocks[index], pos))
+                index += 1
+                text = None
+            if text is None:
+                new.extend(blocks[index:b.index])
+                if first is None:
+                    first = b.index
+                index = b.index
+                text = b.text[:start - b.position]
             else:
-                # remove til end position
-                e = self.block(end)
-                s.text = s.text[:start - s.position] + e.text[end - e.position:]
-                del self._blocks[s.index+1:e.index+1]
-            # now insert the new stuff
-            if text:
-                lines = text.split('\n')
-                lines[-1] += s.text[start - s.position:]
-                s.text = s.text[:start - s.position] + lines[0]
-                self._blocks[s.index+1:s.index+1] = map(_Block, lines[1:])
-            # make sure this line gets reparsed
-            s.tokens = None
-        
-        # update the position of all the new blocks
-        pos = s.position
-        for i, b in enumerate(self._blocks[s.index:], s.index):
+                text += b.text[pos - b.position:start - b.position]
+            # skip the removed text
+            pos = max(start, size if end is None else min(end, size))
+            index = find(pos, b.index)
+            # and add the new text
+            lines = insert.split('\n')
+            text += lines[0]
+            for t in lines[1:]:
+                new.append(_Block(text))
+                text = t
+        
+        # finish the last line and copy the remaining blocks
+        new.append(self._finish_block(text, blocks[index], pos))
+        new.extend(blocks[index+1:])
+        
+        # update the index and position of all the blocks after the changes
+        pos = blocks[first].position
+        self._blocks = new
+        for i, b in enumerate(new[first:], first):
             b.index = i
             b.position = pos
             pos += len(b.text) + 1
@@ -484,17 +627,19 @@ class Document(DocumentBase):
                 self._update_all_tokens()
                 return
         
-        # update the tokens starting at block s
-        state = self.state(s)
-        reparse = False
-        for block in self._blocks[s.index:]:
-            if reparse or block.tokens is None:
-                block.tokens = tuple(state.tokens(block.text))
-                frozen = self._fridge.freeze(state)
-                reparse = block.state != frozen
-                block.state = frozen
-            else:
-                state = self._fridge.thaw(block.state)
+        # the tokens are updated on demand, starting at the first changed block
+        self._valid = min(self._valid, first)
+    
+    def _finish_block(self, text, old, pos):
+        """(Private) Return a new block with text and the rest of old from pos.
+        
+        The block gets the state of the old block, because the block after it
+        was tokenized using that state.
+        
+        """
+        block = _Block(text + old.text[pos - old.position:])
+        block.state = old.state
+        return block
 
 
 class _Block(object):
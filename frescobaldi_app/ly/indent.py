@@ -44,47 +44,67 @@ class Indenter(object):
         lines if not changed if it is shorter than it should be.
         
         """
-        indents = ['']
         start_block, end_block = cursor.start_block(), cursor.end_block()
-        in_range = False
+        with cursor.document as d:
+            def lines():
+                in_range = False
+                for b in d:
+                    if b == start_block:
+                        in_range = True
+                    yield b, Line(d, b), in_range
+                    if b == end_block:
+                        break
+            
+            for b, line, indent in self.indents(lines(), indent_blank_lines):
+                if indent is not None:
+                    d[d.position(b):d.position(b)+len(line.indent)] = indent
+    
+    def indents(self, lines, indent_blank_lines=False):
+        """Compute the new indent for a sequence of lines.
+        
+        lines should yield (obj, line, in_range) tuples, where line is a 
+        Line instance and in_range is True if the line should be indented. 
+        The lines must start at the beginning of the document. The obj value 
+        is not used but returned again, so the caller can use it to know 
+        which line the indent belongs to.
+        
+        Yields (obj, line, indent) tuples, where indent is the new indent 
+        the line should get, or None if the indent should not be changed.
+        See indent() for the meaning of indent_blank_lines.
+        
+        """
+        indents = ['']
         pline = None
         prev_indent = ''
-        with cursor.document as d:
-            for b in cursor.document:
-                if b == start_block:
-                    in_range = True
-                
-                line = Line(d, b)
-                
-                # handle indents of prev line
-                if pline:
-                    if pline.indent != False:
-                        prev_indent = pline.indent
-                    if pline.indenters:
-                        current_indent = indents[-1]
-                        for align, indent in pline.indenters:
-                            new_indent = current_indent
-                            if align:
-                                new_indent += ' ' * (align - len(prev_indent))
-                            if indent:
-                                new_indent += '\t' if self.indent_tabs else ' ' * self.indent_width
-                            indents.append(new_indent)
-                del indents[max(1, len(indents) - line.dedenters_start):]
-                
-                # if we may not change the indent just remember the current
-                if line.indent is not False:
-                    if not in_range:
-                        indents[-1] = line.indent
-                    elif not indent_blank_lines and line.isblank and indents[-1].startswith(line.indent):
-                        pass # don't make shorter indents longer on blank lines
-                    elif line.indent != indents[-1]:
-                        d[d.position(b):d.position(b)+len(line.indent)] = indents[-1]
-                del indents[max(1, len(indents) - line.dedenters_end):]
-                
-                if b == end_block:
-                    break
-                
-                pline = line
+        for obj, line, in_range in lines:
+            # handle indents of prev line
+            if pline:
+                if pline.indent != False:
+                    prev_indent = pline.indent
+                if pline.indenters:
+                    current_indent = indents[-1]
+                    for align, indent in pline.indenters:
+                        new_indent = current_indent
+                        if align:
+                            new_indent += ' ' * (align - len(prev_indent))
+                        if indent:
+                            new_indent += '\t' if self.indent_tabs else ' ' * self.indent_width
+                        indents.append(new_indent)
+            del indents[max(1, len(indents) - line.dedenters_start):]
+            
+            # if we may not change the indent just remember the current
+            indent = None
+            if line.indent is not False:
+                if not in_range:
+                    indents[-1] = line.indent
+                elif not indent_blank_lines and line.isblank and indents[-1].startswith(line.indent):
+                    pass # don't make shorter indents longer on blank lines
+                elif line.indent != indents[-1]:
+                    indent = indents[-1]
+            yield obj, line, indent
+            del indents[max(1, len(indents) - line.dedenters_end):]
+            
+            pline = line
     
     def increase_indent(self, cursor):
         """Manually add indent to all lines of cursor."""
@@ -232,18 +252,32 @@ class Line(object):
         should a new indent level be added (a tab or some amount of spaces).
         
         """
-        state = document.state(block)
-        tokens = document.tokens(block)
+        self.analyse(document.tokens(block), document.state(block).parser())
+    
+    @classmethod
+    def from_tokens(cls, tokens, parser=None):
+        """Return a Line for the tokens that are not (yet) in a document.
         
+        The token positions should be relative to the start of the line, and 
+        parser, if given, should be the parser that is active at the start 
+        of the line.
+        
+        """
+        line = cls.__new__(cls)
+        line.analyse(tokens, parser)
+        return line
+    
+    def analyse(self, tokens, parser):
+        """Set the attributes from the tokens and the parser at line start."""
         # are we in a multi-line string?
-        if isinstance(state.parser(), (
+        if isinstance(parser, (
             ly.lex.lilypond.ParseString,
             ly.lex.scheme.ParseString,
             )):
             self.indent = False
             self.isblank = False
         # or a multi-line comment?
-        elif isinstance(state.parser(), (
+        elif isinstance(parser, (
             ly.lex.lilypond.ParseBlockComment,
             ly.lex.scheme.ParseBlockComment,
             )):
@@ -88,14 +88,14 @@ import re
 
 import slexer
 from ._token import *
-from ._mode import extensions, modes, guessMode
+from ._mode import extensions, modes, guessMode, guessModeFromLines
 
 
 __all__ = [
     'State',
     'Parser', 'FallthroughParser',
     'Fridge',
-    'extensions', 'modes', 'guessMode',
+    'extensions', 'modes', 'guessMode', 'guessModeFromLines',
     'state', 'guessState',
     'Token',
     'Unparsed',
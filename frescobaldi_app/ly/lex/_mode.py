@@ -32,6 +32,7 @@ There are two items in this module:
 2. the guessMode function.
 
    This tries to guess the type of the given text and returns a mode name.
+   guessModeFromLines does the same, reading only as many lines as needed.
    
    
 You can easily add more modes in separate modules and mention them here,
@@ -43,7 +44,9 @@ tokenize module.
 
 from __future__ import unicode_literals
 
-__all__ = ['modes', 'guessMode']
+import itertools
+
+__all__ = ['modes', 'guessMode', 'guessModeFromLines']
 
 
 def _modes():
@@ -114,6 +117,39 @@ def guessMode(text):
     return "lilypond"
 
 
+def guessModeFromLines(lines):
+    """Like guessMode(), but reads the text from an iterable of lines.
+    
+    Stops reading as soon as the mode is certain, so for most documents
+    only the first few lines are read. Returns the same mode as guessMode()
+    would for the joined lines.
+    
+    """
+    lines = iter(lines)
+    for text in lines:
+        text = text.lstrip()
+        if text:
+            break
+    else:
+        return "lilypond"
+    if text.startswith(('%', '\\')):
+        latex = False
+        for line in itertools.chain((text,), lines):
+            if '\\version' in line or '\\relative' in line or '\\score' in line:
+                return "lilypond"
+            if "\\documentclass" in line or "\\begin{document}" in line:
+                latex = True
+        return "latex" if latex else "lilypond"
+    if text.startswith("<<"):
+        return "lilypond"
+    if text.startswith("<"):
+        for line in itertools.chain((text,), lines):
+            if 'DOCTYPE book' in line or "<programlisting" in line:
+                return "docbook"
+        return "html"
+    return guessMode(text)
+
+
 
 # dictionary mapping mode name to a default extension for a file of that mode.
 extensions = {
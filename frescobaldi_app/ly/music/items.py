@@ -35,6 +35,9 @@ a Document with the ly.document.Document instance. (It will read all the tokens
 from the document using the Reader from the read module.) As a convenience,
 the ly.music.document(doc) function does this.
 
+When the ly.document.Document changes, call Document.update() with the 
+changed range, so that only the affected toplevel items are read again.
+
 If you want to add new Item types, you should also add a method to read.Reader
 to construct those items.
 
@@ -43,6 +46,7 @@ to construct those items.
 from __future__ import unicode_literals
 
 from fractions import Fraction
+import bisect
 import re
 
 import node
@@ -52,6 +56,23 @@ from ly.lex import lilypond
 from ly.lex import scheme
 
 
+_slot_names_cache = {}
+
+def _slot_names(cls):
+    """(Internal) Return a tuple with the names of the __slots__ of an Item type.
+    
+    The slots of all base classes (up to Item) are included.
+    
+    """
+    try:
+        return _slot_names_cache[cls]
+    except KeyError:
+        names = _slot_names_cache[cls] = tuple(name
+            for c in cls.__mro__ if issubclass(c, Item)
+            for name in c.__dict__.get('__slots__', ()))
+        return names
+
+
 class Item(node.WeakNode):
     """Represents any item in the music of a document.
     
@@ -63,11 +84,19 @@ class Item(node.WeakNode):
     
     An Item also has a pointer to the Document it originates from.
     
+    To keep large trees compact, the Item types use __slots__. Types that 
+    have additional attributes with a class-level default value keep an 
+    instance dictionary.
+    
     """
-    document = None
-    tokens = ()
-    token = None
-    position = -1
+    __slots__ = ('document', 'token', 'tokens', 'position')
+    
+    def __init__(self, parent=None):
+        super(Item, self).__init__(parent)
+        self.document = None
+        self.token = None
+        self.tokens = ()
+        self.position = -1
 
     def __repr__(self):
         s = ' ' + repr(self.token[:]) if self.token else ''
@@ -95,7 +124,7 @@ class Item(node.WeakNode):
                 # end pos of the last child
                 yield self[-1].end_position()
             # end pos of Item or Token instances in attributes, such as duration etc
-            for i in vars(self).values():
+            for i in self._attributes():
                 if isinstance(i, Item):
                     yield i.end_position()
                 elif isinstance(i, lex.Token):
@@ -106,6 +135,58 @@ class Item(node.WeakNode):
         """Let the event.Events instance handle the events. Return the time."""
         return time
     
+    def _attributes(self):
+        """(Internal) Yield the values of all our instance attributes.
+        
+        These are the attributes in the __slots__ of our class and its base 
+        classes, and the values of the instance dictionary, if there is one.
+        
+        """
+        for name in _slot_names(type(self)):
+            try:
+                yield getattr(self, name)
+            except AttributeError:
+                pass
+        try:
+            d = self.__dict__
+        except AttributeError:
+            return
+        for value in d.values():
+            yield value
+    
+    def _copy_attrs(self, node):
+        """Called by copy(); copy attributes not starting with '_'."""
+        for name in _slot_names(type(self)):
+            if not name.startswith('_') and hasattr(self, name):
+                setattr(node, name, getattr(self, name))
+        if hasattr(self, '__dict__'):
+            super(Item, self)._copy_attrs(node)
+    
+    def _shift(self, delta, seen):
+        """(Internal) Move the positions of this node and its tokens by delta.
+        
+        Used by Document.update(). The seen set contains the id of every 
+        token and node that already has been moved.
+        
+        """
+        def shift(obj):
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                if isinstance(obj, lex.Token):
+                    obj.pos += delta
+                    obj.end += delta
+                elif isinstance(obj, Item) and not isinstance(obj, Document):
+                    obj._shift(delta, seen)
+                elif isinstance(obj, tuple):
+                    for i in obj:
+                        shift(i)
+        seen.add(id(self))
+        self.position += delta
+        for obj in self._attributes():
+            shift(obj)
+        for n in self:
+            shift(n)
+    
     def length(self):
         """Return the musical duration."""
         return 0
@@ -224,12 +305,97 @@ class Document(Item):
         self.include_node = None
         self.include_path = []
         self.relative_includes = True
+        self._toplevel = []     # (position, snapshot) for every child
+        self._size = doc.size()
+        self._initial_state = doc.initial_state().freeze()
+        for position, snapshot, item in self._reader(0).read_toplevel():
+            self._toplevel.append((position, snapshot))
+            self.append(item)
+    
+    def _reader(self, position, snapshot=None):
+        """(Internal) Return a read.Reader reading from position.
+        
+        If a snapshot is given, the state of the Reader is restored from it.
+        
+        """
         import ly.document
-        c = ly.document.Cursor(doc)
+        c = ly.document.Cursor(self.document, position)
         s = ly.document.Source(c, True, tokens_with_position=True)
         from .read import Reader
         r = Reader(s)
-        self.extend(r.read())
+        if snapshot:
+            r.restore(snapshot)
+        return r
+    
+    def update(self, position, removed, added):
+        """Update the tree after the text of our document has changed.
+        
+        position is where the change started, removed the number of 
+        characters that were removed and added the number of characters 
+        that were inserted at that position. The tokens of the document 
+        must already have been updated.
+        
+        Only the toplevel items that are touched by the change are read 
+        again. Reading stops as soon as the reader is in the same state 
+        before a toplevel item as it was when the tree was built; the 
+        remaining items are kept (with their positions adjusted).
+        
+        """
+        delta = added - removed
+        size = self.document.size()
+        initial_state = self.document.initial_state().freeze()
+        if (len(self) != len(self._toplevel) or self._size + delta != size
+            or self._initial_state != initial_state):
+            # the tree was modified, we missed a change or the mode changed:
+            # read everything
+            del self[:]
+            del self._toplevel[:]
+        self._size = size
+        self._initial_state = initial_state
+        old_end = position + removed
+        positions = [p for p, snapshot in self._toplevel]
+        # find the item to start reading with
+        i = bisect.bisect_left(positions, position) - 1
+        if i > 0:
+            # also re-read the previous item if the change touches the first
+            # token of this item, the previous item might then read more
+            n = self[i]
+            if n.token is None or position <= positions[i] + len(n.token):
+                i -= 1
+        if i < 0:
+            i = 0
+            reader = self._reader(0)
+        else:
+            reader = self._reader(positions[i], self._toplevel[i][1])
+        
+        # read new items until we are in sync again; the check is done
+        # before an item is read, so the first unchanged item is not read
+        j = [len(self)]
+        def sync(pos, snapshot):
+            old_pos = pos - delta
+            if old_pos >= old_end:
+                k = bisect.bisect_left(positions, old_pos, i)
+                if (k < len(self) and positions[k] == old_pos
+                    and self._toplevel[k][1] == snapshot):
+                    j[0] = k
+                    return True
+        toplevel = []
+        items = []
+        for pos, snapshot, item in reader.read_toplevel(sync):
+            toplevel.append((pos, snapshot))
+            items.append(item)
+        
+        # shift the remaining items
+        if delta:
+            seen = set()
+            for n in self[j[0]:]:
+                n._shift(delta, seen)
+            toplevel.extend((p + delta, snapshot)
+                            for p, snapshot in self._toplevel[j[0]:])
+        else:
+            toplevel.extend(self._toplevel[j[0]:])
+        self._toplevel[i:] = toplevel
+        self[i:j[0]] = items
     
     def node(self, position, depth=-1):
         """Return the node at or just before the specified position."""
@@ -438,19 +604,26 @@ class Document(Item):
 
 class Token(Item):
     """Any token that is not otherwise recognized""" 
+    __slots__ = ()
 
 
 class Container(Item):
     """An item having a list of child items."""
+    __slots__ = ()
 
 
 class Duration(Item):
     """A written duration"""
+    __slots__ = ()
 
 
 class Durable(Item):
     """An Item that has a musical duration, in the duration attribute."""
-    duration = 0, 1 # two Fractions: (base, scaling)
+    __slots__ = ('duration',)
+    
+    def __init__(self, parent=None):
+        super(Durable, self).__init__(parent)
+        self.duration = 0, 1 # two Fractions: (base, scaling)
     
     def length(self):
         """Return the musical duration (our base * our scaling)."""
@@ -463,36 +636,42 @@ class Durable(Item):
 
 
 class Chord(Durable, Container):
-    pass
+    __slots__ = ()
 
 
 class Unpitched(Durable):
     """A "note" without pitch, just a standalone duration."""
+    __slots__ = ()
     pitch = None
 
 
 class Note(Durable):
     """A Note that has a ly.pitch.Pitch"""
-    pitch = None
-    octave_token = None
-    accidental_token = None
-    octavecheck_token = None
+    __slots__ = ('pitch', 'octave_token', 'accidental_token', 'octavecheck_token')
+    
+    def __init__(self, parent=None):
+        super(Note, self).__init__(parent)
+        self.pitch = None
+        self.octave_token = None
+        self.accidental_token = None
+        self.octavecheck_token = None
 
 
 class Skip(Durable):
-    pass
+    __slots__ = ()
 
 
 class Rest(Durable):
-    pass
+    __slots__ = ()
 
 
 class Q(Durable):
-    pass
+    __slots__ = ()
 
 
 class Music(Container):
     """Any music expression, to be inherited of."""
+    __slots__ = ()
     def events(self, e, time, scaling):
         """Let the event.Events instance handle the events. Return the time."""
         for node in self:
@@ -520,7 +699,11 @@ class Music(Container):
 
 class MusicList(Music):
     """A music expression, either << >> or { }."""
-    simultaneous = False
+    __slots__ = ('simultaneous',)
+    
+    def __init__(self, parent=None):
+        super(MusicList, self).__init__(parent)
+        self.simultaneous = False
     
     def events(self, e, time, scaling):
         """Let the event.Events instance handle the events. Return the time."""
@@ -548,6 +731,7 @@ class MusicList(Music):
 
 class Tag(Music):
     """A \\tag, \\keepWithTag or \\removeWithTag command."""
+    __slots__ = ()
     
     def events(self, e, time, scaling):
         """Let the event.Events instance handle the events. Return the time."""
@@ -604,6 +788,7 @@ class Scaler(Music):
 
 class Grace(Music):
     """Music that has grace timing, i.e. 0 as far as computation is concerned."""
+    __slots__ = ()
     
     def events(self, e, time, scaling):
         """Let the event.Events instance handle the events. Return the time."""
@@ -629,10 +814,12 @@ class AfterGrace(Music):
     Only the duration of the first is counted.
     
     """
+    __slots__ = ()
 
 
 class PartCombine(Music):
     """The \\partcombine command with 2 music arguments."""
+    __slots__ = ()
     def events(self, e, time, scaling):
         """Let the event.Events instance handle the events. Return the time."""
         if len(self):
@@ -654,16 +841,17 @@ class PartCombine(Music):
 
 class Relative(Music):
     """A \\relative music expression. Has one or two children (Note, Music)."""
-    pass
+    __slots__ = ()
 
 
 class Absolute(Music):
     """An \\absolute music expression. Has one child (normally Music)."""
-    pass
+    __slots__ = ()
 
 
 class Transpose(Music):
     """A \\transpose music expression. Has normally three children (Note, Note, Music)."""
+    __slots__ = ()
 
 
 class Repeat(Music):
@@ -712,30 +900,37 @@ class Repeat(Music):
 
 class Alternative(Music):
     """An \\alternative expression."""
+    __slots__ = ()
 
 
 class InputMode(Music):
     """Base class for inputmode-changing commands."""
+    __slots__ = ()
 
 
 class NoteMode(InputMode):
     """A \\notemode or \\notes expression."""
+    __slots__ = ()
 
 
 class ChordMode(InputMode):
     """A \\chordmode or \\chords expression."""
+    __slots__ = ()
 
 
 class DrumMode(InputMode):
     """A \\drummode or \\drums expression."""
+    __slots__ = ()
 
 
 class FigureMode(InputMode):
     """A \\figuremode or \\figures expression."""
+    __slots__ = ()
 
 
 class LyricMode(InputMode):
     """A \\lyricmode, \\lyrics or \\addlyrics expression."""
+    __slots__ = ()
 
 
 class LyricsTo(InputMode):
@@ -752,10 +947,12 @@ class LyricsTo(InputMode):
 
 class LyricText(Durable):
     """A lyric text (word, markup or string), with a Duration."""
+    __slots__ = ()
 
 
 class LyricItem(Item):
     """Another lyric item (skip, extender, hyphen or tie)."""
+    __slots__ = ()
 
 
 class ChordSpecifier(Item):
@@ -764,10 +961,12 @@ class ChordSpecifier(Item):
     Has children of Note or ChordItem class.
     
     """
+    __slots__ = ()
 
 
 class ChordItem(Item):
     """An item inside a ChordSpecifier, e.g. a number or modifier."""
+    __slots__ = ()
 
 
 class Tremolo(Item):
@@ -874,6 +1073,7 @@ class Clef(Item):
         
 class KeySignature(Item):
     """A \\key pitch \\mode command."""
+    __slots__ = ()
     def pitch(self):
         """The ly.pitch.Pitch that denotes the pitch."""
         for i in self.find(Note):
@@ -887,57 +1087,79 @@ class KeySignature(Item):
 
 class PipeSymbol(Item):
     """A |."""
+    __slots__ = ()
 
 
 class VoiceSeparator(Item):
     """A \\\\."""
+    __slots__ = ()
 
 
 class Postfix(Item):
     """Any item that is prefixed with a _, - or ^ direction token."""
+    __slots__ = ('direction',)
 
 
 class Tie(Item):
     """A tie."""
+    __slots__ = ()
 
 
 class Slur(Item):
     """A ( or )."""
-    event = None
+    __slots__ = ('event',)
+    
+    def __init__(self, parent=None):
+        super(Slur, self).__init__(parent)
+        self.event = None
 
 
 class PhrasingSlur(Item):
     """A \\( or \\)."""
-    event = None
+    __slots__ = ('event',)
+    
+    def __init__(self, parent=None):
+        super(PhrasingSlur, self).__init__(parent)
+        self.event = None
 
 
 class Beam(Item):
     """A [ or ]."""
-    event = None
+    __slots__ = ('event',)
+    
+    def __init__(self, parent=None):
+        super(Beam, self).__init__(parent)
+        self.event = None
 
 
 class Dynamic(Item):
     """Any dynamic symbol."""
+    __slots__ = ()
 
 
 class Articulation(Item):
     """An articulation, fingering, string number, or other symbol."""
+    __slots__ = ()
 
 
 class StringTuning(Item):
     """A \\stringTuning command (with a chord as argument)."""
+    __slots__ = ()
 
 
 class Keyword(Item):
     """A LilyPond keyword."""
+    __slots__ = ()
 
 
 class Command(Item):
     """A LilyPond command."""
+    __slots__ = ()
 
 
 class UserCommand(Music):
     """A user command, most probably referring to music."""
+    __slots__ = ()
     def name(self):
         """Return the name of this user command (without the \\)."""
         return self.token[1:]
@@ -958,6 +1180,7 @@ class UserCommand(Music):
 
 class Version(Item):
     """A \\version command."""
+    __slots__ = ()
     def version_string(self):
         """The version as a string."""
         for i in self:
@@ -974,6 +1197,7 @@ class Version(Item):
 
 class Include(Item):
     """An \\include command (not changing the language)."""
+    __slots__ = ('_document',)
     def filename(self):
         """Returns the filename."""
         for i in self:
@@ -990,6 +1214,7 @@ class Language(Item):
 
 class Markup(Item):
     """A command starting markup (\markup, -lines and -list)."""
+    __slots__ = ()
     def plaintext(self):
         """Return the plain text value of this node."""
         return ' '.join(n.plaintext() for n in self)
@@ -997,6 +1222,7 @@ class Markup(Item):
 
 class MarkupCommand(Item):
     """A markup command, such as \italic etc."""
+    __slots__ = ()
     def plaintext(self):
         """Return the plain text value of this node."""
         if self.token == '\\concat':
@@ -1014,6 +1240,7 @@ class MarkupCommand(Item):
 
 class MarkupUserCommand(Item):
     """A user-defined markup command"""
+    __slots__ = ()
     def name(self):
         """Return the name of this user command (without the \\)."""
         return self.token[1:]
@@ -1041,10 +1268,12 @@ class MarkupUserCommand(Item):
 
 class MarkupScore(Item):
     """A \\score inside Markup."""
+    __slots__ = ()
 
 
 class MarkupList(Item):
     """The group of markup items inside { and }. NOTE: *not* a \markuplist."""
+    __slots__ = ()
     def plaintext(self):
         """Return the plain text value of this node."""
         return ' '.join(n.plaintext() for n in self)
@@ -1052,12 +1281,14 @@ class MarkupList(Item):
 
 class MarkupWord(Item):
     """A MarkupWord token."""
+    __slots__ = ()
     def plaintext(self):
         return self.token
 
 
 class Assignment(Item):
     """A variable = value construct."""
+    __slots__ = ()
     def name(self):
         """The variable name."""
         return self.token
@@ -1070,42 +1301,52 @@ class Assignment(Item):
 
 class Book(Container):
     """A \\book { ... } construct."""
+    __slots__ = ()
 
 
 class BookPart(Container):
     """A \\bookpart { ... } construct."""
+    __slots__ = ()
 
 
 class Score(Container):
     """A \\score { ... } construct."""
+    __slots__ = ()
 
 
 class Header(Container):
     """A \\header { ... } construct."""
+    __slots__ = ()
 
 
 class Paper(Container):
     """A \\paper { ... } construct."""
+    __slots__ = ()
 
 
 class Layout(Container):
     """A \\layout { ... } construct."""
+    __slots__ = ()
 
 
 class Midi(Container):
     """A \\midi { ... } construct."""
+    __slots__ = ()
 
 
 class LayoutContext(Container):
     """A \\context { ... } construct within Layout or Midi."""
+    __slots__ = ()
 
 
 class With(Container):
     """A \\with ... construct."""
+    __slots__ = ()
 
 
 class Set(Item):
     """A \\set command."""
+    __slots__ = ()
     def context(self):
         """The context, if specified."""
         for t in self.tokens:
@@ -1129,6 +1370,7 @@ class Set(Item):
 
 class Unset(Item):
     """An \\unset command."""
+    __slots__ = ()
     def context(self):
         """The context, if specified."""
         for t in self.tokens:
@@ -1147,6 +1389,7 @@ class Unset(Item):
 
 class Override(Item):
     """An \\override command."""
+    __slots__ = ()
     def context(self):
         for i in self:
             if isinstance(i.token, lilypond.ContextName):
@@ -1160,6 +1403,7 @@ class Override(Item):
 
 class Revert(Item):
     """A \\revert command."""
+    __slots__ = ()
     def context(self):
         for i in self:
             if isinstance(i.token, lilypond.ContextName):
@@ -1173,14 +1417,17 @@ class Revert(Item):
 
 class Tweak(Item):
     """A \\tweak command."""
+    __slots__ = ()
 
 
 class PathItem(Item):
     """An item in the path of an \\override or \\revert command."""
+    __slots__ = ()
 
 
 class String(Item):
     """A double-quoted string."""
+    __slots__ = ()
     
     def plaintext(self):
         """Return the plaintext value of this string, without escapes and quotes."""
@@ -1195,6 +1442,7 @@ class String(Item):
 
 class Number(Item):
     """A numerical value, directly entered."""
+    __slots__ = ()
     def value(self):
         if isinstance(self.token, lilypond.IntegerValue):
             return int(self.token)
@@ -1208,6 +1456,7 @@ class Number(Item):
 
 class Scheme(Item):
     """A Scheme expression inside LilyPond."""
+    __slots__ = ()
     def plaintext(self):
         """A crude way to get the plain text in this node."""
         # TEMP use get_string()
@@ -1244,18 +1493,22 @@ class Scheme(Item):
 
 class SchemeItem(Item):
     """Any scheme token."""
+    __slots__ = ()
 
 
 class SchemeList(Container):
     """A ( ... ) expression."""
+    __slots__ = ()
 
 
 class SchemeQuote(Item):
     """A ' in scheme."""
+    __slots__ = ()
 
 
 class SchemeLily(Container):
     """A music expression inside #{ and #}."""
+    __slots__ = ()
 
 
 
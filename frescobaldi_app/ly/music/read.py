@@ -128,6 +128,7 @@ class Reader(object):
         self.language = "nederlands"
         self.in_chord = False
         self.prev_duration = Fraction(1, 4), 1
+        self._durations = {}
     
     def set_language(self, lang):
         """Changes the pitch name language to use.
@@ -166,7 +167,13 @@ class Reader(object):
             d = self.factory(Duration, tokens[0])
             d.tokens = tuple(tokens[1:])
             item.append(d)
-            item.duration = self.prev_duration = ly.duration.base_scaling(tokens)
+            # share equal durations between items
+            key = ''.join(tokens)
+            try:
+                duration = self._durations[key]
+            except KeyError:
+                duration = self._durations[key] = ly.duration.base_scaling(tokens)
+            item.duration = self.prev_duration = duration
         else:
             item.duration = self.prev_duration
     
@@ -229,6 +236,38 @@ class Reader(object):
             if item:
                 yield item
     
+    def read_toplevel(self, sync=None):
+        """Yield (position, snapshot, item) tuples reading from our source.
+        
+        This works like read(), but also yields the position of the first 
+        token of every item and a snapshot of the reader state, taken just 
+        after that token was read. The snapshot is a hashable tuple with the 
+        class and text of the token, the pitch language, the previous 
+        duration and the frozen lexer state.
+        
+        If two snapshots are equal, reading continues in the same way from 
+        there on (provided the text after the token is the same). This is 
+        used by items.Document.update() to re-read only a part of a document.
+        
+        If sync is given, it is called with the position and snapshot before 
+        an item is read. If it returns True, reading stops without reading 
+        that item.
+        
+        """
+        for t in skip(self.source):
+            position = self.source.position(t)
+            snapshot = (t.__class__, t[:], self.language, self.prev_duration,
+                        self.source.state.freeze())
+            if sync and sync(position, snapshot):
+                return
+            item = self.read_item(t)
+            if item:
+                yield position, snapshot, item
+    
+    def restore(self, snapshot):
+        """Restore the pitch language and previous duration from a snapshot."""
+        self.language, self.prev_duration = snapshot[2:4]
+    
     def read_item(self, t, source=None):
         """Return one Item that starts with token t. May return None."""
         meth = self._tokencls.method(t)
@@ -31,13 +31,16 @@ def writer():
     import ly.musicxml
 
     e = ly.musicxml.writer()
-    e.parse_text(lilypond_text) # or: e.parse_tokens(tokens)
+    e.parse_text(lilypond_text) # or: e.parse_document(ly_document)
     xml = e.musicxml()
 
     xml.write(filename)         # or: xml.tostring()
 
     # xml.tree is the ElementTree xml tree.
 
+    # or write the XML while it is created, without building the tree:
+    e.write_musicxml(filename)
+
     """
     #from . import source2musxml
     #return source2musxml.parse_source()
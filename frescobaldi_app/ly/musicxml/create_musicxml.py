@@ -20,10 +20,15 @@
 """
 Export to Music XML
 Uses xml.etree to create the XML document
+
+The XML can also be streamed: using start_stream() every measure is written
+to the output as soon as it is complete and then removed from the tree, so
+the complete tree never needs to be in memory.
 """
 
 from __future__ import unicode_literals
 
+import io
 import sys
 try:
     import xml.etree.cElementTree as etree
@@ -49,7 +54,9 @@ class CreateMusicXML():
         import datetime
         encoding_date.text = str(datetime.date.today())
         self.partlist = etree.SubElement(self.root, "part-list")
+        self.score_part_count = 1
         self.part_count = 1
+        self.stream = None
 
     ##
     # Building the basic Elements
@@ -81,7 +88,12 @@ class CreateMusicXML():
 
     def create_part(self, name, abbr, midi):
         """ create a new part """
-        strnr = str(self.part_count)
+        self.create_score_part(name, abbr, midi)
+        self.create_music_part()
+
+    def create_score_part(self, name, abbr, midi):
+        """ create a new score-part in the part-list """
+        strnr = str(self.score_part_count)
         part = etree.SubElement(self.partlist, "score-part", id="P"+strnr)
         if name:
             partname = etree.SubElement(part, "part-name")
@@ -98,14 +110,23 @@ class CreateMusicXML():
             midich.text = strnr
             midiname = etree.SubElement(midiinstr, "midi-name")
             midiname.text = midi
+        self.score_part_count += 1
+
+    def create_music_part(self):
+        """ create a new part containing the measures """
+        strnr = str(self.part_count)
         self.current_part = etree.SubElement(self.root, "part", id="P"+strnr)
         self.part_count += 1
         self.bar_nr = 1
+        if self.stream:
+            self.stream.new_part(self.current_part)
 
     def create_measure(self):
         """ create new measure """
         self.current_bar = etree.SubElement(self.current_part, "measure", number=str(self.bar_nr))
         self.bar_nr +=1
+        if self.stream:
+            self.stream.new_measure(self.current_bar)
 
     ##
     # High-level node creation
@@ -542,6 +563,23 @@ class CreateMusicXML():
             xml.indent("  ")
         return xml
 
+    def start_stream(self, f, encoding='UTF-8', prettyprint=True, doctype=True):
+        """ start writing the XML to the binary file object f
+
+        The parts must be created after all score-parts. The output is the
+        same as that of musicxml().write(). Call end_stream() when done.
+        """
+        if doctype:
+            f.write((xml_decl_txt + "\n" + doctype_txt + "\n").encode(encoding))
+        else:
+            f.write("<?xml version='1.0' encoding='{0}'?>\n".format(encoding).encode(encoding))
+        self.stream = StreamWriter(f, self.root, encoding, "  " if prettyprint else None)
+
+    def end_stream(self):
+        """ write the rest of the XML """
+        self.stream.close()
+        self.stream = None
+
 
 class MusicXML(object):
     """Represent a generated MusicXML tree."""
@@ -569,6 +607,137 @@ class MusicXML(object):
             self.tree.write(file, encoding=encoding, xml_declaration=True, method="xml")
 
 
+class StreamWriter(object):
+    """Writes the parts of a tree while they are being created.
+
+    The root element and its other children are written when the first part
+    is created. The finished measures of a part are written and removed from
+    the tree in small batches, as serializing every measure separately would
+    be slower. The output is the same as that of ElementTree.write(), after
+    ly.etreeutil.indent() if indent is not None.
+
+    """
+    # the number of finished measures that are written at once
+    batch = 16
+
+    def __init__(self, f, root, encoding='UTF-8', indent="  "):
+        self.f = f
+        self.root = root
+        self.encoding = encoding
+        self.indent = indent
+        self.started = False
+        self.part = None
+        self.part_started = False
+
+    def new_part(self, part):
+        """Called when a new part is appended to the root."""
+        if not self.started:
+            self.write_start(self.root, 0)
+            for elem in list(self.root):
+                if elem is not part:
+                    self.write_element(elem, 1)
+                    self.root.remove(elem)
+            self.started = True
+        self.end_part()
+        self.part = part
+
+    def new_measure(self, measure):
+        """Called when a new measure is appended to the current part."""
+        if len(self.part) > self.batch:
+            self.write_measures(len(self.part) - 1)
+
+    def write_measures(self, count, end=False):
+        """Write the first count measures of the current part.
+
+        The measures are removed from the tree. If end is True, the end tag
+        of the part is also written.
+
+        """
+        first = not self.part_started
+        if first:
+            self.write_start(self.part, 1)
+            self.part_started = True
+        # serialize the measures in a container element without attributes
+        container = etree.Element(self.part.tag)
+        container.extend(self.part[:count])
+        del self.part[:count]
+        if self.indent is not None:
+            import ly.etreeutil
+            ly.etreeutil.indent(container, self.indent, 1)
+            container.tail = None
+            if not first:
+                container.text = None
+            if not end:
+                container[-1].tail = "\n" + self.indent * 2
+        start, stop = self.tags(container)
+        b = io.BytesIO()
+        etree.ElementTree(container).write(b, encoding=self.encoding, xml_declaration=False)
+        data = b.getvalue()
+        self.f.write(data[len(start):] if end else data[len(start):-len(stop)])
+
+    def end_part(self):
+        """Write the rest of the current part, if any."""
+        if self.part is not None:
+            if len(self.part):
+                self.write_measures(len(self.part), True)
+            elif self.part_started:
+                self.write_end(self.part, 1)
+            else:
+                self.write_element(self.part, 1)
+            self.root.remove(self.part)
+            self.part = None
+            self.part_started = False
+
+    def close(self):
+        """Write the rest of the tree."""
+        if not self.started:
+            self.write_element(self.root, 0, True)
+            return
+        self.end_part()
+        for elem in list(self.root):
+            self.write_element(elem, 1)
+            self.root.remove(elem)
+        self.write_end(self.root, 0)
+        if self.indent is not None:
+            self.f.write("\n".encode(self.encoding))
+
+    def newline(self, level):
+        """Write the whitespace before an element at the specified level."""
+        if self.indent is not None:
+            self.f.write(("\n" + self.indent * level).encode(self.encoding))
+
+    def write_element(self, elem, level, tail=False):
+        """Write an element at level, without its tail unless tail is True."""
+        if level:
+            self.newline(level)
+        if self.indent is not None:
+            import ly.etreeutil
+            ly.etreeutil.indent(elem, self.indent, level)
+        if not tail:
+            elem.tail = None
+        etree.ElementTree(elem).write(self.f, encoding=self.encoding, xml_declaration=False)
+
+    def tags(self, elem):
+        """Return the start and end tag of the element as encoded strings."""
+        marker = "\ue000"
+        e = etree.Element(elem.tag, elem.attrib)
+        e.text = marker
+        b = io.BytesIO()
+        etree.ElementTree(e).write(b, encoding=self.encoding, xml_declaration=False)
+        return b.getvalue().split(marker.encode(self.encoding, 'xmlcharrefreplace'))
+
+    def write_start(self, elem, level):
+        """Write the start tag of an element at level."""
+        if level:
+            self.newline(level)
+        self.f.write(self.tags(elem)[0])
+
+    def write_end(self, elem, level):
+        """Write the end tag of an element at level."""
+        self.newline(level)
+        self.f.write(self.tags(elem)[1])
+
+
 xml_decl_txt = """<?xml version="1.0" encoding="UTF-8"?>"""
 
 doctype_txt = """<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 2.0 Partwise//EN"
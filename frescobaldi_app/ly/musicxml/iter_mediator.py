@@ -42,32 +42,42 @@ class iterateMediatorScore():
             self.musxml.create_score_info(itag, score.info[itag])
         if score.rights:
             self.musxml.add_rights(score.rights)
-        for p in score.partlist:
+        # first the complete part-list, then the parts, so the xml
+        # can be written while the parts are created
+        self.iterate_partlist(score.partlist)
+        for part in self.iterate_parts(score.partlist):
+            self.iterate_part(part)
+
+    def iterate_partlist(self, partlist):
+        """Create the part list, recursively if groups are nested."""
+        for p in partlist:
             if isinstance(p, xml_objs.ScorePart):
-                self.iterate_part(p)
+                if p.barlist:
+                    self.musxml.create_score_part(p.name, p.abbr, p.midi)
+                else:
+                    print "Warning: empty part: "+p.name
             elif isinstance(p, xml_objs.ScorePartGroup):
-                self.iterate_partgroup(p)
-
-    def iterate_partgroup(self, group):
-        """Loop through a group, recursively if nested."""
-        self.musxml.create_partgroup(
-            'start', group.num, group.name, group.abbr, group.bracket)
-        for p in group.partlist:
+                self.musxml.create_partgroup(
+                    'start', p.num, p.name, p.abbr, p.bracket)
+                self.iterate_partlist(p.partlist)
+                self.musxml.create_partgroup('stop', p.num)
+
+    def iterate_parts(self, partlist):
+        """Yield the non-empty parts, also from (nested) groups."""
+        for p in partlist:
             if isinstance(p, xml_objs.ScorePart):
-                self.iterate_part(p)
+                if p.barlist:
+                    yield p
             elif isinstance(p, xml_objs.ScorePartGroup):
-                self.iterate_partgroup(p)
-        self.musxml.create_partgroup('stop', group.num)
+                for part in self.iterate_parts(p.partlist):
+                    yield part
 
     def iterate_part(self, part):
         """The part is iterated."""
-        if part.barlist:
-            part.set_first_bar(self.divisions)
-            self.musxml.create_part(part.name, part.abbr, part.midi)
-            for bar in part.barlist:
-                self.iterate_bar(bar)
-        else:
-            print "Warning: empty part: "+part.name
+        part.set_first_bar(self.divisions)
+        self.musxml.create_music_part()
+        for bar in part.barlist:
+            self.iterate_bar(bar)
 
     def iterate_bar(self, bar):
         """The objects in the bar is outputed to the xml-file."""
@@ -33,7 +33,7 @@ to parse the source. It should prove more stable and easier to implement.
 
 from __future__ import unicode_literals
 
-import documentinfo
+import ly.document
 import ly.music
 
 from . import create_musicxml
@@ -82,8 +82,23 @@ class ParseSource():
         self.with_contxt = None
         self.schm_assignm = None
 
+    def parse_text(self, ly_text, filename=None):
+        """Parse the LilyPond source specified as text."""
+        doc = ly.document.Document(ly_text)
+        doc.filename = filename
+        self.parse_document(doc)
+
+    def parse_document(self, ly_doc):
+        """Parse the LilyPond source in the ly.document.Document."""
+        self.parse_music(ly.music.document(ly_doc))
+
     def parse_tree(self, doc):
-        mustree = documentinfo.music(doc)
+        """Parse the music of the Frescobaldi document."""
+        import documentinfo
+        self.parse_music(documentinfo.music(doc))
+
+    def parse_music(self, mustree):
+        """Parse the music.items.Document."""
         # print(mustree.dump())
         header_nodes = self.iter_header(mustree)
         if header_nodes:
@@ -121,6 +136,22 @@ class ParseSource():
         xml = self.musxml.musicxml(prettyprint)
         return xml
 
+    def write_musicxml(self, file, encoding='UTF-8', prettyprint=True, doctype=True):
+        """Create the MusicXML and write it to file (file obj or filename).
+
+        Every measure is written as soon as it is created, so the complete
+        XML tree is never kept in memory. The output is the same as that of
+        musicxml().write().
+        """
+        if not hasattr(file, 'write'):
+            with open(file, 'wb') as f:
+                return self.write_musicxml(f, encoding, prettyprint, doctype)
+        self.mediator.check_score()
+        self.musxml.start_stream(file, encoding, prettyprint, doctype)
+        iter_mediator.iterateMediatorScore(
+            self.mediator.score, self.musxml, self.mediator.divisions)
+        self.musxml.end_stream()
+
     ##
     # The different source types from ly.music are here sent to translation.
     ##
@@ -100,11 +100,160 @@ def remove_trailing_whitespace(cursor):
 
 
 def reformat(cursor, indenter):
-    """A do-it-all function improving the LilyPond source formatting."""
+    """A do-it-all function improving the LilyPond source formatting.
+    
+    The result is the same as running break_indenters(), indenter.indent(), 
+    move_long_comments() and remove_trailing_whitespace() after each other, 
+    but all changes are computed in one pass over the existing tokens and 
+    then applied at once, so the document is changed and re-tokenized only 
+    once. Lines broken off a selected line are always reformatted as well, 
+    even if they end up outside the cursor's range.
+    
+    """
+    start_block, end_block = cursor.start_block(), cursor.end_block()
+    with cursor.document as d:
+        # cursor.blocks() leaves out the end block if the cursor ends at its
+        # start; that block is then only indented
+        tidy_end = (cursor.end is None or cursor.end == cursor.start
+                    or d.position(end_block) < cursor.end)
+        
+        def lines():
+            in_range = False
+            # A newline can change how the rest of the text is tokenized,
+            # e.g. after a stray #. After the first line that is broken,
+            # the text is tokenized again until the state at the end of a
+            # line is the same as in the document.
+            state = None
+            for b in d:
+                if b == start_block:
+                    in_range = True
+                if not in_range:
+                    yield None, ly.indent.Line(d, b), False
+                    continue
+                text = d.text(b)
+                tidy = tidy_end or b != end_block
+                if tidy:
+                    pieces = list(split_indenters(d.tokens(b)))
+                else:
+                    pieces = [(0, d.tokens(b))]
+                if state is None and len(pieces) == 1:
+                    tokens = pieces[0][1] if tidy else None
+                    yield (b, text, tokens), ly.indent.Line(d, b), True
+                else:
+                    if state is None:
+                        state = d.state(b)
+                    ends = [pos for pos, tokens in pieces[1:]] + [len(text)]
+                    for (start, tokens), end in zip(pieces, ends):
+                        parser = state.parser()
+                        tokens = tuple(state.tokens(text[start:end]))
+                        line = ly.indent.Line.from_tokens(tokens, parser)
+                        if not tidy:
+                            tokens = None
+                        yield (b, text[start:end], tokens), line, True
+                    if state.freeze() == d.state_end(b).freeze():
+                        state = None
+                if b == end_block:
+                    break
+        
+        block, result = None, []
+        for obj, line, indent in indenter.indents(lines()):
+            if obj is None:
+                continue
+            b, text, tokens = obj
+            if b != block:
+                if block is not None:
+                    _replace_block(d, block, result)
+                block, result = b, []
+            if tokens is None:
+                if indent is not None:
+                    text = indent + text[len(line.indent):]
+            else:
+                text = _format_line(text, line, indent, tokens)
+            result.append(text)
+        if block is not None:
+            _replace_block(d, block, result)
+
+
+def reformat_in_steps(cursor, indenter):
+    """Reformat by running the separate formatting tools after each other.
+    
+    This has (mostly) the same result as reformat(), but is much slower, as 
+    the document is changed and re-tokenized after each step.
+    
+    """
     break_indenters(cursor)
     indenter.indent(cursor)
     move_long_comments(cursor)
     remove_trailing_whitespace(cursor)
 
 
+def split_indenters(tokens):
+    """Split the tokens of a line the way break_indenters() would do it.
+    
+    Yields (pos, tokens) tuples, one for every resulting line, where pos is 
+    the position of the line in the original line, and the tokens are 
+    copies with their positions made relative to the new line.
+    
+    """
+    denters = []
+    breaks = []
+    nonspace_index = -1
+    for i, t in enumerate(tokens):
+        if isinstance(t, ly.lex.Indent) and t in ('{', '<<'):
+            denters.append(i)
+        elif isinstance(t, ly.lex.Dedent) and t in ('}', '>>'):
+            if denters:
+                denters.pop()
+            elif nonspace_index != -1:
+                breaks.append(i)
+        if not isinstance(t, ly.lex.Space):
+            nonspace_index = i
+    breaks.extend(i + 1 for i in denters if i < nonspace_index)
+    if not breaks:
+        yield 0, tokens
+        return
+    breaks.sort()
+    start = 0
+    for index in breaks + [len(tokens)]:
+        pos = tokens[start].pos if start else 0
+        yield pos, tuple(type(t)(t, t.pos - pos) for t in tokens[start:index])
+        start = index
+
+
+def _format_line(text, line, indent, tokens):
+    """Return the reformatted text of a line as split by split_indenters().
+    
+    Removes trailing whitespace, applies the indent computed by the 
+    indenter and moves long comments to column 0.
+    
+    """
+    if tokens:
+        t = tokens[-1]
+        if isinstance(t, ly.lex.Space):
+            text = text[:t.pos] + text[t.end:]
+        elif not isinstance(t, ly.lex.String):
+            offset = len(t) - len(t.rstrip())
+            text = text[:t.end-offset] + text[t.end:]
+    if line.indent is False:
+        return text
+    if indent is None:
+        indent = line.indent
+    rest = tokens[1:] if line.indent else tokens
+    if not rest:
+        return ""
+    elif (len(rest) == 1
+        and isinstance(rest[0], (
+            ly.lex.lilypond.LineComment,
+            ly.lex.scheme.LineComment))
+        and rest[0][:3] in ('%%%', ';;;')):
+        indent = ""
+    return indent + text[len(line.indent):]
+
 
+def _replace_block(document, block, lines):
+    """Replace the text of the block with the lines if it has changed."""
+    text = document.text(block)
+    new = '\n'.join(lines)
+    if new != text:
+        pos = document.position(block)
+        document[pos:pos+len(text)] = new
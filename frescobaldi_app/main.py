@@ -27,6 +27,10 @@ import sip
 sip.setapi("QString", 2)
 sip.setapi("QVariant", 2)
 
+import instrumentation  # Collect timings and profile startup if requested
+instrumentation.install()
+import startupprofile
+
 import os
 import re
 import sys
@@ -103,6 +107,9 @@ def url(arg):
 
 def main():
     """Main function."""
+    startupprofile.mark("QApplication created")
+    QTimer.singleShot(0, startupprofile.report)
+    
     args = parse_commandline()
     
     if args.list_sessions:
@@ -158,6 +165,7 @@ def main():
     
     # Just create one MainWindow
     win = mainwindow.MainWindow()
+    startupprofile.mark("main window created")
     win.show()
     win.activateWindow()
     
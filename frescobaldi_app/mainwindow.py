@@ -23,6 +23,7 @@ Frescobaldi Main Window.
 
 from __future__ import unicode_literals
 
+import io
 import itertools
 import os
 import sys
@@ -205,11 +206,13 @@ class MainWindow(QMainWindow):
                 curd.modificationChanged.disconnect(self.updateWindowTitle)
                 curd.urlChanged.disconnect(self.updateWindowTitle)
                 curd.loaded.disconnect(self.updateDocActions)
+                curd.reloaded.disconnect(self.updateDocActions)
             doc.undoAvailable.connect(self.updateDocActions)
             doc.redoAvailable.connect(self.updateDocActions)
             doc.modificationChanged.connect(self.updateWindowTitle)
             doc.urlChanged.connect(self.updateWindowTitle)
             doc.loaded.connect(self.updateDocActions)
+            doc.reloaded.connect(self.updateDocActions)
             self.updateDocActions()
             self.updateWindowTitle()
         self.updateSelection()
@@ -721,10 +724,9 @@ class MainWindow(QMainWindow):
         number_lines = QSettings().value("source_export/number_lines", False, bool)
         inline_style = QSettings().value("source_export/inline_export", False, bool)
         import highlight2html
-        html = highlight2html.html_document(doc, inline=inline_style, number_lines=number_lines)
         try:
-            with open(filename, "wb") as f:
-                f.write(html.encode('utf-8'))
+            with io.open(filename, "w", encoding="utf-8", newline="") as f:
+                highlight2html.write_document(doc, f, inline=inline_style, number_lines=number_lines)
         except IOError as e:
             msg = _("{message}\n\n{strerror} ({errno})").format(
                 message = _("Could not write to: {url}").format(url=filename),
@@ -859,6 +861,31 @@ class MainWindow(QMainWindow):
             "Please describe the issue or feature request.\n"
             "Provide as much information as possible.\n\n\n"))
     
+    def toggleStatistics(self, enabled):
+        """Starts or stops collecting performance statistics."""
+        import instrumentation
+        if enabled:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+    
+    def saveStatistics(self):
+        """Saves the collected performance statistics as text or JSON."""
+        import instrumentation
+        filename = QFileDialog.getSaveFileName(self,
+            app.caption(_("Save Performance Statistics")), "statistics.txt",
+            "{0} (*.txt);;{1} (*.json)".format(_("Text Files"), _("JSON Files")))
+        if not filename:
+            return #cancelled
+        try:
+            instrumentation.write(filename)
+        except IOError as e:
+            msg = _("{message}\n\n{strerror} ({errno})").format(
+                message = _("Could not write to: {url}").format(url=filename),
+                strerror = e.strerror,
+                errno = e.errno)
+            QMessageBox.critical(self, app.caption(_("Error")), msg)
+    
     def createActions(self):
         self.actionCollection = ac = ActionCollection()
         
@@ -912,6 +939,10 @@ class MainWindow(QMainWindow):
         ac.help_manual.triggered.connect(self.showManual)
         ac.help_about.triggered.connect(self.showAbout)
         ac.help_bugreport.triggered.connect(self.reportBug)
+        ac.help_statistics.toggled.connect(self.toggleStatistics)
+        ac.help_statistics_save.triggered.connect(self.saveStatistics)
+        import instrumentation
+        ac.help_statistics.setChecked(instrumentation.enabled())
         
     def populateRecentFilesMenu(self):
         self.menu_recent_files.clear()
@@ -1030,6 +1061,9 @@ class ActionCollection(actioncollection.ActionCollection):
         self.help_whatsthis = QWhatsThis.createAction(parent)
         self.help_about = QAction(parent)
         self.help_bugreport = QAction(parent)
+        self.help_statistics = QAction(parent)
+        self.help_statistics.setCheckable(True)
+        self.help_statistics_save = QAction(parent)
         
         # icons
         self.file_new.setIcon(icons.get('document-new'))
@@ -1172,6 +1206,8 @@ class ActionCollection(actioncollection.ActionCollection):
         self.help_manual.setText(_("&User Guide"))
         self.help_whatsthis.setText(_("&What's This?"))
         self.help_bugreport.setText(_("Report a &Bug..."))
+        self.help_statistics.setText(_("Collect &Performance Statistics"))
+        self.help_statistics_save.setText(_("&Save Performance Statistics..."))
         self.help_about.setText(_("&About {appname}...").format(appname=info.appname))
         
 
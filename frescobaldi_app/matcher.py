@@ -23,14 +23,17 @@ Highlights matching tokens such as { and }, << and >> etc.
 
 from __future__ import unicode_literals
 
+import bisect
 import weakref
 
 from PyQt4.QtGui import QAction
 
 import app
+import cursortools
+import highlighter
 import plugin
 import ly.lex
-import lydocument
+import tokeniter
 import viewhighlighter
 import actioncollection
 import actioncollectionmanager
@@ -72,7 +75,7 @@ class AbstractMatcher(object):
     
     def showMatches(self):
         """Highlights matching tokens if the view's cursor is at such a token."""
-        cursors = matches(self.view().textCursor(), self.view())
+        cursors = matches(self.view().textCursor())
         if cursors:
             self.highlighter().highlight("match", cursors, 2, self._match_duration)
         else:
@@ -133,7 +136,7 @@ class Actions(actioncollection.ActionCollection):
         self.view_matching_pair_select.setText(_("&Select Matching Pair"))
 
 
-def matches(cursor, view=None):
+def matches(cursor):
     """Return a list of zero to two cursors specifing matching tokens.
     
     If the list is empty, the cursor was not at a MatchStart/MatchEnd token,
@@ -141,66 +144,352 @@ def matches(cursor, view=None):
     if the list contains two cursors, the first is the token the cursor was at,
     and the second is the matching token.
     
-    If view is given, only the visible part of the document is searched.
+    Returns an empty list while a large document is being tokenized in the
+    background.
     
     """
+    if highlighter.highlighter(cursor.document()).isTokenizing():
+        return []
     block = cursor.block()
     column = cursor.position() - block.position()
-    tokens = lydocument.Runner(lydocument.Document(cursor.document()))
-    tokens.move_to_block(block)
-    
-    if view is not None:
-        first_block = view.firstVisibleBlock()
-        bottom = view.contentOffset().y() + view.viewport().height()
-        pred_forward = lambda: view.blockBoundingGeometry(tokens.block).top() <= bottom
-        pred_backward = lambda: tokens.block >= first_block
-    else:
-        pred_forward = lambda: True
-        pred_backward = lambda: True
-    
-    source = None
-    for token in tokens.forward_line():
+    for index, token in enumerate(tokeniter.tokens(block)):
         if token.pos <= column <= token.end:
-            if isinstance(token, ly.lex.MatchStart):
-                match, other = ly.lex.MatchStart, ly.lex.MatchEnd
-                def source_gen():
-                    while pred_forward():
-                        for t in tokens.forward_line():
-                            yield t
-                        if not tokens.next_block():
-                            break
-                source = source_gen()
-                break
-            elif isinstance(token, ly.lex.MatchEnd):
-                match, other = ly.lex.MatchEnd, ly.lex.MatchStart
-                def source_gen():
-                    while pred_backward():
-                        for t in tokens.backward_line():
-                            yield t
-                        if not tokens.previous_block():
-                            break
-                source = source_gen()
+            if isinstance(token, (ly.lex.MatchStart, ly.lex.MatchEnd)):
                 break
         elif token.pos > column:
-            break
-    cursors = []
-    if source:
-        # we've found a matcher item
-        cursors.append(tokens.cursor())
-        nest = 0
-        for token2 in source:
-            if isinstance(token2, other) and token2.matchname == token.matchname:
-                if nest == 0:
-                    # we've found the matching item!
-                    cursors.append(tokens.cursor())
-                    break
-                else:
-                    nest -= 1
-            elif isinstance(token2, match) and token2.matchname == token.matchname:
-                nest += 1
+            return []
+    else:
+        return []
+    cursors = [tokeniter.cursor(block, token)]
+    match = PairIndex.instance(cursor.document()).match(block, index)
+    if match:
+        cursors.append(tokeniter.cursor(*match))
     return cursors
 
 
+class PairIndex(plugin.DocumentPlugin):
+    """Finds the matching MatchStart or MatchEnd token in a document.
+    
+    For every block, the effect of its MatchStart and MatchEnd tokens on the
+    nesting level is summarized per matchname. The summaries are kept in
+    chunks of consecutive blocks, and the summaries of the chunks are
+    combined in a segment tree. Finding the block containing the matching
+    token then takes O(log n) time, however many lines are in between.
+    
+    The summaries of blocks are updated when the highlighter changes their
+    tokens. Inserted or removed lines are inserted in or removed from their
+    chunk. Only when a chunk grows too large and is split, or becomes empty,
+    the tree is rebuilt, from the summaries of the chunks, which takes
+    O(n / chunksize) time.
+    
+    """
+    chunksize = 64
+    
+    def __init__(self, document):
+        self._chunks = None     # lists of block summaries, None if not computed
+        self._starts = []       # the number of the first block of every chunk
+        self._summaries = []    # a summary per chunk, None if it must be updated
+        self._dirty = set()     # the chunks with a summary to update in the tree
+        self._tree = None       # the segment tree, None if it must be rebuilt
+        self._size = 0          # the number of leaves in the tree
+        self._changed = []      # the blocks of which the tokens changed
+        self._blockCount = 0
+        document.contentsChange.connect(self._contentsChange)
+        highlighter.highlighter(document).tokensChanged.connect(self._tokensChanged)
+    
+    def _contentsChange(self, position, removed, added):
+        """Called when the document changes, keeps a summary for every line."""
+        if self._chunks is None:
+            return
+        block = self.document().findBlock(position)
+        self._changed.append(block)
+        count = self.document().blockCount()
+        if count > self._blockCount:
+            self._insert(block.blockNumber() + 1, count - self._blockCount)
+        elif count < self._blockCount:
+            self._remove(block.blockNumber() + 1, self._blockCount - count)
+        self._blockCount = count
+    
+    def _locate(self, num):
+        """Returns the index of the chunk containing block num, and its offset."""
+        index = bisect.bisect_right(self._starts, num) - 1
+        return index, num - self._starts[index]
+    
+    def _insert(self, num, count):
+        """Inserts count unknown summaries before block num."""
+        index, offset = self._locate(num)
+        chunk = self._chunks[index]
+        chunk[offset:offset] = [None] * count
+        self._summaries[index] = None
+        if len(chunk) > self.chunksize * 2:
+            size = self.chunksize
+            self._chunks[index:index+1] = [chunk[i:i+size]
+                                           for i in range(0, len(chunk), size)]
+            self._summaries[index:index+1] = [None] * ((len(chunk) - 1) // size + 1)
+            self._tree = None
+        else:
+            self._dirty.add(index)
+        self._updateStarts()
+    
+    def _remove(self, num, count):
+        """Removes the summaries of count blocks starting with block num."""
+        index, offset = self._locate(num)
+        while count:
+            chunk = self._chunks[index]
+            n = min(count, len(chunk) - offset)
+            del chunk[offset:offset+n]
+            count -= n
+            if chunk:
+                self._summaries[index] = None
+                self._dirty.add(index)
+                index += 1
+            else:
+                del self._chunks[index], self._summaries[index]
+                self._tree = None
+            offset = 0
+        self._updateStarts()
+    
+    def _updateStarts(self):
+        """Recomputes the number of the first block of every chunk."""
+        starts = self._starts = []
+        num = 0
+        for chunk in self._chunks:
+            starts.append(num)
+            num += len(chunk)
+    
+    def _tokensChanged(self, block):
+        """Called when the highlighter has updated the tokens of a block."""
+        if self._chunks is None:
+            return
+        if block is None or len(self._changed) > self._blockCount:
+            self._chunks = None
+        else:
+            self._changed.append(block)
+    
+    def _update(self):
+        """Brings the summaries and the tree up-to-date."""
+        document = self.document()
+        if self._chunks is None:
+            self._changed = []
+            summaries = [_summary(tokeniter.tokens(block))
+                         for block in cursortools.all_blocks(document)]
+            size = self.chunksize
+            self._chunks = [summaries[i:i+size]
+                            for i in range(0, len(summaries), size)] or [[]]
+            self._summaries = [None] * len(self._chunks)
+            self._blockCount = len(summaries)
+            self._updateStarts()
+            self._tree = None
+        for block in self._changed:
+            num = block.blockNumber()
+            if 0 <= num < self._blockCount:
+                index, offset = self._locate(num)
+                self._chunks[index][offset] = None
+                self._summaries[index] = None
+                self._dirty.add(index)
+        self._changed = []
+        if self._tree is None:
+            self._dirty.clear()
+            for index, summary in enumerate(self._summaries):
+                if summary is None:
+                    self._summaries[index] = self._chunkSummary(index)
+            size = 1
+            while size < len(self._summaries):
+                size *= 2
+            tree = [_empty] * size + self._summaries + [_empty] * (size - len(self._summaries))
+            for node in range(size - 1, 0, -1):
+                tree[node] = _combine(tree[node * 2], tree[node * 2 + 1])
+            self._tree, self._size = tree, size
+        else:
+            tree = self._tree
+            for index in self._dirty:
+                summary = self._summaries[index] = self._chunkSummary(index)
+                node = self._size + index
+                tree[node] = summary
+                while node > 1:
+                    node //= 2
+                    tree[node] = _combine(tree[node * 2], tree[node * 2 + 1])
+            self._dirty.clear()
+    
+    def _chunkSummary(self, index):
+        """Computes the unknown block summaries of a chunk, returns its summary."""
+        chunk = self._chunks[index]
+        summary = _empty
+        for offset, s in enumerate(chunk):
+            if s is None:
+                block = self.document().findBlockByNumber(self._starts[index] + offset)
+                s = chunk[offset] = _summary(tokeniter.tokens(block))
+            summary = _combine(summary, s)
+        return summary
+    
+    def match(self, block, index):
+        """Returns (block, token) for the token matching tokens(block)[index].
+        
+        The token at the index must be a MatchStart or a MatchEnd token.
+        Returns None if there is no matching token.
+        
+        """
+        self._update()
+        tokens = tokeniter.tokens(block)
+        token = tokens[index]
+        if isinstance(token, ly.lex.MatchStart):
+            forward, match, other = True, ly.lex.MatchStart, ly.lex.MatchEnd
+            source = tokens[index+1:]
+        else:
+            forward, match, other = False, ly.lex.MatchEnd, ly.lex.MatchStart
+            source = tokens[index-1::-1] if index else ()
+        name = token.matchname
+        found, nest = _nest(source, name, match, other, 0)
+        if not found:
+            result = self._find(block.blockNumber(), name, nest, forward)
+            if result is None:
+                return
+            num, nest = result
+            block = self.document().findBlockByNumber(num)
+            tokens = tokeniter.tokens(block)
+            source = tokens if forward else tokens[::-1]
+            found, nest = _nest(source, name, match, other, nest)
+        return block, found
+    
+    def _find(self, num, name, nest, forward):
+        """Finds the block where the nest level drops below 0.
+        
+        The search starts after (or, if forward is False, before) the block
+        with number num, at the specified nest level. Returns a tuple (num,
+        nest) with the number of the block and the level at its start (or
+        end, if forward is False), or None if the level never drops below 0.
+        
+        """
+        # first look in the rest of the chunk
+        index, offset = self._locate(num)
+        result, nest = self._findInChunk(index, offset, name, nest, forward)
+        if result is not None:
+            return result, nest
+        tree, size = self._tree, self._size
+        # go up until the nearest neighbouring subtree containing the match
+        node = size + index
+        while True:
+            if node == 1:
+                return
+            left = not node & 1
+            if left == forward:
+                sibling = node + 1 if forward else node - 1
+                count, least = _level(tree[sibling], name, forward)
+                if nest + least < 0:
+                    node = sibling
+                    break
+                nest += count
+            node //= 2
+        # go down to the leaf
+        while node < size:
+            first, second = node * 2, node * 2 + 1
+            if not forward:
+                first, second = second, first
+            count, least = _level(tree[first], name, forward)
+            if nest + least < 0:
+                node = first
+            else:
+                nest += count
+                node = second
+        index = node - size
+        offset = -1 if forward else len(self._chunks[index])
+        return self._findInChunk(index, offset, name, nest, forward)
+    
+    def _findInChunk(self, index, offset, name, nest, forward):
+        """Finds the block in a chunk where the nest level drops below 0.
+        
+        The search starts after (or before) the block at offset in the chunk.
+        Returns a tuple (num, nest) like _find(), with num None if the level
+        does not drop below 0 in the chunk.
+        
+        """
+        chunk = self._chunks[index]
+        if forward:
+            offsets = range(offset + 1, len(chunk))
+        else:
+            offsets = range(offset - 1, -1, -1)
+        for offset in offsets:
+            count, least = _level(chunk[offset], name, forward)
+            if nest + least < 0:
+                return self._starts[index] + offset, nest
+            nest += count
+        return None, nest
+
+
+# the summary of a block is a dictionary mapping a matchname to a tuple
+# (net, minimum, backward minimum): the net change of the nest level after
+# all its MatchStart and MatchEnd tokens with that name, the minimum level
+# reached reading forward and the minimum level reached reading backward
+# (where a MatchEnd increases the level), both starting at level 0.
+_empty = {}
+
+
+def _summary(tokens):
+    """Returns the summary of the MatchStart and MatchEnd tokens."""
+    levels = {}
+    for t in tokens:
+        if isinstance(t, ly.lex.MatchStart):
+            levels.setdefault(t.matchname, []).append(1)
+        elif isinstance(t, ly.lex.MatchEnd):
+            levels.setdefault(t.matchname, []).append(-1)
+    if not levels:
+        return _empty
+    summary = {}
+    for name, values in levels.items():
+        net = minimum = 0
+        for v in values:
+            net += v
+            minimum = min(minimum, net)
+        level = backward = 0
+        for v in reversed(values):
+            level -= v
+            backward = min(backward, level)
+        summary[name] = (net, minimum, backward)
+    return summary
+
+
+def _combine(first, second):
+    """Returns the summary of two consecutive summaries."""
+    if not first:
+        return second
+    elif not second:
+        return first
+    summary = dict(first)
+    for name, (net2, min2, back2) in second.items():
+        if name in first:
+            net1, min1, back1 = first[name]
+            summary[name] = (net1 + net2, min(min1, net1 + min2), min(back2, back1 - net2))
+        else:
+            summary[name] = (net2, min2, back2)
+    return summary
+
+
+def _level(summary, name, forward):
+    """Returns the net change and minimum of the nest level for the name."""
+    try:
+        net, minimum, backward = summary[name]
+    except KeyError:
+        return 0, 0
+    return (net, minimum) if forward else (-net, backward)
+
+
+def _nest(tokens, name, match, other, nest):
+    """Reads the tokens, starting at the specified nest level.
+    
+    Returns a tuple (token, nest). The token is the token where the level
+    drops below 0, or None if not found, and nest is the level after the
+    tokens that were read.
+    
+    """
+    for t in tokens:
+        if isinstance(t, other) and t.matchname == name:
+            if nest == 0:
+                return t, nest
+            nest -= 1
+        elif isinstance(t, match) and t.matchname == name:
+            nest += 1
+    return None, nest
+
 
 app.mainwindowCreated.connect(Matcher.instance)
 
@@ -400,6 +400,8 @@ def menu_help(mainwindow):
     m.addAction(panelmanager.manager(mainwindow).docbrowser.actionCollection.help_lilypond_context)
     m.addSeparator()
     m.addAction(ac.help_bugreport)
+    m.addAction(ac.help_statistics)
+    m.addAction(ac.help_statistics_save)
     m.addSeparator()
     m.addAction(ac.help_about)
     return m
@@ -27,6 +27,9 @@ its tracks.
 A basic event factory returns the MIDI events as simple named tuples,
 but you can subclass the event factory for more sophisticated behaviour.
 
+For loading large files, parse_midi_file() and TrackEvents decode the tracks
+into compact arrays, without copying the track data.
+
 Runs with Python 2.6, 2.7.
 For Python 3 you can remove the ord() calls.
 
@@ -34,7 +37,9 @@ For Python 3 you can remove the ord() calls.
 
 from __future__ import unicode_literals
 
+import array
 import struct
+import sys
 
 from . import event
 
@@ -42,19 +47,49 @@ unpack_midi_header = struct.Struct(b'>hhh').unpack
 unpack_int = struct.Struct(b'>i').unpack
 
 
-def get_chunks(s):
-    """Splits a MIDI file bytes string into chunks.
+if sys.version_info[0] < 3:
+    def byte_view(s):
+        """Returns an object indexing the bytes of s as integers.
+        
+        (Python 2 can't index a memoryview as integers, so s is copied
+        once to a bytearray, unless it already is one.)
+        
+        """
+        return s if isinstance(s, bytearray) else bytearray(s)
+else:
+    def byte_view(s):
+        """Returns an object indexing the bytes of s as integers.
+        
+        The data is not copied.
+        
+        """
+        return s if isinstance(s, bytearray) else memoryview(s)
+
+
+def get_chunk_offsets(s):
+    """Splits a MIDI file bytes string into chunks, without copying.
     
-    Yields (b'Name', b'data') tuples.
+    Yields (b'Name', start, end) tuples, where start and end denote the
+    position of the chunk data in s.
     
     """
     pos = 0
     while pos < len(s):
-        name = s[pos:pos+4]
-        size, = unpack_int(s[pos+4:pos+8])
-        yield name, s[pos+8:pos+8+size]
+        name = bytes(s[pos:pos+4])
+        size, = unpack_int(bytes(s[pos+4:pos+8]))
+        yield name, pos + 8, pos + 8 + size
         pos += size + 8
 
+
+def get_chunks(s):
+    """Splits a MIDI file bytes string into chunks.
+    
+    Yields (b'Name', b'data') tuples.
+    
+    """
+    for name, start, end in get_chunk_offsets(s):
+        yield name, s[start:end]
+
     
 def parse_midi_data(s):
     """Parses MIDI file data from the bytes string s.
@@ -75,6 +110,28 @@ def parse_midi_data(s):
     raise ValueError("invalid midi data")
 
 
+def parse_midi_file(s):
+    """Parses MIDI file data from s (bytes, bytearray or memoryview).
+    
+    Returns a three tuple (format_type, time_division, tracks), like
+    parse_midi_data(), but every track is a TrackEvents instance, decoded
+    directly from the data in s.
+    
+    May raise ValueError or IndexError in case of invalid MIDI data.
+    
+    """
+    data = byte_view(s)
+    chunks = get_chunk_offsets(data)
+    for name, start, end in chunks:
+        if name == b'MThd':
+            fmt, ntracks, division = unpack_midi_header(bytes(data[start:start+6]))
+            tracks = [TrackEvents(data, start, end)
+                      for name, start, end in chunks if name == b'MTrk']
+            return fmt, division, tracks
+        break
+    raise ValueError("invalid midi data")
+
+
 def read_var_len(s, pos):
     """Reads variable-length integer from s starting on pos.
     
@@ -168,6 +225,198 @@ def parse_midi_events(s, factory=None):
         yield delta, ev
 
 
+class TrackEvents(object):
+    """The events of a MIDI track, decoded into compact parallel arrays.
+    
+    The following instance attributes are set on init:
+    
+    time:   the absolute MIDI time of every event
+    status: the status byte of every event (running status resolved)
+    data1:  the first data byte, or the type of a meta event
+    data2:  the second data byte
+    
+    The data of meta and sysex events is not copied; payloads is a dict
+    mapping the index of such an event to its (start, end) offsets in data.
+    
+    Iterating over a TrackEvents instance yields (delta, event) tuples, just
+    like parse_midi_events(), with events created by the factory.
+    
+    Raises ValueError or IndexError on invalid MIDI data.
+    
+    """
+    def __init__(self, data, start=0, end=None, factory=None):
+        """Decodes the track in data (from start to end) into arrays.
+        
+        If data is not a bytearray or memoryview, use parse_track() instead.
+        
+        """
+        self.data = data
+        self.factory = factory or event.EventFactory()
+        self.time = array.array(str('l'))
+        self.status = array.array(str('B'))
+        self.data1 = array.array(str('B'))
+        self.data2 = array.array(str('B'))
+        self.payloads = {}
+        self._decode(data, start, len(data) if end is None else end)
+    
+    def _decode(self, s, pos, end):
+        """(Private) Fills the arrays from the track data in s[pos:end]."""
+        add_time = self.time.append
+        add_status = self.status.append
+        add_data1 = self.data1.append
+        add_data2 = self.data2.append
+        payloads = self.payloads
+        
+        running_status = None
+        time = 0
+        index = 0
+        while pos < end:
+            # read variable-length delta time
+            i = s[pos]
+            pos += 1
+            delta = i & 0x7F
+            while i & 0x80:
+                i = s[pos]
+                pos += 1
+                delta = delta * 128 + (i & 0x7F)
+            time += delta
+            
+            status = s[pos]
+            if status & 0x80:
+                running_status = status
+                pos += 1
+            elif not running_status:
+                raise ValueError("invalid running status")
+            else:
+                status = running_status
+            
+            if status < 0xC0 or 0xE0 <= status < 0xF0:
+                # note on, off, aftertouch, controller or pitch bend
+                data1 = s[pos]
+                data2 = s[pos+1]
+                pos += 2
+            elif status < 0xF0:
+                # program change, channel aftertouch
+                data1 = s[pos]
+                data2 = 0
+                pos += 1
+            else:
+                running_status = None
+                if status == 0xFF:
+                    # meta event
+                    data1 = s[pos]
+                    pos += 1
+                else:
+                    # some sort of sysex
+                    data1 = 0
+                size, pos = read_var_len_int(s, pos)
+                data2 = 0
+                payloads[index] = (pos, pos + size)
+                pos += size
+            if pos > end:
+                raise IndexError("truncated MIDI event")
+            add_time(time)
+            add_status(status)
+            add_data1(data1)
+            add_data2(data2)
+            index += 1
+    
+    def __len__(self):
+        return len(self.time)
+    
+    def __iter__(self):
+        """Yields two-tuples (delta, event), like parse_midi_events()."""
+        prev = 0
+        for time, ev in self.time_events():
+            yield time - prev, ev
+            prev = time
+    
+    def payload(self, index):
+        """Returns the data (bytes) of the meta or sysex event at index."""
+        start, end = self.payloads[index]
+        return bytes(self.data[start:end])
+    
+    def event(self, index):
+        """Returns the event at the index, created by our factory."""
+        factory = self.factory
+        status = self.status[index]
+        ev_type = status >> 4
+        channel = status & 0x0F
+        if ev_type <= 0x0A:
+            return factory.note_event(ev_type, channel,
+                self.data1[index], self.data2[index])
+        elif ev_type >= 0x0F:
+            if status == 0xFF:
+                return factory.meta_event(self.data1[index], self.payload(index))
+            return factory.sysex_event(status, self.payload(index))
+        elif ev_type == 0x0E:
+            return factory.pitchbend_event(channel,
+                self.data1[index] + self.data2[index] * 128)
+        elif ev_type == 0x0D:
+            return factory.channelaftertouch_event(channel, self.data1[index])
+        elif ev_type == 0x0B:
+            return factory.controller_event(channel,
+                self.data1[index], self.data2[index])
+        else: # ev_type == 0x0C
+            return factory.programchange_event(channel, self.data1[index])
+    
+    def time_events(self):
+        """Yields two-tuples (time, event), like time_events()."""
+        factory = self.factory
+        note_event = factory.note_event
+        controller_event = factory.controller_event
+        for index, (time, status, data1, data2) in enumerate(zip(
+                self.time, self.status, self.data1, self.data2)):
+            if status < 0xB0:
+                ev = note_event(status >> 4, status & 0x0F, data1, data2)
+            elif status < 0xC0:
+                ev = controller_event(status & 0x0F, data1, data2)
+            else:
+                ev = self.event(index)
+            yield time, ev
+    
+    def time_events_grouped(self):
+        """Yields two-tuples (time, event_list), like time_events_grouped()."""
+        evs = []
+        current = None
+        for time, ev in self.time_events():
+            if time != current:
+                if evs:
+                    yield current, evs
+                    evs = []
+                current = time
+            evs.append(ev)
+        if evs:
+            yield current, evs
+
+
+def parse_track(s, factory=None):
+    """Returns a TrackEvents instance for the track data s.
+    
+    s may be a bytes string, bytearray or memoryview. If s already is a
+    TrackEvents instance, it is returned unchanged.
+    
+    """
+    if isinstance(s, TrackEvents):
+        return s
+    return TrackEvents(byte_view(s), factory=factory)
+
+
+def read_var_len_int(s, pos):
+    """Reads variable-length integer from s (indexing as ints) at pos.
+    
+    Returns the value and the new position.
+    
+    """
+    value = 0
+    while True:
+        i = s[pos]
+        pos += 1
+        value = value * 128 + (i & 0x7F)
+        if not i & 0x80:
+            return value, pos
+
+
 def time_events(track, time=0):
     """Yields two-tuples (time, event).
     
@@ -207,10 +456,10 @@ if __name__ == '__main__':
     files = sys.argv[1:]
     for f in files:
         s = open(f, 'rb').read()
-        ftm, div, tracks = parse_midi_data(s)
         try:
+            ftm, div, tracks = parse_midi_file(s)
             for t in tracks:
-                list(parse_midi_events(t))
+                list(t)
         except Exception as e:
             print('error in:', f)
             print(e)
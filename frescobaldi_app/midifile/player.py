@@ -24,7 +24,8 @@ A MIDI Player.
 
 from __future__ import unicode_literals
 
-import collections
+import bisect
+import heapq
 import time
 import threading
 
@@ -42,6 +43,9 @@ class Player(object):
     def __init__(self):
         self._song = None
         self._events = []
+        self._times = []
+        self._beats = []
+        self._beat_positions = []
         self._position = 0
         self._offset = 0
         self._sync_time = 0
@@ -84,6 +88,7 @@ class Player(object):
             self.timer_stop_playing()
         self._song = song
         self._events = make_event_list(song, time, beat)
+        self.build_index()
         self._position = 0
         self._offset = 0
         if playing:
@@ -99,9 +104,27 @@ class Player(object):
             self.stop()
         self._song = None
         self._events = []
+        self.build_index()
         self._position = 0
         self._offset = 0
+    
+    def build_index(self):
+        """(Private) Builds the time and measure/beat indexes of the events.
+        
+        _times lists the time of every event, _beats the (measnum, beat)
+        tuple of every beat event, and _beat_positions the position of every
+        beat event in the events list. seek(), seek_measure() and beat_at()
+        bisect these lists.
         
+        """
+        self._times = [t for t, e in self._events]
+        self._beats = beats = []
+        self._beat_positions = positions = []
+        for i, (t, e) in enumerate(self._events):
+            if e.beat:
+                beats.append(tuple(e.beat[:2]))
+                positions.append(i)
+    
     def total_time(self):
         """Returns the length in msec of the current song."""
         if self._events:
@@ -144,16 +167,9 @@ class Player(object):
         pos = 0
         offset = 0
         if time:
-            # bisect our way in the events list.
-            end = len(self._events)
-            while pos < end:
-                mid = (pos + end) // 2
-                if time > self._events[mid][0]:
-                    pos = mid + 1
-                else:
-                    end = mid
-            if pos < len(self._events):
-                offset = self._events[pos][0] - time
+            pos = bisect.bisect_left(self._times, time)
+            if pos < len(self._times):
+                offset = self._times[pos] - time
         self.set_position(pos, offset)
     
     def seek_measure(self, measnum, beat=1):
@@ -162,21 +178,27 @@ class Player(object):
         Returns whether the measure position could be found (True or False).        
         
         """
-        result = False
-        for i, (t, e) in enumerate(self._events):
-            if e.beat:
-                if e.beat[0] == measnum:
-                    position = i
-                    result = True
-                    if e.beat[1] >= beat:
-                        break
-                if e.beat[0] > measnum:
-                    break
-        if result:
-            self.set_position(position)
-            return True
-        return False
+        beats = self._beats
+        i = bisect.bisect_left(beats, (measnum, beat))
+        if i == len(beats) or beats[i][0] != measnum:
+            # take the last beat of the measure, if any
+            i -= 1
+            if i < 0 or beats[i][0] != measnum:
+                return False
+        self.set_position(self._beat_positions[i])
+        return True
+    
+    def beat_at(self, time):
+        """Returns (measnum, beat) of the last beat at or before time (msec).
         
+        Returns None if there is no beat at or before that time.
+        
+        """
+        pos = bisect.bisect_right(self._times, time)
+        i = bisect.bisect_left(self._beat_positions, pos) - 1
+        if i >= 0:
+            return self._beats[i]
+    
     def set_position(self, position, offset=0):
         """(Private) Goes to the specified position in the internal events list.
         
@@ -399,19 +421,26 @@ def make_event_list(song, time=None, beat=None):
     MIDI events are always created.
     
     """
-    d = collections.defaultdict(Event)
-    
-    for t, evs in song.music:
-        d[t].midi = evs
-    
+    streams = [((t, 0, i, evs) for i, (t, evs) in enumerate(song.music))]
     if time:
-        for t in range(0, song.length+1, time):
-            d[t].time = True
-    
+        streams.append((t, 1, 0, True) for t in range(0, song.length+1, time))
     if beat:
-        for i in song.beats:
-            d[i[0]].beat = i[1:]
-    
-    return [(t, d[t]) for t in sorted(d)]
+        streams.append((b[0], 2, i, b[1:]) for i, b in enumerate(song.beats))
+    
+    # merge the already sorted streams, combining events at the same time
+    events = []
+    last = None
+    for t, kind, i, value in heapq.merge(*streams):
+        if t != last:
+            e = Event()
+            events.append((t, e))
+            last = t
+        if kind == 0:
+            e.midi = value
+        elif kind == 1:
+            e.time = value
+        else:
+            e.beat = value
+    return events
 
 
@@ -36,7 +36,8 @@ def load(filename):
     If the filename is a type 2 MIDI file, just returns the first track.
     
     """
-    fmt, div, tracks = parser.parse_midi_data(open(filename, 'rb').read())
+    with open(filename, 'rb') as f:
+        fmt, div, tracks = parser.parse_midi_file(f.read())
     if fmt == 2:
         tracks = tracks[:1]
     return Song(div, tracks)
@@ -50,8 +51,7 @@ def events_dict(tracks):
     """
     d = collections.defaultdict(dict)
     for n, track in enumerate(tracks):
-        for time, evs in parser.time_events_grouped(
-                parser.parse_midi_events(track)):
+        for time, evs in parser.parse_track(track).time_events_grouped():
             d[time][n] = evs
     return d
 
@@ -64,8 +64,7 @@ def events_dict_together(tracks):
     """
     d = collections.defaultdict(list)
     for track in tracks:
-        for time, evs in parser.time_events_grouped(
-                parser.parse_midi_events(track)):
+        for time, evs in parser.parse_track(track).time_events_grouped():
             d[time].extend(evs)
     return d
 
@@ -77,7 +76,8 @@ def is_tempo(e):
 
 def get_tempo(e):
     """Returns the tempo from the Set Tempo Meta-event."""
-    return ord(e.data[0])*65536 + ord(e.data[1])*256 + ord(e.data[2])
+    data = bytearray(e.data)
+    return data[0]*65536 + data[1]*256 + data[2]
 
 
 def is_time_signature(e):
@@ -87,7 +87,7 @@ def is_time_signature(e):
 
 def get_time_signature(e):
     """Returns the num, den, clocks, num_32s from the Time Signature event."""
-    return map(ord, e.data)
+    return list(bytearray(e.data))
 
 
 def smpte_division(div):
@@ -209,7 +209,11 @@ class Song(object):
     
     """
     def __init__(self, division, tracks):
-        """Initialize the Song with the given division and track chunks."""
+        """Initialize the Song with the given division and track chunks.
+        
+        The tracks may be bytes strings or parser.TrackEvents instances.
+        
+        """
         self.division = division
         self.ntracks = len(tracks)
         self.events = events_dict(tracks)
@@ -19,9 +19,6 @@ import weakref
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 
-import midihub
-import midifile.event
-import midifile.parser
 import documentinfo
 
 from . import elements
@@ -42,6 +39,8 @@ class MidiIn(object):
         return self._widget()
     
     def open(self):
+        # imported here, as initializing PortMIDI slows down startup
+        import midihub
         s = QSettings()
         self._portname = s.value("midi/input_port", midihub.default_input(), type(""))
         self._pollingtime = s.value("midi/polling_time", 10, int)
@@ -77,6 +76,7 @@ class MidiIn(object):
         self.close()
     
     def analyzeevent(self, event):
+        import midifile.event
         if isinstance(event, midifile.event.NoteEvent):
             self.noteevent(event.type, event.channel, event.note, event.value)
     
@@ -118,6 +118,7 @@ class Listener(QThread):
         self._pollingtime = pollingtime
     
     def run(self):
+        import midifile.parser
         self._capturing = True
         while self._capturing:
             while not self._portmidiinput.poll():
@@ -41,6 +41,7 @@ class MidiFiles(plugin.DocumentPlugin):
         self._files = None
         self.current = 0
         document.loaded.connect(self.invalidate, -100)
+        document.reloaded.connect(self.invalidate, -100)
         jobmanager.manager(document).finished.connect(self.invalidate, -100)
     
     def invalidate(self):
@@ -402,9 +402,11 @@ class DocumentChooserAction(ComboBoxAction):
         self._document = document
         if prev:
             prev.loaded.disconnect(self.updateDocument)
+            prev.reloaded.disconnect(self.updateDocument)
             prev.closed.disconnect(self.closeDocument)
             self._indices[prev] = self._currentIndex
         document.loaded.connect(self.updateDocument)
+        document.reloaded.connect(self.updateDocument)
         document.closed.connect(self.closeDocument)
         self.updateDocument()
         
@@ -113,6 +113,7 @@ class DocumentGroup(plugin.DocumentPlugin):
     def __init__(self, document):
         self._documents = None
         document.loaded.connect(self.update, -100)
+        document.reloaded.connect(self.update, -100)
         
     def documents(self):
         """Returns the list of PDF Document objects created by our text document."""
@@ -31,6 +31,7 @@ import weakref
 
 import qpopplerview
 
+import instrumentation
 import util
 import textedit
 import pointandclick
@@ -45,7 +46,7 @@ def links(document):
         return _cache[document]
     except KeyError:
         l = _cache[document] = Links()
-        with l:
+        with l, instrumentation.timer("musicview.links"):
             import popplerqt4
             with qpopplerview.lock(document):
                 for num in range(document.numPages()):
@@ -19,6 +19,17 @@
 
 """
 Manages the Panels (Tools).
+
+The Panels are listed by name in the panels list below, and loaded when the
+PanelManager is created. Only the modules defining the Panel classes are
+imported then; a Panel creates its widget (and should import the modules
+needed for it) when it is shown for the first time, see panel.Panel.
+
+The modules themselves are not imported lazily: the main window needs every
+QDockWidget when it restores the saved dock layout, and the View menu and the
+keyboard shortcuts need the toggleViewAction() of every Panel. So a Panel
+module should import little more than the panel module at the top.
+
 """
 
 from __future__ import unicode_literals
@@ -30,41 +41,47 @@ from PyQt4.QtCore import QSettings
 import actioncollection
 import actioncollectionmanager
 import plugin
+import startupprofile
 import vcs
 
 
+# the Panels to load, as module name and class name
+panels = [
+    "quickinsert.QuickInsertPanel",
+    "musicview.MusicViewPanel",
+    "svgview.SvgViewPanel",
+    "logtool.LogTool",
+    "docbrowser.HelpBrowser",
+    "snippet.tool.SnippetTool",
+    "miditool.MidiTool",
+    "midiinput.tool.MidiInputTool",
+    "charmap.CharMap",
+    "doclist.DocumentList",
+    "outline.OutlinePanel",
+    "layoutcontrol.LayoutControlOptions",
+]
+
+# The Object editor is highly experimental and is only loaded from a git
+# checkout or if the experimental features are enabled.
+experimental_panels = [
+    "objecteditor.ObjectEditor",
+]
+
+
 def manager(mainwindow):
     return PanelManager.instance(mainwindow)
     
 
 class PanelManager(plugin.MainWindowPlugin):
     def __init__(self, mainwindow):
-        """Instantiate the Panel Manager.
-        
-        In this method you should also load the modules that implement
-        panel tools.
-        
-        """
+        """Instantiate the Panel Manager, loading the listed Panels."""
         self._panels = []
         
-        # add the the panel stubs here
-        self.loadPanel("quickinsert.QuickInsertPanel")
-        self.loadPanel("musicview.MusicViewPanel")
-        self.loadPanel("svgview.SvgViewPanel")
-        self.loadPanel("logtool.LogTool")
-        self.loadPanel("docbrowser.HelpBrowser")
-        self.loadPanel("snippet.tool.SnippetTool")
-        self.loadPanel("miditool.MidiTool")
-        self.loadPanel("midiinput.tool.MidiInputTool")
-        self.loadPanel("charmap.CharMap")
-        self.loadPanel("doclist.DocumentList")
-        self.loadPanel("outline.OutlinePanel")
-        self.loadPanel("layoutcontrol.LayoutControlOptions")
-        
-        # The Object editor is highly experimental and should be
-        # commented out for stable releases.
+        for name in panels:
+            self.loadPanel(name)
         if vcs.app_is_git_controlled() or QSettings().value("experimental-features", False, bool):
-            self.loadPanel("objecteditor.ObjectEditor")
+            for name in experimental_panels:
+                self.loadPanel(name)
         
         self.createActions()
         
@@ -84,11 +101,12 @@ class PanelManager(plugin.MainWindowPlugin):
         
         """
         module_name, class_name = name.rsplit('.', 1)
-        __import__(module_name)
-        module = sys.modules[module_name]
+        with startupprofile.measure('panel', name):
+            __import__(module_name)
+            module = sys.modules[module_name]
+            cls = vars(module)[class_name]
+            panel = cls(self.mainwindow())
         attribute_name = module_name.replace('.', '')
-        cls = vars(module)[class_name]
-        panel = cls(self.mainwindow())
         self._panels.append((attribute_name, panel))
         setattr(self, attribute_name, panel)
 
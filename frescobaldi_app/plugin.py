@@ -49,6 +49,8 @@ from __future__ import unicode_literals
 
 import weakref
 
+import startupprofile
+
 _instances = weakref.WeakKeyDictionary()
 
 
@@ -82,7 +84,8 @@ class Plugin(object):
             instances = _instances.setdefault(cls, weakref.WeakKeyDictionary())
             result = instances[obj] = cls.__new__(cls, obj)
             result._parent = weakref.ref(obj)
-            result.__init__(obj)
+            with startupprofile.measure('plugin', cls.__module__ + '.' + cls.__name__):
+                result.__init__(obj)
         return result
     
     @classmethod
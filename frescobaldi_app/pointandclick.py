@@ -30,6 +30,7 @@ from PyQt4.QtCore import QUrl
 from PyQt4.QtGui import QTextCursor
 
 import app
+import instrumentation
 import util
 import scratchdir
 import ly.lex.lilypond
@@ -166,6 +167,7 @@ class BoundLinks(object):
         """
         return self._destinations
     
+    @instrumentation.timed("pointandclick.indices")
     def indices(self, cursor):
         """Return a Python slice object or None or False.
         
@@ -29,6 +29,7 @@ from __future__ import unicode_literals
 from PyQt4.QtCore import QSettings
 
 import app
+import instrumentation
 import textformats
 import qpopplerview
 
@@ -46,6 +47,9 @@ _setbackground()
 # make small sizes smoother
 qpopplerview.cache.options().setOversampleThreshold(96)
 
+# collect the rendering times with our other statistics
+qpopplerview.cache.measure = instrumentation.timer
+
 
 class View(qpopplerview.View):
     def __init__(self, parent=None):
@@ -22,6 +22,7 @@
 Caching of generated images.
 """
 
+import contextlib
 import time
 import weakref
 
@@ -52,6 +53,17 @@ _currentsize = 0
 _globaloptions = None
 
 
+@contextlib.contextmanager
+def measure(name):
+    """Returns a context manager measuring the time of the named operation.
+    
+    By default nothing is measured, but an application may replace this
+    function to collect the timings of rendering and finding links.
+    
+    """
+    yield
+
+
 def setmaxsize(maxsize):
     """Sets the maximum cache size in Megabytes."""
     global _maxsize
@@ -165,7 +177,7 @@ def links(page):
     try:
         return _links[document][pageNumber]
     except KeyError:
-        with lock(document):
+        with lock(document), measure("qpopplerview.cache.links"):
             links = rectangles.Rectangles(document.page(pageNumber).links(),
                                         lambda link: link.linkArea().normalized().getCoords())
         _links.setdefault(document, {})[pageNumber] = links
@@ -287,7 +299,7 @@ class Runner(QThread):
         yres = 72.0 * self.job.height / pageSize.height()
         threshold = options().oversampleThreshold() or options(self.document).oversampleThreshold()
         multiplier = 2 if xres < threshold else 1
-        with lock(self.document):
+        with lock(self.document), measure("qpopplerview.cache.render"):
             options().write(self.document)
             options(self.document).write(self.document)
             self.image = page.renderToImage(xres * multiplier, yres * multiplier, 0, 0, self.job.width * multiplier, self.job.height * multiplier, self.job.rotation)
@@ -24,12 +24,14 @@ Some Qt4-related utility functions.
 from __future__ import unicode_literals
 
 import contextlib
+import os
 import re
 import weakref
 
 from PyQt4.QtCore import QEventLoop, QSettings, QSize, QTimer, Qt
 from PyQt4.QtGui import (
-    QAction, QApplication, QColor, QKeySequence, QProgressDialog)
+    QAction, QApplication, QColor, QDesktopServices, QKeySequence,
+    QProgressDialog)
 
 import info
 
@@ -233,3 +235,19 @@ def waitForSignal(signal, message="", timeout=0):
     return not dlg.wasCanceled()
 
 
+def cachedir(*names):
+    """Returns a directory below Frescobaldi's cache directory.
+    
+    The names are joined to form the path of the directory, which is 
+    created if it does not exist yet. Errors creating it are ignored; 
+    writing files to it will then fail, so callers must handle that anyway.
+    
+    """
+    path = os.path.join(QDesktopServices.storageLocation(
+        QDesktopServices.CacheLocation), *names)
+    try:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    except OSError:
+        pass
+    return path
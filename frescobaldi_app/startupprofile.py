@@ -0,0 +1,242 @@
+# This file is part of the Frescobaldi project, http://www.frescobaldi.org/
+#
+# Copyright (c) 2008 - 2014 by Wilbert Berendsen
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+# See http://www.gnu.org/licenses/ for more information.
+
+"""
+Profiles the startup of Frescobaldi.
+
+When the FRESCOBALDI_PROFILE_STARTUP environment variable is set,
+instrumentation.install() (called at the top of the main module) calls
+install(), which records how long it takes to import every module, and to
+construct every Plugin and Panel, until report() is called as soon as the
+event loop runs. The report is then written to the file named in the
+environment variable, or to standard error if it is "-".
+
+For example:
+
+FRESCOBALDI_PROFILE_STARTUP=startup.txt frescobaldi
+
+When profiling is not enabled, measure() and mark() do nothing.
+
+This module must not import Qt or other Frescobaldi modules (except
+instrumentation, which only uses the standard library), as it is installed before
+they are loaded.
+
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import sys
+import threading
+import timeit
+
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+    basestring = str
+
+import instrumentation
+
+
+# A measurement. The kind is 'import', 'plugin' or 'panel', depth is the
+# nesting level, time includes and own excludes the nested measurements.
+Record = collections.namedtuple('Record', 'kind name depth time own')
+
+_clock = timeit.default_timer
+
+# the default level argument of __import__
+_level = -1 if sys.version_info[0] < 3 else 0
+
+_filename = None    # where the report is written
+_start = None       # the time install() was called
+_thread = None      # the thread that is profiled
+_import = None      # the original __import__ function
+_records = []
+_marks = []         # (time, description) tuples
+_stack = []         # the time spent in nested measurements, per level
+
+
+def install(filename):
+    """Starts profiling, the report will be written to filename.
+    
+    Nothing is done when profiling already has started.
+    
+    """
+    global _filename, _start, _thread, _import
+    if _start is not None:
+        return
+    _filename = filename
+    _thread = threading.current_thread()
+    _import = builtins.__import__
+    builtins.__import__ = _profiled_import
+    _start = _clock()
+
+
+def uninstall():
+    """Stops measuring imports; the recorded results are kept."""
+    global _import
+    if _import is not None:
+        builtins.__import__ = _import
+        _import = None
+
+
+def enabled():
+    """Returns True if the startup is being profiled."""
+    return _import is not None
+
+
+def elapsed():
+    """Returns the number of seconds since profiling started."""
+    return _clock() - _start if _start is not None else 0.0
+
+
+def records(kind=None):
+    """Returns the list of Records, of the specified kind if given."""
+    return [r for r in _records if kind is None or r.kind == kind]
+
+
+def mark(description):
+    """Records that the described point in the startup has been reached."""
+    if enabled():
+        _marks.append((elapsed(), description))
+
+
+def measure(kind, name):
+    """Returns a context manager measuring how long its body takes.
+    
+    For example:
+    
+    with startupprofile.measure('panel', 'charmap.CharMap'):
+        ...
+    
+    """
+    if enabled() and threading.current_thread() is _thread:
+        return _Measure(kind, name)
+    return instrumentation.null
+
+
+class _Measure(instrumentation.Timer):
+    """Records the time a with-block takes."""
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+    
+    def __enter__(self):
+        self.record = len(_records)
+        _records.append(None)   # keep the records in the order they started
+        _stack.append(0.0)
+        return super(_Measure, self).__enter__()
+    
+    def done(self, seconds):
+        nested = _stack.pop()
+        _records[self.record] = Record(self.kind, self.name, len(_stack),
+                                       seconds, seconds - nested)
+        if _stack:
+            _stack[-1] += seconds
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=_level):
+    """Replaces the builtin __import__ function while profiling."""
+    if threading.current_thread() is not _thread:
+        return _import(name, globals, locals, fromlist, level)
+    count = len(sys.modules)
+    module = _module_name(name, globals, level)
+    if fromlist:
+        # submodules imported from a package are mentioned in the report
+        fromlist_new = [n for n in fromlist
+                        if isinstance(n, basestring) and module + '.' + n not in sys.modules]
+    m = _Measure('import', module)
+    m.__enter__()
+    try:
+        return _import(name, globals, locals, fromlist, level)
+    finally:
+        m.__exit__(None, None, None)
+        if len(sys.modules) == count:
+            # nothing new was loaded, don't clutter the report
+            del _records[m.record]
+        elif fromlist:
+            submodules = [n for n in fromlist_new if module + '.' + n in sys.modules]
+            if submodules:
+                _records[m.record] = _records[m.record]._replace(
+                    name="{0}.{{{1}}}".format(module, ", ".join(submodules)))
+
+
+def _module_name(name, globals, level):
+    """Returns the absolute name of an imported module, for the report."""
+    if level > 0 and globals:
+        package = globals.get('__package__')
+        if not package:
+            package = globals.get('__name__', '')
+            if '__path__' not in globals:
+                package = package.rpartition('.')[0]
+        for i in range(level - 1):
+            package = package.rpartition('.')[0]
+        name = package + '.' + name if name else package
+    return name
+
+
+def format_report():
+    """Returns the report of the startup profile as a text."""
+    lines = []
+    total = elapsed()
+    lines.append("Frescobaldi startup profile")
+    lines.append("Total time: {0:.3f} s".format(total))
+    lines.append("")
+    if _marks:
+        lines.append("Milestones:")
+        for t, description in _marks:
+            lines.append("  {0:8.3f} s  {1}".format(t, description))
+        lines.append("")
+    for kind, title in (
+        ('plugin', "Plugins constructed"),
+        ('panel', "Panels loaded"),
+        ):
+        recs = records(kind)
+        if recs:
+            lines.append("{0} ({1}), in order:".format(title, len(recs)))
+            lines.append("  {0:>8}  {1:>8}".format("total", "own"))
+            for r in recs:
+                lines.append("  {0:8.3f}  {1:8.3f}  {2}".format(
+                    r.time, r.own, r.name))
+            lines.append("")
+    recs = records('import')
+    if recs:
+        own = sum(r.own for r in recs)
+        lines.append("Modules imported ({0}, {1:.3f} s), slowest first:".format(
+            len(recs), own))
+        lines.append("  {0:>8}  {1:>8}".format("own", "total"))
+        for r in sorted(recs, key=lambda r: r.own, reverse=True):
+            lines.append("  {0:8.3f}  {1:8.3f}  {2}".format(r.own, r.time, r.name))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def report():
+    """Stops profiling and writes the report.
+    
+    Does nothing if the startup was not being profiled.
+    
+    """
+    if not enabled():
+        return
+    mark("event loop started")
+    uninstall()
+    instrumentation.output(_filename, format_report())
+
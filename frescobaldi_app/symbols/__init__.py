@@ -20,22 +20,33 @@
 """
 Code to use LilyPond-generated SVGs as icons.
 The default black color will be adjusted to the default Text color.
+
+The rendered images are also stored in the cache directory, so the SVGs need
+not be rendered again in a next session.
 """
 
 from __future__ import unicode_literals
 
+import glob
 import os
 
 from PyQt4.QtCore import Qt
-from PyQt4.QtGui import QApplication, QIcon, QIconEngineV2, QImage, QPainter, QPixmap, QStyleOption
+from PyQt4.QtGui import (
+    QApplication, QIcon, QIconEngineV2, QImage, QPainter, QPixmap,
+    QStyleOption)
 from PyQt4.QtSvg import QSvgRenderer
 
+import qutil
+
 __all__ = ["icon"]
 
 
 _icons = {}
 _pixmaps = {}
 
+# increase this when the way the images are rendered changes
+_cache_version = 1
+
 
 def icon(name):
     """Returns a QIcon that shows a LilyPond-generated SVG in the default text color."""
@@ -57,21 +68,68 @@ def pixmap(name, size, mode, state):
     try:
         return _pixmaps[key]
     except KeyError:
-        i = QImage(size, QImage.Format_ARGB32_Premultiplied)
-        i.fill(0)
-        painter = QPainter(i)
-        # render SVG symbol
-        QSvgRenderer(os.path.join(__path__[0], name + ".svg")).render(painter)
-        # recolor to text color
-        painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
-        painter.fillRect(i.rect(), color)
-        painter.end()
+        i = image(name, size, color)
         # let style alter the drawing based on mode, and create QPixmap
         pixmap = QApplication.style().generatedIconPixmap(mode, QPixmap.fromImage(i), QStyleOption())
         _pixmaps[key] = pixmap
         return pixmap
 
 
+def image(name, size, color):
+    """Returns a QImage of the named SVG with the size in the specified color.
+    
+    The image is read from the cache directory if it was rendered before,
+    otherwise it is rendered and saved there. Images rendered from an older 
+    version of the SVG are then removed.
+    
+    """
+    svg = os.path.join(__path__[0], name + ".svg")
+    try:
+        mtime = int(os.path.getmtime(svg))
+        filename = os.path.join(cachedir(), "{0}-{1}x{2}-{3:08x}-{4}.png".format(
+            name, size.width(), size.height(), color.rgba(), mtime))
+    except OSError:
+        filename = None
+    else:
+        i = QImage(filename)
+        if not i.isNull() and i.size() == size:
+            return i.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    i = QImage(size, QImage.Format_ARGB32_Premultiplied)
+    i.fill(0)
+    painter = QPainter(i)
+    # render SVG symbol
+    QSvgRenderer(svg).render(painter)
+    # recolor to text color
+    painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
+    painter.fillRect(i.rect(), color)
+    painter.end()
+    if filename:
+        _prune(name, mtime)
+        i.save(filename, "PNG")
+    return i
+
+
+def _prune(name, mtime):
+    """Removes the cached images of the named SVG rendered from other versions.
+    
+    The file names end with the modification time of the SVG, images with 
+    another time will never be used again.
+    
+    """
+    suffix = "-{0}.png".format(mtime)
+    for filename in glob.glob(os.path.join(cachedir(), name + "-*.png")):
+        if not filename.endswith(suffix):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+
+def cachedir():
+    """Returns the directory to store the rendered images in."""
+    return qutil.cachedir("symbols", format(_cache_version))
+
+
 class Engine(QIconEngineV2):
     """Engine to provide renderings of SVG icons in the default text color."""
     def __init__(self, name):
@@ -56,7 +56,7 @@ def state(block):
     """Return the ly.lex.State() object at the beginning of the given QTextBlock."""
     hl = highlighter.highlighter(block.document())
     if block.previous().userState() == -1 and block.blockNumber() > 0:
-        hl.rehighlight()
+        hl.tokenize()
     return hl.state(block.previous())
 
 
@@ -64,7 +64,7 @@ def state_end(block):
     """Return the ly.lex.State() object at the end of the given QTextBlock."""
     hl = highlighter.highlighter(block.document())
     if block.userState() == -1:
-        hl.rehighlight()
+        hl.tokenize()
     return hl.state(block)
 
 
@@ -24,7 +24,7 @@ the current line, marked lines, search results etc.
 
 from __future__ import unicode_literals
 
-from PyQt4.QtCore import QEvent
+from PyQt4.QtCore import QEvent, QPoint
 from PyQt4.QtGui import QColor, QTextCharFormat, QTextFormat
 
 import app
@@ -48,21 +48,51 @@ class ViewHighlighter(widgets.arbitraryhighlighter.ArbitraryHighlighter, plugin.
         self._cursorFormat.setProperty(QTextFormat.FullWidthSelection, True)
         app.settingsChanged.connect(self.readSettings)
         self.readSettings()
+        self._marks = {}
         bookmarks.bookmarks(view.document()).marksChanged.connect(self.updateMarkedLines)
+        view.verticalScrollBar().valueChanged.connect(self._scrolled)
+        view.blockCountChanged.connect(self._scrolled)
         self.updateMarkedLines()
         view.cursorPositionChanged.connect(self.updateCursor)
         view.installEventFilter(self)
 
-    def updateMarkedLines(self):
-        """Called when something changes in the bookmarks."""
-        for type, marks in bookmarks.bookmarks(self.parent().document()).marks().items():
-            self.highlight(type, marks, -1)
+    def updateMarkedLines(self, view=None):
+        """Highlights the marked lines that are visible in the view.
+        
+        Called when something changes in the bookmarks, and when the view 
+        scrolls, is resized or the number of lines changes. Only the visible 
+        marks are highlighted, as the view checks every highlighted selection 
+        when painting a line.
+        
+        If view is None (the default), our parent() is assumed to be the
+        view, see updateCursor().
+        
+        """
+        if view is None:
+            view = self.parent()
+        try:
+            first = view.firstVisibleBlock().blockNumber()
+        except AttributeError:
+            return
+        last = view.cursorForPosition(QPoint(0, view.viewport().height())).blockNumber()
+        marks = bookmarks.bookmarks(view.document())
+        for type in bookmarks.types:
+            cursors = marks.marksInRange(first, last, type)
+            if cursors != self._marks.get(type):
+                self._marks[type] = cursors
+                self.highlight(type, cursors, -1)
     
     def eventFilter(self, view, ev):
         if ev.type() in (QEvent.FocusIn, QEvent.FocusOut):
             self.updateCursor(view)
+        elif ev.type() == QEvent.Resize:
+            self.updateMarkedLines(view)
         return False
     
+    def _scrolled(self):
+        """Called when the visible lines may have changed."""
+        self.updateMarkedLines()
+    
     def updateCursor(self, view=None):
         """Called when the textCursor has moved. Highlights the current line.
         